@@ -0,0 +1,29 @@
+"""
+Background Jobs Process
+Runs the leader-elected background jobs (forex news scheduler, EA signal monitor,
+calendar and quote refreshers) outside the API processes.
+
+Start the API with RUN_BACKGROUND_JOBS=false so its workers stay out of the election:
+    RUN_BACKGROUND_JOBS=false uvicorn server:app --workers 4
+    python background_jobs.py
+
+Running several copies (or leaving RUN_BACKGROUND_JOBS on) is safe: only the holder
+of a job's lease runs it, and another process takes over if it dies.
+"""
+import asyncio
+import logging
+
+import leader_election
+from server import background_jobs, db
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    await leader_election.ensure_lease_index(db)
+    logger.info(f"🚀 Background jobs process {leader_election.PROCESS_ID} started")
+    await asyncio.gather(*leader_election.start_leader_jobs(db, background_jobs()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
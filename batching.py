@@ -0,0 +1,12 @@
+"""
+Batching Helpers
+Splitting helpers shared by the bulk write paths (signal_fanout, migrations)
+and the push layer (push_service, push_queue).
+"""
+from typing import Iterable, List
+
+
+def chunked(items: List, size: int) -> Iterable[List]:
+    """Consecutive slices of at most `size` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,168 @@
+"""
+Benchmark: list-based indicators vs the vectorized NumPy engine
+Compares the original pure-Python TechnicalIndicators implementation against
+indicator_engine on 200, 5k and 100k bar histories.
+
+Usage:
+    python benchmark_indicators.py [--repeat 5]
+"""
+import argparse
+import math
+import random
+import timeit
+from typing import Dict, List
+
+import numpy as np
+
+import indicator_engine
+from indicators import TechnicalIndicators
+
+HISTORY_SIZES = [200, 5_000, 100_000]
+
+
+class LegacyIndicators:
+    """Original list-based implementations (kept here as the benchmark baseline)"""
+
+    @staticmethod
+    def calculate_sma(prices: List[float], period: int) -> float:
+        if len(prices) < period:
+            return prices[-1] if prices else 0
+        return sum(prices[-period:]) / period
+
+    @staticmethod
+    def calculate_ema(prices: List[float], period: int) -> float:
+        if len(prices) < period:
+            return prices[-1] if prices else 0
+        multiplier = 2 / (period + 1)
+        ema = sum(prices[:period]) / period
+        for price in prices[period:]:
+            ema = (price * multiplier) + (ema * (1 - multiplier))
+        return ema
+
+    @staticmethod
+    def calculate_rsi(prices: List[float], period: int = 14) -> float:
+        if len(prices) < period + 1:
+            return 50.0
+        gains = []
+        losses = []
+        for i in range(1, len(prices)):
+            change = prices[i] - prices[i-1]
+            if change > 0:
+                gains.append(change)
+                losses.append(0)
+            else:
+                gains.append(0)
+                losses.append(abs(change))
+        avg_gain = sum(gains[-period:]) / period
+        avg_loss = sum(losses[-period:]) / period
+        if avg_loss == 0:
+            return 100.0
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+    @staticmethod
+    def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: float = 2.0) -> Dict[str, float]:
+        sma = LegacyIndicators.calculate_sma(prices, period)
+        recent_prices = prices[-period:]
+        variance = sum((x - sma) ** 2 for x in recent_prices) / period
+        std = variance ** 0.5
+        return {"upper": sma + std_dev * std, "middle": sma, "lower": sma - std_dev * std}
+
+    @staticmethod
+    def calculate_stochastic(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> float:
+        recent_high = max(highs[-period:])
+        recent_low = min(lows[-period:])
+        if recent_high == recent_low:
+            return 50.0
+        return ((closes[-1] - recent_low) / (recent_high - recent_low)) * 100
+
+
+def generate_history(bars: int, seed: int = 42):
+    """Random-walk OHLC history"""
+    rng = random.Random(seed)
+    price = 1.0850
+    closes, highs, lows = [], [], []
+    for i in range(bars):
+        price *= 1 + math.sin(i / 20) * 0.0002 + rng.uniform(-0.0005, 0.0005)
+        closes.append(price)
+        highs.append(price * (1 + rng.uniform(0, 0.0005)))
+        lows.append(price * (1 - rng.uniform(0, 0.0005)))
+    return closes, highs, lows
+
+
+def check_parity(closes, highs, lows):
+    """Make sure the engine reproduces the legacy values"""
+    pairs = [
+        (LegacyIndicators.calculate_sma(closes, 20), TechnicalIndicators.calculate_sma(closes, 20)),
+        (LegacyIndicators.calculate_ema(closes, 20), TechnicalIndicators.calculate_ema(closes, 20)),
+        (LegacyIndicators.calculate_rsi(closes, 14), TechnicalIndicators.calculate_rsi(closes, 14)),
+        (LegacyIndicators.calculate_bollinger_bands(closes)["upper"],
+         TechnicalIndicators.calculate_bollinger_bands(closes)["upper"]),
+        (LegacyIndicators.calculate_stochastic(highs, lows, closes),
+         indicator_engine.stochastic(highs, lows, closes, 14)["k"][-1]),
+    ]
+    for legacy, engine in pairs:
+        if not math.isclose(legacy, engine, rel_tol=1e-6, abs_tol=1e-4):
+            raise AssertionError(f"Engine mismatch: legacy={legacy} engine={engine}")
+
+
+def bench(label: str, func, repeat: int) -> float:
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=loops)) / loops
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indicator implementations")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'bars':>8} | {'indicator':<22} | {'legacy ms':>10} | {'numpy ms':>10} | {'speedup':>8}")
+    print("-" * 70)
+
+    for bars in HISTORY_SIZES:
+        closes, highs, lows = generate_history(bars)
+        close_arr = indicator_engine.as_prices(closes)
+        high_arr = indicator_engine.as_prices(highs)
+        low_arr = indicator_engine.as_prices(lows)
+        check_parity(closes, highs, lows)
+
+        cases = [
+            ("EMA(20) latest",
+             lambda: LegacyIndicators.calculate_ema(closes, 20),
+             lambda: indicator_engine.ema(close_arr, 20)[-1]),
+            ("RSI(14) latest",
+             lambda: LegacyIndicators.calculate_rsi(closes, 14),
+             lambda: TechnicalIndicators.calculate_rsi(close_arr, 14)),
+            ("MACD(12,26) latest",
+             lambda: LegacyIndicators.calculate_ema(closes, 12) - LegacyIndicators.calculate_ema(closes, 26),
+             lambda: TechnicalIndicators.calculate_macd(close_arr)),
+            ("Bollinger(20) series",
+             lambda: [LegacyIndicators.calculate_bollinger_bands(closes[end - 20:end], 20)
+                      for end in range(20, bars + 1)],
+             lambda: indicator_engine.bollinger_bands(close_arr, 20)),
+            ("Stochastic(14) series",
+             lambda: [LegacyIndicators.calculate_stochastic(highs[end - 14:end], lows[end - 14:end], closes[end - 14:end], 14)
+                      for end in range(14, bars + 1)],
+             lambda: indicator_engine.stochastic(high_arr, low_arr, close_arr, 14)),
+        ]
+
+        for label, legacy_fn, engine_fn in cases:
+            legacy_ms = bench(label, legacy_fn, args.repeat)
+            engine_ms = bench(label, engine_fn, args.repeat)
+            speedup = legacy_ms / engine_ms if engine_ms else float("inf")
+            print(f"{bars:>8} | {label:<22} | {legacy_ms:>10.3f} | {engine_ms:>10.3f} | {speedup:>7.1f}x")
+        print("-" * 70)
+
+    # Full-series sanity check against a straightforward per-bar loop
+    closes, _, _ = generate_history(2_000)
+    series = indicator_engine.rsi(closes, 14)
+    for end in (15, 500, 2_000):
+        expected = LegacyIndicators.calculate_rsi(closes[:end], 14)
+        assert np.isclose(series[end - 1], expected), (end, series[end - 1], expected)
+    print("✅ Parity checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: bcrypt on the event loop vs the bounded password-hash executor
+Fires a burst of concurrent logins (bcrypt verifications) and measures login throughput
+and how long the event loop stalls meanwhile (what every other request on the worker,
+e.g. signal polling, waits).
+
+Usage:
+    python benchmark_password_hashing.py [--logins 32] [--rounds 12] [--workers 1,2,4]
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict
+
+from passlib.context import CryptContext
+
+PASSWORD = "Correct-Horse-Battery-Staple"
+
+
+@lru_cache(maxsize=None)
+def make_context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+def verify(rounds: int, password: str, hashed: str) -> bool:
+    return make_context(rounds).verify(password, hashed)
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.01) -> Dict:
+    """Ticks every `interval`; the lateness of each tick is the event loop stall"""
+    worst = 0.0
+    ticks = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+        ticks += 1
+    return {"max_stall_ms": worst * 1000, "ticks": ticks}
+
+
+async def run_burst(logins: int, rounds: int, hashed: str, executor=None) -> Dict:
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    await asyncio.sleep(0.02)
+
+    async def login():
+        if executor is None:
+            return verify(rounds, PASSWORD, hashed)
+        return await loop.run_in_executor(executor, verify, rounds, PASSWORD, hashed)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    loop_stats = await watcher
+    assert all(results)
+    return {"seconds": elapsed, "logins_per_second": logins / elapsed, **loop_stats}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt login throughput and event loop stalls")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", "12")))
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated executor sizes")
+    parser.add_argument("--process", action="store_true", help="also benchmark a process pool")
+    args = parser.parse_args()
+
+    context = make_context(args.rounds)
+    hashed = context.hash(PASSWORD)
+    started = time.perf_counter()
+    context.verify(PASSWORD, hashed)
+    single_ms = (time.perf_counter() - started) * 1000
+
+    print(f"bcrypt rounds={args.rounds}: one verification {single_ms:.0f} ms, {args.logins} concurrent logins, "
+          f"{os.cpu_count()} CPUs\n")
+    print(f"{'mode':<22}{'total s':>10}{'logins/s':>12}{'max loop stall ms':>20}")
+
+    def report(name, result):
+        print(f"{name:<22}{result['seconds']:>10.2f}{result['logins_per_second']:>12.1f}{result['max_stall_ms']:>20.0f}")
+
+    report("inline (before)", await run_burst(args.logins, args.rounds, hashed))
+    for workers in [int(w) for w in args.workers.split(",") if w]:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            report(f"thread pool x{workers}", await run_burst(args.logins, args.rounds, hashed, executor))
+        if args.process:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                await run_burst(workers, args.rounds, hashed, executor)  # warm up worker processes
+                report(f"process pool x{workers}", await run_burst(args.logins, args.rounds, hashed, executor))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
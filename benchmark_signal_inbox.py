@@ -0,0 +1,142 @@
+"""
+Benchmark: fan-out-on-write user_signals vs the hybrid (audience) signal inbox
+Runs against a real MongoDB (MONGO_URL) in a scratch database that is dropped afterwards.
+
+Write cost: time, documents and storage to broadcast S signals to U users.
+Read cost: inbox read latency (latest 50 entries) and unread count latency for a sample of users.
+
+Usage:
+    python benchmark_signal_inbox.py [--users 10000] [--signals 20] [--readers 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import signal_inbox
+from signal_fanout import insert_many_chunked, insert_user_signals
+
+load_dotenv()
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+BENCHMARK_DB = os.getenv("DB_NAME", "mi_mobile_indicator") + "_inbox_benchmark"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def storage_bytes(db, *collections) -> int:
+    total = 0
+    for name in collections:
+        stats = await db.command("collStats", name)
+        total += stats.get("size", 0) + stats.get("totalIndexSize", 0)
+    return total
+
+
+def signal_doc(i: int, sender_type: str) -> dict:
+    return {
+        "symbol": "EURUSD",
+        "signal_type": "BUY" if i % 2 else "SELL",
+        "indicator": "RSI",
+        "timeframe": "1H",
+        "notes": "",
+        "sender_type": sender_type,
+        "created_at": datetime.utcnow(),
+        "expires_at": datetime.utcnow() + timedelta(hours=1),
+        "status": "active"
+    }
+
+
+async def read_fanout_inbox(db, user_id: str):
+    """Inbox read of the fan-out-on-write model: latest 50 refs, then one $in fetch of their signals"""
+    refs = await db.user_signals.find({"user_id": user_id}).sort("created_at", -1).limit(50).to_list(length=50)
+    ids = [ObjectId(ref["signal_id"]) for ref in refs]
+    return await db.signals.find({"_id": {"$in": ids}}).to_list(length=50)
+
+
+async def timed_reads(read, users, repeat: int = 1):
+    latencies = []
+    for _ in range(repeat):
+        for user in users:
+            start = time.perf_counter()
+            await read(user)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark signal inbox models")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--signals", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=200)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    await client.drop_database(BENCHMARK_DB)
+    db = client[BENCHMARK_DB]
+
+    try:
+        joined = datetime.utcnow() - timedelta(days=1)
+        users = [{
+            "email": f"user{i}@benchmark.local",
+            "status": "active",
+            "payment_status": "paid",
+            "mentor_id": f"MENTOR{i % 10:03d}",
+            "created_at": joined
+        } for i in range(args.users)]
+        await insert_many_chunked(db.users, users)
+        await signal_inbox.ensure_inbox_indexes(db)
+        readers = random.Random(7).sample(users, min(args.readers, len(users)))
+
+        # Fan-out on write: one user_signals row per recipient
+        start = time.perf_counter()
+        for i in range(args.signals):
+            result = await db.signals.insert_one(signal_doc(i, "admin"))
+            await insert_user_signals(db, str(result.inserted_id), [str(u["_id"]) for u in users])
+        fanout_write = time.perf_counter() - start
+        fanout_docs = await db.user_signals.count_documents({}) + args.signals
+        fanout_bytes = await storage_bytes(db, "signals", "user_signals")
+        fanout_reads = await timed_reads(lambda u: read_fanout_inbox(db, str(u["_id"])), readers)
+
+        await db.signals.delete_many({})
+        await db.user_signals.delete_many({})
+
+        # Hybrid inbox: one signal per broadcast, read state only for opened signals
+        start = time.perf_counter()
+        for i in range(args.signals):
+            await signal_inbox.publish_audience_signal(db, signal_doc(i, "admin"), signal_inbox.audience_all())
+        hybrid_write = time.perf_counter() - start
+        for user in readers[: len(readers) // 2]:
+            latest = await signal_inbox.latest_inbox_signal(db, user)
+            await signal_inbox.mark_read(db, user, str(latest["_id"]))
+        hybrid_docs = args.signals + await db.signal_reads.count_documents({})
+        hybrid_bytes = await storage_bytes(db, "signals", "signal_reads")
+        hybrid_reads = await timed_reads(lambda u: signal_inbox.fetch_inbox(db, u), readers)
+        unread_reads = await timed_reads(lambda u: signal_inbox.unread_count(db, u), readers)
+
+        print(f"Broadcasting {args.signals} signals to {args.users} users, {len(readers)} inbox reads")
+        print(f"{'model':<18} | {'write s':>8} | {'docs':>9} | {'storage KB':>10} | {'read avg ms':>11} | {'read p95 ms':>11} | {'read p99 ms':>11}")
+        print("-" * 96)
+        for label, write, docs, size, reads in (
+            ("fan-out on write", fanout_write, fanout_docs, fanout_bytes, fanout_reads),
+            ("hybrid inbox", hybrid_write, hybrid_docs, hybrid_bytes, hybrid_reads),
+        ):
+            print(f"{label:<18} | {write:>8.3f} | {docs:>9} | {size / 1024:>10.1f} | "
+                  f"{sum(reads) / len(reads):>11.2f} | {percentile(reads, 0.95):>11.2f} | {percentile(reads, 0.99):>11.2f}")
+        print(f"hybrid unread count: avg {sum(unread_reads) / len(unread_reads):.2f} ms, "
+              f"p95 {percentile(unread_reads, 0.95):.2f} ms (no user writes per broadcast)")
+    finally:
+        await client.drop_database(BENCHMARK_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,373 @@
+"""
+Bulk Account Provisioning
+Creates thousands of users, admins or mentors in a few round trips instead of a
+find_one + bcrypt + insert_one per account:
+
+- Emails are de-duplicated in the batch and pre-checked with ONE {"email": {"$in": ...}} query
+- Passwords are hashed in a process pool (bcrypt is CPU bound; PROVISION_HASH_WORKERS processes)
+- Accounts are written with one insert_many(ordered=False); an email taken concurrently
+  is reported as existing instead of failing the batch
+- License keys are reserved in bulk (reserve_licenses), taken from the unused pool first and
+  generated for the shortfall, then marked used with one bulk_write
+
+Used by POST /api/admin/users/bulk-create, POST /api/mentor/users/bulk-create and the CLI:
+    python bulk_provisioning.py accounts.csv --kind user --mentor-id MENTOR001 --licenses
+    python bulk_provisioning.py --generate 2000 --dry-run     # hashing throughput only, no database
+CSV / JSON input: email, password (optional: a temporary one is generated), name, mentor_id
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+import string
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from auth import get_password_hash
+from license_manager import LicenseManager
+
+logger = logging.getLogger(__name__)
+
+PROVISION_HASH_WORKERS = int(os.getenv("PROVISION_HASH_WORKERS", str(os.cpu_count() or 1)))
+PROVISION_MAX_BATCH = int(os.getenv("PROVISION_MAX_BATCH", "5000"))
+
+KIND_COLLECTIONS = {"user": "users", "admin": "admins", "mentor": "mentors"}
+DUPLICATE_KEY = 11000
+TEMP_PASSWORD_LENGTH = 12
+
+
+def temporary_password() -> str:
+    alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
+    return "".join(secrets.choice(alphabet) for _ in range(TEMP_PASSWORD_LENGTH))
+
+
+def hash_chunk(passwords: List[str]) -> List[str]:
+    """Runs in a worker process"""
+    return [get_password_hash(password) for password in passwords]
+
+
+async def hash_passwords(passwords: List[str], workers: int = PROVISION_HASH_WORKERS) -> List[str]:
+    """bcrypt-hash passwords in a process pool, in order"""
+    if not passwords:
+        return []
+    workers = max(1, min(workers, len(passwords)))
+    chunk_size = -(-len(passwords) // (workers * 4))
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+    loop = asyncio.get_running_loop()
+    # spawn: forking a process that runs motor's threads and an event loop is not safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = await asyncio.gather(*(loop.run_in_executor(pool, hash_chunk, chunk) for chunk in chunks))
+    return [hashed for chunk in results for hashed in chunk]
+
+
+# ============================================================================
+# LICENSE KEYS
+# ============================================================================
+
+async def reserve_licenses(db, count: int, batch_id: str, mentor_id: Optional[str] = None,
+                           generate_missing: bool = True) -> List[str]:
+    """
+    Reserve `count` unused license keys for a batch: unused keys from the pool (the mentor's,
+    or the system pool) first, newly generated keys for the rest. Concurrent batches never share a key.
+    Returns fewer keys only when generate_missing is False and the pool runs out.
+    """
+    if count <= 0:
+        return []
+    now = datetime.utcnow()
+    # mentor_id None is the system pool (keys not generated for a mentor)
+    pool_query = {"used": False, "reserved_by": None, "mentor_id": mentor_id}
+
+    candidates = await db.licenses.find(pool_query, {"_id": 1}).limit(count).to_list(length=count)
+    if candidates:
+        await db.licenses.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in candidates]}, **pool_query},
+            {"$set": {"reserved_by": batch_id, "reserved_at": now}}
+        )
+
+    for _ in range(3):
+        reserved = await db.licenses.count_documents({"reserved_by": batch_id})
+        missing = count - reserved
+        if missing <= 0 or not generate_missing:
+            break
+        new_keys = [{
+            "key": key,
+            "mentor_id": mentor_id,
+            "used": False,
+            "used_by": None,
+            "created_at": now,
+            "created_by": "bulk_provisioning",
+            "copied": False,
+            "copied_at": None,
+            "reserved_by": batch_id,
+            "reserved_at": now
+        } for key in LicenseManager.generate_multiple_keys(missing)]
+        try:
+            await db.licenses.insert_many(new_keys, ordered=False)
+        except BulkWriteError:
+            pass  # key collisions: the loop generates replacements
+
+    docs = await db.licenses.find({"reserved_by": batch_id}, {"key": 1}).to_list(length=None)
+    return [doc["key"] for doc in docs][:count]
+
+
+async def release_licenses(db, batch_id: str, keep: Iterable[str] = ()):
+    """Return a batch's reserved but unassigned keys to the pool (except `keep`)"""
+    query = {"reserved_by": batch_id, "used": False}
+    keep = list(keep)
+    if keep:
+        query["key"] = {"$nin": keep}
+    await db.licenses.update_many(query, {"$unset": {"reserved_by": "", "reserved_at": ""}})
+
+
+async def mark_licenses_used(db, assignments: List[Dict]):
+    """assignments: [{"key", "user_id", "email"}] -> one bulk_write"""
+    if not assignments:
+        return
+    now = datetime.utcnow()
+    await db.licenses.bulk_write([
+        UpdateOne(
+            {"key": a["key"]},
+            {"$set": {"used": True, "used_by": a["user_id"], "used_at": now, "user_email": a["email"]},
+             "$unset": {"reserved_by": "", "reserved_at": ""}}
+        ) for a in assignments
+    ], ordered=False)
+
+
+# ============================================================================
+# ACCOUNTS
+# ============================================================================
+
+def account_document(kind: str, account: Dict, password_hash: str, defaults: Dict, now: datetime) -> Dict:
+    """Account document in the shape the single-account endpoints create"""
+    email = account["email"]
+    doc = {
+        "email": email,
+        "password_hash": password_hash,
+        "name": account.get("name") or email.split("@")[0],
+        "created_at": now,
+        "last_login": None,
+        "requires_password_change": not account.get("password"),
+        "created_by_bulk": defaults.get("batch_id")
+    }
+    if kind == "user":
+        doc.update({
+            "mentor_id": account.get("mentor_id") or defaults.get("mentor_id"),
+            "license_key": None,
+            "status": account.get("status") or defaults.get("status", "active"),
+            "payment_status": account.get("payment_status") or defaults.get("payment_status", "paid"),
+            "created_by_admin": defaults.get("created_by_admin", False),
+            "admin_creator_id": defaults.get("creator_id")
+        })
+    elif kind == "mentor":
+        doc.update({
+            "mentor_id": account["mentor_id"],
+            "company_name": account.get("company_name", ""),
+            "status": account.get("status") or "active",
+            "max_users": int(account.get("max_users") or 100),
+            "current_users": 0,
+            "brokers": [],
+            "approved_at": now
+        })
+    elif kind == "admin":
+        doc.update({
+            "role": account.get("role") or "admin",
+            "permissions": ["view_users", "manage_users", "view_activity", "manage_licenses"]
+        })
+    return doc
+
+
+async def provision_accounts(db, kind: str, accounts: List[Dict], assign_licenses: bool = False,
+                             license_mentor_id: Optional[str] = None, generate_licenses: bool = True,
+                             workers: int = PROVISION_HASH_WORKERS, **defaults) -> Dict:
+    """
+    Create many accounts of one kind ("user", "admin" or "mentor").
+    defaults: mentor_id, status, payment_status, created_by_admin, creator_id (users)
+    Returns created accounts (with generated temporary passwords and license keys),
+    emails that already existed, in-batch duplicates and invalid rows.
+    """
+    started = time.perf_counter()
+    collection = db[KIND_COLLECTIONS[kind]]
+    batch_id = defaults.setdefault("batch_id", f"bulk-{uuid.uuid4().hex[:12]}")
+
+    # 1. Validate and de-duplicate within the batch
+    unique: Dict[str, Dict] = {}
+    duplicates, invalid = [], []
+    for account in accounts:
+        email = (account.get("email") or "").strip()
+        if "@" not in email or (kind == "mentor" and not account.get("mentor_id")):
+            invalid.append(email or str(account))
+            continue
+        if email in unique:
+            duplicates.append(email)
+            continue
+        unique[email] = {**account, "email": email}
+
+    # 2. One $in query for emails that are already registered
+    existing = {
+        doc["email"]
+        async for doc in collection.find({"email": {"$in": list(unique)}}, {"email": 1})
+    } if unique else set()
+    pending = [account for email, account in unique.items() if email not in existing]
+
+    # 3. Hash all passwords in a process pool (temporary passwords for rows without one)
+    temp_passwords = {a["email"]: temporary_password() for a in pending if not a.get("password")}
+    hashes = await hash_passwords([a.get("password") or temp_passwords[a["email"]] for a in pending], workers)
+    hashed_at = time.perf_counter()
+
+    # 4-6 hold reserved keys: whatever fails, the finally returns every key no account holds
+    keys: List[str] = []
+    assigned: List[str] = []  # keys that may be stored on inserted accounts
+    try:
+        # 4. Reserve license keys for the whole batch
+        if assign_licenses and kind == "user" and pending:
+            keys = await reserve_licenses(db, len(pending), batch_id, license_mentor_id, generate_licenses)
+            if len(keys) < len(pending):
+                raise ValueError(f"Only {len(keys)} unused license keys available for {len(pending)} accounts")
+
+        # 5. One insert_many; emails registered concurrently show up as duplicate key errors
+        now = datetime.utcnow()
+        docs = []
+        for index, (account, password_hash) in enumerate(zip(pending, hashes)):
+            doc = account_document(kind, account, password_hash, defaults, now)
+            doc["_id"] = ObjectId()
+            if keys:
+                doc["license_key"] = keys[index]
+            docs.append(doc)
+
+        failed_indexes = set()
+        if docs:
+            # Until insert_many reports which documents failed, any of them may hold its key
+            assigned = keys[:len(docs)]
+            try:
+                await collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed_indexes.add(error["index"])
+                    if error.get("code") == DUPLICATE_KEY:
+                        existing.add(docs[error["index"]]["email"])
+                    else:
+                        invalid.append(docs[error["index"]]["email"])
+        inserted = [doc for index, doc in enumerate(docs) if index not in failed_indexes]
+        assigned = [doc["license_key"] for doc in inserted if doc.get("license_key")]
+
+        # 6. Mark assigned keys used
+        if assigned:
+            await mark_licenses_used(db, [
+                {"key": doc["license_key"], "user_id": str(doc["_id"]), "email": doc["email"]} for doc in inserted
+            ])
+    finally:
+        if keys:
+            await release_licenses(db, batch_id, keep=assigned)
+
+    # 7. Log the batch
+    if inserted:
+        await db.user_activity.insert_many([{
+            "user_id": str(doc["_id"]),
+            "action": f"{kind}_created_bulk",
+            "details": {"email": doc["email"], "batch_id": batch_id, "creator_id": defaults.get("creator_id")},
+            "timestamp": now
+        } for doc in inserted], ordered=False)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"👥 Bulk provisioning {batch_id}: {len(inserted)} {kind}s created, {len(existing)} existing, "
+                f"{len(duplicates)} duplicates, {len(invalid)} invalid in {elapsed:.2f}s")
+    return {
+        "batch_id": batch_id,
+        "created": [{
+            "email": doc["email"],
+            "id": str(doc["_id"]),
+            **({"license_key": doc["license_key"]} if doc.get("license_key") else {}),
+            **({"temporary_password": temp_passwords[doc["email"]]} if doc["email"] in temp_passwords else {})
+        } for doc in inserted],
+        "existing": sorted(existing),
+        "duplicates": duplicates,
+        "invalid": invalid,
+        "seconds": round(elapsed, 3),
+        "hash_seconds": round(hashed_at - started, 3)
+    }
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def read_accounts(path: str) -> List[Dict]:
+    with open(path, newline="") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        return [{k: v for k, v in row.items() if v} for row in csv.DictReader(f)]
+
+
+async def run_cli(args):
+    if args.generate:
+        accounts = [{"email": f"bulk{i}@example.com", "password": f"Bulk-{i}-Password"} for i in range(args.generate)]
+    else:
+        accounts = read_accounts(args.file)
+
+    if args.dry_run:
+        started = time.perf_counter()
+        hashes = await hash_passwords([a.get("password") or temporary_password() for a in accounts], args.workers)
+        elapsed = time.perf_counter() - started
+        print(f"Hashed {len(hashes)} passwords in {elapsed:.2f}s with {args.workers} processes "
+              f"({len(hashes) / elapsed:.0f}/s); no database writes (--dry-run)")
+        return
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.getenv("DB_NAME", "mi_mobile_indicator")]
+    try:
+        result = await provision_accounts(
+            db, args.kind, accounts,
+            assign_licenses=args.licenses,
+            license_mentor_id=args.mentor_id,
+            workers=args.workers,
+            mentor_id=args.mentor_id,
+            status=args.status,
+            payment_status=args.payment_status,
+            created_by_admin=True,
+            creator_id="cli"
+        )
+    finally:
+        client.close()
+
+    print(f"✅ Created {len(result['created'])} {args.kind}s in {result['seconds']}s "
+          f"(hashing {result['hash_seconds']}s), batch {result['batch_id']}")
+    print(f"   existing: {len(result['existing'])}, duplicates: {len(result['duplicates'])}, invalid: {len(result['invalid'])}")
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["email", "id", "license_key", "temporary_password"])
+            writer.writeheader()
+            writer.writerows(result["created"])
+        print(f"   credentials written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-create users, admins or mentors")
+    parser.add_argument("file", nargs="?", help="CSV or JSON file of accounts")
+    parser.add_argument("--generate", type=int, default=0, help="provision N synthetic accounts instead of a file")
+    parser.add_argument("--kind", choices=sorted(KIND_COLLECTIONS), default="user")
+    parser.add_argument("--mentor-id", help="mentor of the users (and license pool with --licenses)")
+    parser.add_argument("--licenses", action="store_true", help="assign a license key to every new user")
+    parser.add_argument("--status", default="active")
+    parser.add_argument("--payment-status", default="paid")
+    parser.add_argument("--workers", type=int, default=PROVISION_HASH_WORKERS)
+    parser.add_argument("--output", help="write created accounts (temporary passwords, license keys) to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="only hash the passwords and report throughput")
+    cli_args = parser.parse_args()
+    if not cli_args.file and not cli_args.generate:
+        parser.error("give a file or --generate N")
+    asyncio.run(run_cli(cli_args))
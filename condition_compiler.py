@@ -0,0 +1,365 @@
+"""
+Condition Compiler for Custom Indicators
+Compiles a mentor indicator's buy/sell condition trees once into a flat plan:
+
+- inputs: the indicator configs (type, params) that must be computed up front
+- slots: which computed value each condition reads, resolved to a list index
+- tests: prebuilt comparison closures test(current, previous), so evaluation is a
+  tight loop with no dict lookups, string comparisons or exception handling
+
+Crosses are edge-triggered: crosses_above passes only on the bar where the value
+moves from <= level (previous bar) to > level. Batch evaluation reads the previous bar
+from the last two columns of the indicator matrix (ConditionEvaluator.evaluate_batch),
+single evaluations from the values stored per (indicator, symbol, timeframe) in a
+CrossStateStore. A bar is usually checked more than once, so the store also records the
+bar each group last fired a cross on: a cross fires once per bar, not on every check.
+
+Plans are cached per indicator _id and recompiled when updated_at changes.
+Both stored formats are accepted:
+- ConditionEvaluator format: {"type", "params"} configs, {"indicator", "operator", "value"} conditions
+- Mentor API format (IndicatorConfig / TradingCondition): {"indicator_type", "period", ...}
+  configs, {"condition_type", "indicator_ref", "value", "value_lower", "value_upper"} conditions
+"""
+import logging
+import math
+import operator
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Values produced by ConditionEvaluator.calculate_indicator for each indicator type
+INDICATOR_OUTPUTS = {
+    "RSI": ("RSI",),
+    "SMA": ("SMA",),
+    "EMA": ("EMA",),
+    "MACD": ("MACD", "MACD_SIGNAL", "MACD_HISTOGRAM"),
+    "BOLLINGER": ("BB_UPPER", "BB_MIDDLE", "BB_LOWER"),
+    "STOCHASTIC": ("STOCH_K", "STOCH_D"),
+}
+
+# indicator_ref shorthands used by the mentor UI
+REFERENCE_ALIASES = {
+    "BOLLINGER": "BB_MIDDLE",
+    "BB": "BB_MIDDLE",
+    "STOCHASTIC": "STOCH_K",
+    "STOCH": "STOCH_K",
+}
+
+# TradingCondition.condition_type -> evaluator operator
+CONDITION_TYPE_OPERATORS = {
+    "ABOVE": ">",
+    "BELOW": "<",
+    "CROSS_ABOVE": "crosses_above",
+    "CROSS_BELOW": "crosses_below",
+    "BETWEEN": "between",
+}
+
+_COMPARISONS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+CROSS_OPERATORS = ("crosses_above", "crosses_below")
+
+DEFAULT_MAX_STATES = int(os.getenv("CROSS_STATE_MAX_ENTRIES", "50000"))
+
+
+def normalize_indicator_config(config: Dict) -> Tuple[str, Dict]:
+    """Return (indicator_type, params) for either stored config format"""
+    if "type" in config:
+        return config.get("type"), dict(config.get("params") or {})
+
+    indicator_type = (config.get("indicator_type") or "").upper()
+    params = {}
+    if config.get("period") is not None:
+        params["period"] = config["period"]
+
+    if indicator_type == "MA":
+        indicator_type = (config.get("ma_type") or "SMA").upper()
+    elif indicator_type == "MACD":
+        for name, key in (("fast", "fast_period"), ("slow", "slow_period"), ("signal", "signal_period")):
+            if config.get(key) is not None:
+                params[name] = config[key]
+        params.pop("period", None)
+
+    return indicator_type, params
+
+
+def normalize_condition(condition: Dict) -> Tuple[Optional[str], Optional[str], Any, Any]:
+    """Return (reference, operator, value, upper_value) for either stored condition format"""
+    if "condition_type" in condition:
+        op = CONDITION_TYPE_OPERATORS.get((condition.get("condition_type") or "").upper())
+        if op == "between":
+            return condition.get("indicator_ref"), op, condition.get("value_lower"), condition.get("value_upper")
+        return condition.get("indicator_ref"), op, condition.get("value"), None
+
+    return condition.get("indicator"), condition.get("operator"), condition.get("value"), None
+
+
+def _never(current, previous) -> bool:
+    return False
+
+
+def compile_test(op: Optional[str], value: Any, upper: Any = None) -> Callable:
+    """
+    Build the comparison closure test(current, previous) for one condition.
+    Works on floats and NumPy arrays alike; NaN (missing value) never passes.
+    """
+    if value is None:
+        return _never
+
+    if op in _COMPARISONS:
+        compare = _COMPARISONS[op]
+        return lambda v, p: compare(v, value)
+    if op == "crosses_above":
+        return lambda v, p: (p <= value) & (v > value)
+    if op == "crosses_below":
+        return lambda v, p: (p >= value) & (v < value)
+    if op == "==":
+        return lambda v, p: abs(v - value) < 0.01
+    if op == "between":
+        if upper is None:
+            return _never
+        lower, upper = min(value, upper), max(value, upper)
+        return lambda v, p: (v >= lower) & (v <= upper)
+
+    logger.warning(f"Unknown operator: {op}")
+    return _never
+
+
+class CompiledIndicator:
+    """Flat, reusable evaluation plan for one custom indicator"""
+
+    __slots__ = ("indicator_id", "version", "name", "inputs", "slots", "buy", "sell", "buy_any", "sell_any",
+                 "needs_previous", "_no_previous")
+
+    def __init__(self, indicator_id: Optional[str], version: Any, name: str,
+                 inputs: List[Tuple[str, Dict]], slots: List[Tuple[int, str]],
+                 buy: Tuple, sell: Tuple, buy_any: bool, sell_any: bool,
+                 needs_previous: bool = False):
+        self.indicator_id = indicator_id
+        self.version = version
+        self.name = name
+        self.inputs = inputs      # [(indicator_type, params)] to compute before evaluating
+        self.slots = slots        # [(input index, output name)] -> position in the values list
+        self.buy = buy            # ((slot, test), ...)
+        self.sell = sell
+        self.buy_any = buy_any    # OR logic instead of AND
+        self.sell_any = sell_any
+        self.needs_previous = needs_previous  # Has crosses_above/crosses_below rules
+        self._no_previous = [math.nan] * len(slots)
+
+    @staticmethod
+    def _passes(rules: Tuple, any_mode: bool, values: Sequence, previous: Sequence) -> bool:
+        if not rules:
+            return False
+        if any_mode:
+            for slot, test in rules:
+                if test(values[slot], previous[slot]):
+                    return True
+            return False
+        for slot, test in rules:
+            if not test(values[slot], previous[slot]):
+                return False
+        return True
+
+    def evaluate(self, values: Sequence[float], previous: Optional[Sequence[float]] = None) -> Optional[str]:
+        """
+        values[i] / previous[i] are the current / previous-bar values for slots[i] (NaN when missing).
+        Without previous values no cross can fire. Returns "BUY", "SELL" or None
+        """
+        if previous is None:
+            previous = self._no_previous
+        if self._passes(self.buy, self.buy_any, values, previous):
+            return "BUY"
+        if self._passes(self.sell, self.sell_any, values, previous):
+            return "SELL"
+        return None
+
+    @staticmethod
+    def _passes_vector(rules: Tuple, any_mode: bool, values: Sequence, previous: Sequence, symbol_count: int):
+        result = np.full(symbol_count, not any_mode) if rules else np.zeros(symbol_count, dtype=bool)
+        for slot, test in rules:
+            if any_mode:
+                result |= test(values[slot], previous[slot])
+            else:
+                result &= test(values[slot], previous[slot])
+        return result
+
+    def evaluate_vector(self, values: Sequence, previous: Sequence, symbol_count: int):
+        """
+        Vectorized evaluate(): values[i] / previous[i] are arrays with one value per symbol.
+        Returns (buy, sell) masks
+        """
+        buy = self._passes_vector(self.buy, self.buy_any, values, previous, symbol_count)
+        sell = self._passes_vector(self.sell, self.sell_any, values, previous, symbol_count)
+        return buy, sell & ~buy
+
+
+def compile_indicator(indicator: Dict) -> CompiledIndicator:
+    """Compile a custom indicator document into a CompiledIndicator plan"""
+    inputs: List[Tuple[str, Dict]] = []
+    producer: Dict[str, int] = {}  # output name -> input index (later configs win, like dict.update)
+    for config in indicator.get("indicators", []):
+        indicator_type, params = normalize_indicator_config(config)
+        if indicator_type not in INDICATOR_OUTPUTS:
+            logger.warning(f"Unsupported indicator type in '{indicator.get('name')}': {indicator_type}")
+            continue
+        inputs.append((indicator_type, params))
+        for output in INDICATOR_OUTPUTS[indicator_type]:
+            producer[output] = len(inputs) - 1
+        if indicator_type in ("SMA", "EMA"):
+            producer["MA"] = len(inputs) - 1
+
+    slots: List[Tuple[int, str]] = []
+    slot_of: Dict[str, int] = {}
+    crosses: List[int] = []  # Slots read by cross rules
+
+    def resolve(reference: Optional[str]) -> Optional[int]:
+        name = (reference or "").upper()
+        name = REFERENCE_ALIASES.get(name, name)
+        if name not in producer:
+            return None
+        input_index = producer[name]
+        if name == "MA":
+            name = inputs[input_index][0]
+        if name not in slot_of:
+            slot_of[name] = len(slots)
+            slots.append((input_index, name))
+        return slot_of[name]
+
+    def compile_side(conditions: List[Dict], any_mode: bool) -> Tuple:
+        rules = []
+        for condition in conditions or []:
+            reference, op, value, upper = normalize_condition(condition)
+            slot = resolve(reference)
+            if slot is None:
+                logger.warning(f"Indicator {reference} not found in '{indicator.get('name')}' inputs")
+                if not any_mode:
+                    return ()  # An AND group with a missing indicator can never pass
+                continue
+            rules.append((slot, compile_test(op, value, upper)))
+            if op in CROSS_OPERATORS:
+                crosses.append(slot)
+        return tuple(rules)
+
+    buy_any = (indicator.get("buy_logic") or "AND").upper() == "OR"
+    sell_any = (indicator.get("sell_logic") or "AND").upper() == "OR"
+    buy = compile_side(indicator.get("buy_conditions", []), buy_any)
+    sell = compile_side(indicator.get("sell_conditions", []), sell_any)
+
+    indicator_id = str(indicator["_id"]) if indicator.get("_id") is not None else None
+    return CompiledIndicator(
+        indicator_id=indicator_id,
+        version=indicator.get("updated_at"),
+        name=indicator.get("name", ""),
+        inputs=inputs,
+        slots=slots,
+        buy=buy,
+        sell=sell,
+        buy_any=buy_any,
+        sell_any=sell_any,
+        needs_previous=bool(crosses),
+    )
+
+
+class PlanCache:
+    """Compiled plans keyed by indicator _id, recompiled when updated_at changes"""
+
+    def __init__(self):
+        self._plans: Dict[str, CompiledIndicator] = {}
+        self.compilations = 0
+
+    def get(self, indicator: Dict) -> CompiledIndicator:
+        indicator_id = indicator.get("_id")
+        if indicator_id is None:
+            self.compilations += 1
+            return compile_indicator(indicator)
+
+        key = str(indicator_id)
+        plan = self._plans.get(key)
+        if plan is None or plan.version != indicator.get("updated_at"):
+            plan = compile_indicator(indicator)
+            self.compilations += 1
+            self._plans[key] = plan
+            logger.info(f"🧩 Compiled indicator '{plan.name}' ({key}): "
+                        f"{len(plan.inputs)} inputs, {len(plan.buy)} buy / {len(plan.sell)} sell rules")
+        return plan
+
+    def invalidate(self, indicator_id: str):
+        self._plans.pop(str(indicator_id), None)
+
+    def stats(self) -> Dict:
+        return {"plans": len(self._plans), "compilations": self.compilations}
+
+
+class CrossStateStore:
+    """
+    Cross state per evaluation group (indicator_id, symbol, timeframe): the values of the
+    bar last evaluated, the previous bar's values and the bar a cross signal last fired on.
+    Bounded LRU so abandoned subscriptions do not pile up.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_STATES):
+        self.max_entries = max_entries
+        # key -> [bar_time, values, previous values, bar_time of the last cross signal]
+        self._states: "OrderedDict[Tuple, List]" = OrderedDict()
+        self.seeds = 0
+        self.suppressed = 0
+
+    def _state(self, key: Tuple) -> List:
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = [None, None, None, None]
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+        self._states.move_to_end(key)
+        return state
+
+    def roll(self, key: Tuple, bar_time: Hashable, values: List[float],
+             seed: Callable[[], List[float]]) -> List[float]:
+        """
+        Record `values` for `bar_time` and return the previous bar's values.
+        Re-evaluating within the same bar keeps comparing against the same previous bar.
+        seed() computes the previous bar from history; it is only called for unknown groups
+        (e.g. after a restart) or bars older than the stored one.
+        """
+        state = self._state(key)
+        if state[0] is None or bar_time < state[0]:
+            self.seeds += 1
+            previous = seed()
+            if state[0] is None:
+                state[:3] = [bar_time, values, previous]
+            return previous  # Out-of-order bar: do not overwrite newer state
+
+        if bar_time > state[0]:
+            state[0], state[2] = bar_time, state[1]
+        state[1] = values
+        return state[2]
+
+    def claim(self, key: Tuple, bar_time: Hashable) -> bool:
+        """
+        Record a cross signal for the group on `bar_time`. Returns False if one already
+        fired on this bar (or a newer one), so the check that repeats it is dropped.
+        """
+        state = self._state(key)
+        if state[3] is not None and bar_time <= state[3]:
+            self.suppressed += 1
+            return False
+        state[3] = bar_time
+        return True
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._states), "max_entries": self.max_entries,
+                "seeds": self.seeds, "suppressed": self.suppressed}
+
+
+# Global plan cache and cross state shared by evaluations in this process
+plan_cache = PlanCache()
+cross_state = CrossStateStore()
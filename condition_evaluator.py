@@ -3,9 +3,16 @@ Condition Evaluator for Custom Indicators
 Evaluates mentor's indicator conditions against market data
 """
 import logging
-from typing import Dict, List, Any, Optional
+import math
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 
+import numpy as np
+
+import indicator_engine
+from condition_compiler import CompiledIndicator, cross_state, plan_cache
+from indicator_cache import indicator_cache, normalize_params
+
 logger = logging.getLogger(__name__)
 
 
@@ -129,7 +136,8 @@ class ConditionEvaluator:
         return {"k": k, "d": d}
     
     @staticmethod
-    def evaluate_condition(condition: Dict, indicator_values: Dict, current_price: float) -> bool:
+    def evaluate_condition(condition: Dict, indicator_values: Dict, current_price: float,
+                           previous_values: Optional[Dict] = None) -> bool:
         """
         Evaluate a single condition
         
@@ -140,6 +148,9 @@ class ConditionEvaluator:
             "value": 70,
             "params": {"period": 14}
         }
+        
+        Crosses compare against previous_values (the previous bar) and never
+        fire without them.
         """
         try:
             indicator_type = condition.get("indicator")
@@ -164,11 +175,11 @@ class ConditionEvaluator:
             elif operator == "==":
                 return abs(indicator_value - threshold) < 0.01
             elif operator == "crosses_above":
-                # Simplified: just check if currently above
-                return indicator_value > threshold
+                previous_value = (previous_values or {}).get(indicator_type)
+                return previous_value is not None and previous_value <= threshold < indicator_value
             elif operator == "crosses_below":
-                # Simplified: just check if currently below
-                return indicator_value < threshold
+                previous_value = (previous_values or {}).get(indicator_type)
+                return previous_value is not None and previous_value >= threshold > indicator_value
             else:
                 logger.warning(f"Unknown operator: {operator}")
                 return False
@@ -179,7 +190,8 @@ class ConditionEvaluator:
     
     @staticmethod
     def evaluate_conditions(conditions: List[Dict], indicator_values: Dict, 
-                          current_price: float, logic: str = "AND") -> bool:
+                          current_price: float, logic: str = "AND",
+                          previous_values: Optional[Dict] = None) -> bool:
         """
         Evaluate multiple conditions with AND/OR logic
         """
@@ -188,7 +200,7 @@ class ConditionEvaluator:
         
         results = []
         for condition in conditions:
-            result = ConditionEvaluator.evaluate_condition(condition, indicator_values, current_price)
+            result = ConditionEvaluator.evaluate_condition(condition, indicator_values, current_price, previous_values)
             results.append(result)
         
         if logic.upper() == "AND":
@@ -198,12 +210,70 @@ class ConditionEvaluator:
         else:
             return all(results)  # Default to AND
     
+    @staticmethod
+    def calculate_indicator(indicator_type: str, params: Dict, prices: List[float],
+                            highs: List[float], lows: List[float]) -> Dict:
+        """
+        Calculate a single indicator config
+        Returns dict of indicator_name: value (empty if not enough data)
+        """
+        indicator_values = {}
+        
+        if indicator_type == "RSI":
+            period = params.get("period", 14)
+            rsi = ConditionEvaluator.calculate_rsi(prices, period)
+            if rsi is not None:
+                indicator_values["RSI"] = rsi
+        
+        elif indicator_type == "SMA":
+            period = params.get("period", 20)
+            sma = ConditionEvaluator.calculate_sma(prices, period)
+            if sma is not None:
+                indicator_values["SMA"] = sma
+        
+        elif indicator_type == "EMA":
+            period = params.get("period", 20)
+            ema = ConditionEvaluator.calculate_ema(prices, period)
+            if ema is not None:
+                indicator_values["EMA"] = ema
+        
+        elif indicator_type == "MACD":
+            macd_data = ConditionEvaluator.calculate_macd(
+                prices, params.get("fast", 12), params.get("slow", 26), params.get("signal", 9)
+            )
+            if macd_data:
+                indicator_values["MACD"] = macd_data["macd"]
+                indicator_values["MACD_SIGNAL"] = macd_data["signal"]
+                indicator_values["MACD_HISTOGRAM"] = macd_data["histogram"]
+        
+        elif indicator_type == "BOLLINGER":
+            period = params.get("period", 20)
+            std_dev = params.get("std_dev", 2.0)
+            bb = ConditionEvaluator.calculate_bollinger_bands(prices, period, std_dev)
+            if bb:
+                indicator_values["BB_UPPER"] = bb["upper"]
+                indicator_values["BB_MIDDLE"] = bb["middle"]
+                indicator_values["BB_LOWER"] = bb["lower"]
+        
+        elif indicator_type == "STOCHASTIC":
+            period = params.get("period", 14)
+            stoch = ConditionEvaluator.calculate_stochastic(highs, lows, prices, period)
+            if stoch:
+                indicator_values["STOCH_K"] = stoch["k"]
+                indicator_values["STOCH_D"] = stoch["d"]
+        
+        return indicator_values
+    
     @staticmethod
     def calculate_all_indicators(prices: List[float], highs: List[float], 
-                                lows: List[float], indicator_configs: List[Dict]) -> Dict:
+                                lows: List[float], indicator_configs: List[Dict],
+                                series: Optional[Tuple[str, str, Any]] = None) -> Dict:
         """
         Calculate all indicators specified in configs
         Returns dict of indicator_name: value
+        
+        series: optional (symbol, timeframe, last_bar_time). When given, results are
+        shared through the indicator cache with every other evaluation of the same bar.
         """
         indicator_values = {}
         
@@ -212,46 +282,15 @@ class ConditionEvaluator:
             params = config.get("params", {})
             
             try:
-                if indicator_type == "RSI":
-                    period = params.get("period", 14)
-                    rsi = ConditionEvaluator.calculate_rsi(prices, period)
-                    if rsi is not None:
-                        indicator_values["RSI"] = rsi
-                
-                elif indicator_type == "SMA":
-                    period = params.get("period", 20)
-                    sma = ConditionEvaluator.calculate_sma(prices, period)
-                    if sma is not None:
-                        indicator_values["SMA"] = sma
-                
-                elif indicator_type == "EMA":
-                    period = params.get("period", 20)
-                    ema = ConditionEvaluator.calculate_ema(prices, period)
-                    if ema is not None:
-                        indicator_values["EMA"] = ema
-                
-                elif indicator_type == "MACD":
-                    macd_data = ConditionEvaluator.calculate_macd(prices)
-                    if macd_data:
-                        indicator_values["MACD"] = macd_data["macd"]
-                        indicator_values["MACD_SIGNAL"] = macd_data["signal"]
-                        indicator_values["MACD_HISTOGRAM"] = macd_data["histogram"]
-                
-                elif indicator_type == "BOLLINGER":
-                    period = params.get("period", 20)
-                    std_dev = params.get("std_dev", 2.0)
-                    bb = ConditionEvaluator.calculate_bollinger_bands(prices, period, std_dev)
-                    if bb:
-                        indicator_values["BB_UPPER"] = bb["upper"]
-                        indicator_values["BB_MIDDLE"] = bb["middle"]
-                        indicator_values["BB_LOWER"] = bb["lower"]
-                
-                elif indicator_type == "STOCHASTIC":
-                    period = params.get("period", 14)
-                    stoch = ConditionEvaluator.calculate_stochastic(highs, lows, prices, period)
-                    if stoch:
-                        indicator_values["STOCH_K"] = stoch["k"]
-                        indicator_values["STOCH_D"] = stoch["d"]
+                if series:
+                    symbol, timeframe, bar_time = series
+                    values = indicator_cache.get_or_compute(
+                        symbol, timeframe, f"condition:{indicator_type}", params, bar_time,
+                        lambda: ConditionEvaluator.calculate_indicator(indicator_type, params, prices, highs, lows)
+                    )
+                else:
+                    values = ConditionEvaluator.calculate_indicator(indicator_type, params, prices, highs, lows)
+                indicator_values.update(values)
                         
             except Exception as e:
                 logger.error(f"Error calculating {indicator_type}: {e}")
@@ -259,6 +298,20 @@ class ConditionEvaluator:
         
         return indicator_values
     
+    @staticmethod
+    def calculate_plan_values(plan: CompiledIndicator, prices: List[float], highs: List[float],
+                              lows: List[float], series: Optional[Tuple[str, str, Any]] = None) -> List[float]:
+        """
+        Compute the inputs a compiled plan needs and return them in slot order
+        (NaN for values without enough data)
+        """
+        computed = []
+        for indicator_type, params in plan.inputs:
+            computed.append(ConditionEvaluator.calculate_all_indicators(
+                prices, highs, lows, [{"type": indicator_type, "params": params}], series
+            ))
+        return [computed[input_index].get(name, math.nan) for input_index, name in plan.slots]
+    
     @staticmethod
     def evaluate_indicator(indicator: Dict, market_data: Dict) -> Optional[str]:
         """
@@ -270,46 +323,182 @@ class ConditionEvaluator:
             prices = market_data.get("close_prices", [])
             highs = market_data.get("high_prices", [])
             lows = market_data.get("low_prices", [])
-            current_price = prices[-1] if prices else 0
             
             if not prices or len(prices) < 20:
                 logger.warning("Insufficient market data for evaluation")
                 return None
             
-            # Calculate all indicators
-            indicator_configs = indicator.get("indicators", [])
-            indicator_values = ConditionEvaluator.calculate_all_indicators(
-                prices, highs, lows, indicator_configs
-            )
-            
-            logger.info(f"Calculated indicator values: {indicator_values}")
+            # Calculate the plan's inputs (shared per symbol/timeframe/bar when the bar time is known)
+            series = None
+            if market_data.get("bar_time") is not None:
+                series = (market_data.get("symbol"), market_data.get("timeframe"), market_data["bar_time"])
             
-            # Evaluate BUY conditions
-            buy_conditions = indicator.get("buy_conditions", [])
-            buy_logic = indicator.get("buy_logic", "AND")
+            plan = plan_cache.get(indicator)
+            values = ConditionEvaluator.calculate_plan_values(plan, prices, highs, lows, series)
             
-            if buy_conditions:
-                buy_signal = ConditionEvaluator.evaluate_conditions(
-                    buy_conditions, indicator_values, current_price, buy_logic
-                )
-                if buy_signal:
-                    logger.info(f"✅ BUY signal generated for {indicator['name']}")
-                    return "BUY"
-            
-            # Evaluate SELL conditions
-            sell_conditions = indicator.get("sell_conditions", [])
-            sell_logic = indicator.get("sell_logic", "AND")
+            logger.info(f"Calculated indicator values: {dict(zip((name for _, name in plan.slots), values))}")
             
-            if sell_conditions:
-                sell_signal = ConditionEvaluator.evaluate_conditions(
-                    sell_conditions, indicator_values, current_price, sell_logic
-                )
-                if sell_signal:
-                    logger.info(f"✅ SELL signal generated for {indicator['name']}")
-                    return "SELL"
+            previous = None
+            if plan.needs_previous:
+                # Previous bar values for cross detection, kept per (indicator, symbol, timeframe)
+                seed = lambda: ConditionEvaluator.calculate_plan_values(plan, prices[:-1], highs[:-1], lows[:-1])
+                if series:
+                    key = (plan.indicator_id, series[0], series[1])
+                    previous = cross_state.roll(key, series[2], values, seed)
+                else:
+                    previous = seed()
             
-            return None
+            signal = plan.evaluate(values, previous)
+            if signal and plan.needs_previous and series and not cross_state.claim(key, series[2]):
+                logger.info(f"Cross for {indicator['name']} already signalled on this bar")
+                return None
+            if signal:
+                logger.info(f"✅ {signal} signal generated for {indicator['name']}")
+            return signal
             
         except Exception as e:
             logger.error(f"Error evaluating indicator: {e}")
             return None
+    
+    # ==================== BATCH EVALUATION (N indicators x M symbols) ====================
+    
+    @staticmethod
+    def calculate_indicator_matrix(indicator_type: str, params: Dict, closes: np.ndarray,
+                                   highs: np.ndarray, lows: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Vectorized counterpart of calculate_indicator for a (symbols x bars) price matrix.
+        Returns dict of indicator_name: (symbols x 2) array of [previous bar, latest bar]
+        values (NaN if not enough data). The previous bar is used for cross detection.
+        """
+        if indicator_type == "RSI":
+            period = params.get("period", 14)
+            return {"RSI": indicator_engine.rsi(closes, period)[..., -2:]}
+        
+        elif indicator_type == "SMA":
+            period = params.get("period", 20)
+            return {"SMA": indicator_engine.sma(closes, period)[..., -2:]}
+        
+        elif indicator_type == "EMA":
+            period = params.get("period", 20)
+            return {"EMA": indicator_engine.ema(closes, period)[..., -2:]}
+        
+        elif indicator_type == "MACD":
+            # Same simplification as calculate_macd: signal line == MACD line
+            fast, slow = params.get("fast", 12), params.get("slow", 26)
+            macd_line = indicator_engine.ema(closes, fast)[..., -2:] - indicator_engine.ema(closes, slow)[..., -2:]
+            return {
+                "MACD": macd_line,
+                "MACD_SIGNAL": macd_line,
+                "MACD_HISTOGRAM": macd_line - macd_line
+            }
+        
+        elif indicator_type == "BOLLINGER":
+            period = params.get("period", 20)
+            std_dev = params.get("std_dev", 2.0)
+            bb = indicator_engine.bollinger_bands(closes, period, std_dev)
+            return {
+                "BB_UPPER": bb["upper"][..., -2:],
+                "BB_MIDDLE": bb["middle"][..., -2:],
+                "BB_LOWER": bb["lower"][..., -2:]
+            }
+        
+        elif indicator_type == "STOCHASTIC":
+            period = params.get("period", 14)
+            k = indicator_engine.stochastic(highs, lows, closes, period)["k"][..., -2:]
+            # Same simplification as calculate_stochastic: %D == %K
+            return {"STOCH_K": k, "STOCH_D": k}
+        
+        return {}
+    
+    @staticmethod
+    def cached_indicator_matrix(indicator_type: str, params: Dict, closes: np.ndarray,
+                                highs: np.ndarray, lows: np.ndarray,
+                                series: Tuple[Sequence[str], str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+        """
+        calculate_indicator_matrix through the indicator cache: each symbol's [previous, latest]
+        values are stored per (symbol, timeframe, bar_time), so later batches and later checks
+        of the same bar reuse them. The matrix is computed once, on the first symbol that misses.
+        """
+        symbols, timeframe, bar_times = series
+        computed = {}
+        
+        def symbol_values(row: int) -> Dict[str, np.ndarray]:
+            if "matrix" not in computed:
+                computed["matrix"] = ConditionEvaluator.calculate_indicator_matrix(
+                    indicator_type, params, closes, highs, lows
+                )
+            return {name: values[row].copy() for name, values in computed["matrix"].items()}
+        
+        rows = [
+            indicator_cache.get_or_compute(
+                symbol, timeframe, f"matrix:{indicator_type}", params, bar_time,
+                lambda row=row: symbol_values(row)
+            )
+            for row, (symbol, bar_time) in enumerate(zip(symbols, bar_times))
+        ]
+        return {name: np.stack([values[name] for values in rows]) for name in rows[0]} if rows else {}
+    
+    @staticmethod
+    def evaluate_batch(indicators: List[Dict], close_matrix, high_matrix=None,
+                       low_matrix=None, series: Optional[Tuple[Sequence[str], str, Sequence[Any]]] = None) -> np.ndarray:
+        """
+        Evaluate N custom indicators against M symbols at once.
+        
+        close_matrix/high_matrix/low_matrix: (M symbols x bars) price arrays, oldest bar first.
+        Every distinct indicator config (type + params) is computed once for all symbols.
+        series: optional (symbols, timeframe, bar_times), one symbol and bar time per matrix row.
+        When given, indicator values are shared through the indicator cache per symbol and bar.
+        Crosses compare the last two bars of the matrix. A caller checking the same bar more
+        than once keeps them edge-triggered with cross_state.claim (see signal_worker).
+        
+        Returns an (N x M) object array of "BUY", "SELL" or None, with the same
+        precedence as evaluate_indicator (BUY conditions are checked first).
+        """
+        closes = indicator_engine.as_prices(close_matrix)
+        if closes.ndim == 1:
+            closes = closes[None, :]
+        highs = closes if high_matrix is None else indicator_engine.as_prices(high_matrix).reshape(closes.shape)
+        lows = closes if low_matrix is None else indicator_engine.as_prices(low_matrix).reshape(closes.shape)
+        
+        symbol_count, bars = closes.shape
+        signals = np.full((len(indicators), symbol_count), None, dtype=object)
+        
+        if bars < 20:
+            logger.warning("Insufficient market data for batch evaluation")
+            return signals
+        
+        # One column set per distinct indicator config, shared by every custom indicator using it
+        columns: Dict[Tuple, Dict[str, np.ndarray]] = {}
+        missing = np.full((symbol_count, 2), np.nan)
+        
+        for row, indicator in enumerate(indicators):
+            plan = plan_cache.get(indicator)
+            
+            computed = []
+            for indicator_type, params in plan.inputs:
+                key = (indicator_type, normalize_params(params))
+                if key not in columns:
+                    try:
+                        if series:
+                            columns[key] = ConditionEvaluator.cached_indicator_matrix(
+                                indicator_type, params, closes, highs, lows, series
+                            )
+                        else:
+                            columns[key] = ConditionEvaluator.calculate_indicator_matrix(
+                                indicator_type, params, closes, highs, lows
+                            )
+                    except Exception as e:
+                        logger.error(f"Error calculating {indicator_type}: {e}")
+                        columns[key] = {}
+                computed.append(columns[key])
+            
+            pairs = [computed[input_index].get(name, missing) for input_index, name in plan.slots]
+            buy, sell = plan.evaluate_vector(
+                [pair[:, 1] for pair in pairs], [pair[:, 0] for pair in pairs], symbol_count
+            )
+            signals[row, buy] = "BUY"
+            signals[row, sell] = "SELL"
+        
+        logger.info(f"Batch evaluated {len(indicators)} indicators x {symbol_count} symbols "
+                    f"({len(columns)} distinct indicator configs)")
+        return signals
@@ -0,0 +1,392 @@
+"""
+Economic Calendar Snapshot
+The live economic calendar (ForexFactory -> FMP -> mock) is fetched by ONE background
+job and shared by every worker, so user traffic never reaches the upstream APIs.
+
+- The leader of the "economic_calendar" job (see leader_election) refreshes the calendar
+  every CALENDAR_REFRESH_SECONDS and stores it in Mongo (economic_calendar, _id "current")
+- Every API worker keeps the snapshot in memory and picks up new versions from Mongo
+  every CALENDAR_SYNC_SECONDS; requests only ever read memory
+- Each snapshot carries an ETag (hash of its events) for conditional requests; an
+  unchanged calendar keeps its ETag across refreshes
+- A failed refresh keeps the previous snapshot; snapshots older than CALENDAR_TTL_SECONDS
+  are still served but reported as stale
+- CALENDAR_FIXTURE_FILE replaces the upstream APIs with a local ForexFactory-format
+  JSON file (python economic_calendar.py --write-fixture calendar.json)
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_REFRESH_SECONDS = float(os.getenv("CALENDAR_REFRESH_SECONDS", "600"))
+CALENDAR_SYNC_SECONDS = float(os.getenv("CALENDAR_SYNC_SECONDS", "30"))
+CALENDAR_TTL_SECONDS = float(os.getenv("CALENDAR_TTL_SECONDS", "3600"))
+CALENDAR_FIXTURE_FILE = os.getenv("CALENDAR_FIXTURE_FILE")
+
+FOREX_FACTORY_URL = os.getenv("FOREX_FACTORY_URL", "https://nfs.faireconomy.media/ff_calendar_thisweek.json")
+FMP_NEWS_URL = os.getenv("FMP_NEWS_URL", "https://financialmodelingprep.com/api/v3/stock_news")
+
+SNAPSHOT_ID = "current"
+SOURCE_MOCK = "mock_calendar"
+
+
+# ============================================================================
+# UPSTREAM SOURCES
+# ============================================================================
+
+def parse_forex_factory(ff_data: List[Dict]) -> List[Dict]:
+    """ForexFactory calendar items -> news events (Low impact skipped)"""
+    formatted_events = []
+    for item in ff_data[:30]:  # Limit to 30 items
+        try:
+            event_date = item.get("date", "")
+            impact = item.get("impact", "Medium")
+
+            # Skip low impact events
+            if impact == "Low":
+                continue
+
+            formatted_events.append({
+                "id": f"ff_{item.get('title', '').replace(' ', '_')}_{event_date}",
+                "title": item.get("title", "Economic Event")[:100],
+                "event_time": event_date,
+                "event_datetime": event_date,
+                "currency": item.get("country", "USD")[:10],
+                "impact": impact,
+                "signal": None,
+                "created_at": datetime.utcnow().isoformat(),
+                "source": "forex_factory",
+                "description": f"Forecast: {item.get('forecast', 'N/A')}, Previous: {item.get('previous', 'N/A')}"
+            })
+        except Exception as e:
+            logger.error(f"Error parsing ForexFactory item: {str(e)}")
+    return formatted_events
+
+
+def parse_fmp_news(news_items: List[Dict], now: datetime) -> List[Dict]:
+    """FMP stock news -> news events from the last 24 hours to the next 7 days"""
+    formatted_events = []
+    for item in news_items[:30]:  # Limit to 30 items
+        try:
+            published_at = datetime.strptime(item.get("publishedDate", ""), "%Y-%m-%d %H:%M:%S")
+
+            time_diff = (published_at - now).total_seconds() / 3600  # hours
+            if time_diff < -24 or time_diff > 168:  # -24h to +7 days
+                continue
+
+            # Determine impact based on presence in title/description
+            title = item.get("title", "").lower()
+            impact = "Medium"
+            if any(word in title for word in ["breaking", "fed", "inflation", "gdp", "rate", "employment", "earnings", "crash", "surge"]):
+                impact = "High"
+            elif any(word in title for word in ["update", "comment", "opinion", "analysis"]):
+                impact = "Low"
+
+            currency = item.get("symbol", "MARKET")
+            if not currency or len(currency) > 10:
+                currency = "GENERAL"
+
+            formatted_events.append({
+                "id": f"fmp_{item.get('url', '').split('/')[-1]}",
+                "title": item.get("title", "Market News")[:100],
+                "event_time": published_at.strftime("%H:%M UTC"),
+                "event_datetime": published_at.isoformat(),
+                "currency": currency[:10],
+                "impact": impact,
+                "signal": None,
+                "created_at": datetime.utcnow().isoformat(),
+                "source": "fmp_news",
+                "description": item.get("text", "")[:200],
+                "url": item.get("url", ""),
+                "site": item.get("site", "")
+            })
+        except Exception as e:
+            logger.error(f"Error parsing FMP news item: {str(e)}")
+    return formatted_events
+
+
+def mock_events(now: datetime) -> List[Dict]:
+    """10 placeholder events over the next days, used only while no real calendar was ever fetched"""
+    mock_titles = [
+        "Fed Interest Rate Decision Expected Today",
+        "US Dollar Strengthens Against Major Currencies",
+        "European Central Bank Policy Meeting",
+        "Oil Prices Surge on Supply Concerns",
+        "Tech Stocks Rally on Strong Earnings",
+        "Gold Reaches New High Amid Market Uncertainty",
+        "US Employment Report Shows Job Growth",
+        "Bitcoin Trading Volume Increases Significantly",
+        "EUR/USD Hits Key Support Level",
+        "Asian Markets Open Higher on Economic Data"
+    ]
+    currencies = ["USD", "EUR", "GBP", "JPY", "AUD", "NZD", "CAD", "CHF", "GOLD", "OIL"]
+    impacts = ["High", "High", "Medium", "High", "Medium", "High", "High", "Medium", "Medium", "Medium"]
+
+    events = []
+    for i in range(10):
+        event_time = now + timedelta(hours=i * 6 + 2)  # Events every 6 hours
+        events.append({
+            "id": f"mock_news_{i}_{int(event_time.timestamp())}",
+            "title": mock_titles[i],
+            "event_time": event_time.strftime("%H:%M UTC"),
+            "event_datetime": event_time.isoformat(),
+            "currency": currencies[i],
+            "impact": impacts[i],
+            "signal": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "source": SOURCE_MOCK,
+            "description": f"Mock trading event for {currencies[i]} - {mock_titles[i]}",
+            "url": ""
+        })
+    return events
+
+
+def load_fixture(path: str) -> List[Dict]:
+    with open(path) as f:
+        return parse_forex_factory(json.load(f))
+
+
+async def fetch_calendar() -> Tuple[List[Dict], str]:
+    """
+    Fetch the calendar from upstream. Returns (events, source)
+    Priority: fixture file (if configured) -> ForexFactory JSON -> FMP API -> mock data
+    """
+    now = datetime.utcnow()
+
+    if CALENDAR_FIXTURE_FILE:
+        return load_fixture(CALENDAR_FIXTURE_FILE), "fixture"
+
+    try:
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            response = await client.get(FOREX_FACTORY_URL, headers={"User-Agent": "Mozilla/5.0"})
+        if response.status_code == 200:
+            events = parse_forex_factory(response.json())
+            if events:
+                logger.info(f"✅ Fetched {len(events)} events from ForexFactory")
+                return events, "forex_factory"
+        else:
+            logger.warning(f"ForexFactory API returned {response.status_code}")
+    except Exception as ff_error:
+        logger.warning(f"ForexFactory API failed: {str(ff_error)}")
+
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(FMP_NEWS_URL, params={"limit": 50, "apikey": "demo"})
+        if response.status_code == 200:
+            events = parse_fmp_news(response.json(), now)
+            if events:
+                logger.info(f"✅ Fetched {len(events)} market news events from FMP")
+                return events, "fmp_news"
+        else:
+            logger.warning(f"FMP API returned {response.status_code}")
+    except Exception as api_error:
+        logger.warning(f"FMP API failed: {str(api_error)}")
+
+    logger.info("Using mock news data as the calendar APIs are unavailable")
+    return mock_events(now), SOURCE_MOCK
+
+
+def compute_etag(events: List[Dict]) -> str:
+    """Content hash of the events, ignoring the per-fetch created_at stamp"""
+    content = [{k: v for k, v in event.items() if k != "created_at"} for event in events]
+    digest = hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+# ============================================================================
+# SNAPSHOT
+# ============================================================================
+
+class CalendarSnapshot:
+    """In-memory copy of the shared calendar snapshot of this process"""
+
+    def __init__(self, ttl_seconds: float = CALENDAR_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._events: List[Dict] = []
+        self.etag: Optional[str] = None
+        self.source: Optional[str] = None
+        self.fetched_at: Optional[datetime] = None
+        self.refreshed_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.reads = 0
+        self.loads = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        # Called by the refresher after every successful refresh (e.g. to rebuild derived data)
+        self.on_refresh: Optional[Callable[[], Awaitable]] = None
+
+    def events(self) -> List[Dict]:
+        """Copies of the snapshot events (callers annotate them with mentor signals)"""
+        self.reads += 1
+        return [dict(event) for event in self._events]
+
+    def age_seconds(self) -> Optional[float]:
+        if self.refreshed_at is None:
+            return None
+        return (datetime.utcnow() - self.refreshed_at).total_seconds()
+
+    @property
+    def stale(self) -> bool:
+        age = self.age_seconds()
+        return age is None or age > self.ttl_seconds
+
+    def apply(self, doc: Dict):
+        """Adopt a snapshot document (as stored in Mongo)"""
+        self._events = doc.get("events", [])
+        self.etag = doc.get("etag")
+        self.source = doc.get("source")
+        self.fetched_at = doc.get("fetched_at")
+        self.refreshed_at = doc.get("refreshed_at")
+        self.last_error = doc.get("last_error")
+        self.loads += 1
+
+    async def sync(self, db) -> bool:
+        """Load the stored snapshot if it differs from ours. Returns True if a new version was loaded"""
+        doc = await db.economic_calendar.find_one(
+            {"_id": SNAPSHOT_ID, "$or": [{"etag": {"$ne": self.etag}}, {"refreshed_at": {"$ne": self.refreshed_at}}]}
+        )
+        if doc is None:
+            return False
+        changed = doc.get("etag") != self.etag
+        self.apply(doc)
+        return changed
+
+    async def refresh(self, db) -> bool:
+        """
+        Fetch from upstream and store the result as the shared snapshot.
+        A failed fetch (or a mock fallback while a real calendar exists) keeps the previous events.
+        Returns True if the calendar content changed.
+        """
+        now = datetime.utcnow()
+        current = await db.economic_calendar.find_one({"_id": SNAPSHOT_ID}) or {}
+        try:
+            events, source = await fetch_calendar()
+            error = None
+        except Exception as e:
+            events, source, error = [], None, str(e)
+
+        keep_previous = current.get("events") and (not events or (source == SOURCE_MOCK and current.get("source") != SOURCE_MOCK))
+        if keep_previous:
+            self.refresh_failures += 1
+            error = error or f"upstream unavailable ({source or 'no events'})"
+            logger.warning(f"⚠️ Economic calendar refresh failed, keeping snapshot from {current.get('fetched_at')}: {error}")
+            await db.economic_calendar.update_one({"_id": SNAPSHOT_ID}, {"$set": {"last_error": error, "last_attempt_at": now}})
+            current.update({"last_error": error, "last_attempt_at": now})
+            self.apply(current)
+            return False
+
+        etag = compute_etag(events)
+        changed = etag != current.get("etag")
+        doc = {
+            "_id": SNAPSHOT_ID,
+            # An unchanged calendar keeps its original events (and created_at stamps)
+            "events": events if changed else current["events"],
+            "etag": etag,
+            "source": source,
+            "fetched_at": now if changed else current.get("fetched_at", now),
+            "refreshed_at": now,
+            "last_attempt_at": now,
+            "last_error": error
+        }
+        await db.economic_calendar.replace_one({"_id": SNAPSHOT_ID}, doc, upsert=True)
+        self.apply(doc)
+        self.refreshes += 1
+        logger.info(f"📅 Economic calendar refreshed from {source}: {len(events)} events"
+                    f"{'' if changed else ' (unchanged)'}")
+        if self.on_refresh is not None:
+            try:
+                await self.on_refresh()
+            except Exception as e:
+                logger.error(f"Error after economic calendar refresh: {e}")
+        return changed
+
+    def stats(self) -> Dict:
+        return {
+            "events": len(self._events),
+            "etag": self.etag,
+            "source": self.source,
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            "age_seconds": round(self.age_seconds(), 1) if self.refreshed_at else None,
+            "stale": self.stale,
+            "last_error": self.last_error,
+            "reads": self.reads,
+            "loads": self.loads,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures
+        }
+
+
+# Global snapshot of this process
+calendar_snapshot = CalendarSnapshot()
+
+
+async def run_refresher(db, interval: float = CALENDAR_REFRESH_SECONDS):
+    """Leader job: refresh the shared snapshot whenever it is older than the interval"""
+    while True:
+        try:
+            await calendar_snapshot.sync(db)
+            age = calendar_snapshot.age_seconds()
+            if age is None or age >= interval:
+                await calendar_snapshot.refresh(db)
+                age = 0
+        except Exception as e:
+            logger.error(f"Economic calendar refresher error: {e}")
+            age = 0
+        await asyncio.sleep(max(1.0, interval - age))
+
+
+async def run_sync(db, interval: float = CALENDAR_SYNC_SECONDS):
+    """Every worker: pick up snapshots stored by the refresher"""
+    while True:
+        try:
+            if await calendar_snapshot.sync(db):
+                logger.info(f"📅 Loaded economic calendar {calendar_snapshot.etag} ({calendar_snapshot.stats()['events']} events)")
+        except Exception as e:
+            logger.error(f"Economic calendar sync error: {e}")
+        await asyncio.sleep(interval)
+
+
+# ============================================================================
+# FIXTURE / SELF-TEST
+# ============================================================================
+
+def sample_fixture(now: Optional[datetime] = None) -> List[Dict]:
+    """ForexFactory-format calendar for the coming days"""
+    now = now or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    rows = [
+        ("Non-Farm Employment Change", "USD", "High", "180K", "175K"),
+        ("Main Refinancing Rate", "EUR", "High", "4.25%", "4.25%"),
+        ("CPI y/y", "GBP", "High", "2.1%", "2.3%"),
+        ("Retail Sales m/m", "AUD", "Medium", "0.3%", "0.1%"),
+        ("BOJ Press Conference", "JPY", "High", "", ""),
+        ("Bank Holiday", "CHF", "Low", "", ""),
+    ]
+    return [{
+        "title": title,
+        "country": country,
+        "date": (now + timedelta(hours=4 * i + 1)).strftime("%Y-%m-%dT%H:%M:%S"),
+        "impact": impact,
+        "forecast": forecast,
+        "previous": previous
+    } for i, (title, country, impact, forecast, previous) in enumerate(rows)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Economic calendar snapshot")
+    parser.add_argument("--write-fixture", metavar="PATH", help="write a ForexFactory-format fixture for CALENDAR_FIXTURE_FILE")
+    args = parser.parse_args()
+
+    if args.write_fixture:
+        with open(args.write_fixture, "w") as f:
+            json.dump(sample_fixture(), f, indent=2)
+        print(f"Wrote {args.write_fixture}")
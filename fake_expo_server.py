@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Fake Expo Push API for local testing of push_service
+- POST /--/api/v2/push/send         -> one ticket per message, 400 for more than 100 messages
+- POST /--/api/v2/push/getReceipts  -> receipts for previously issued tickets
+Tokens containing "unregistered" get DeviceNotRegistered; --fail-rate returns
+random 429/503 responses to exercise retries (with a Retry-After header when
+--retry-after is set).
+
+Usage:
+    python fake_expo_server.py --port 8765 [--fail-rate 0.2]
+    EXPO_PUSH_URL=http://localhost:8765/--/api/v2/push/send \\
+    EXPO_RECEIPTS_URL=http://localhost:8765/--/api/v2/push/getReceipts uvicorn server:app
+
+tests/test_push_service.py runs push_service against it in-process.
+"""
+import argparse
+import os
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+state = {"fail_rate": 0.0, "retry_after": None, "requests": 0, "messages": 0, "throttled": 0, "max_batch": 0, "tickets": {}}
+
+
+def device_not_registered(token: str) -> dict:
+    return {
+        "status": "error",
+        "message": f"\"{token}\" is not a registered push notification recipient",
+        "details": {"error": "DeviceNotRegistered"}
+    }
+
+
+@app.post("/--/api/v2/push/send")
+async def push_send(request: Request):
+    messages = await request.json()
+    messages = messages if isinstance(messages, list) else [messages]
+    state["requests"] += 1
+
+    if random.random() < state["fail_rate"]:
+        state["throttled"] += 1
+        headers = {"Retry-After": str(state["retry_after"])} if state["retry_after"] else None
+        return JSONResponse({"errors": [{"code": "TOO_MANY_REQUESTS"}]}, status_code=random.choice([429, 503]),
+                            headers=headers)
+    if len(messages) > 100:
+        return JSONResponse({"errors": [{"code": "PUSH_TOO_MANY_NOTIFICATIONS"}]}, status_code=400)
+
+    state["messages"] += len(messages)
+    state["max_batch"] = max(state["max_batch"], len(messages))
+    tickets = []
+    for message in messages:
+        if "unregistered" in message["to"]:
+            tickets.append(device_not_registered(message["to"]))
+        else:
+            ticket_id = str(uuid.uuid4())
+            state["tickets"][ticket_id] = message["to"]
+            tickets.append({"status": "ok", "id": ticket_id})
+    return {"data": tickets}
+
+
+@app.post("/--/api/v2/push/getReceipts")
+async def push_receipts(request: Request):
+    ids = (await request.json()).get("ids", [])
+    return {"data": {ticket_id: {"status": "ok"} for ticket_id in ids if ticket_id in state["tickets"]}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Expo Push API")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_EXPO_PORT", "8765")))
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, help="Retry-After seconds sent with throttled responses")
+    args = parser.parse_args()
+
+    state["fail_rate"] = args.fail_rate
+    state["retry_after"] = args.retry_after
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
@@ -0,0 +1,121 @@
+"""
+Shared Indicator Cache
+Memoizes indicator results per (symbol, timeframe, indicator type, params, last bar time)
+so EAs and subscriptions watching the same market share one computation.
+
+- Entries for a series are dropped as soon as a newer bar is seen for it
+- Bounded LRU so rarely used parameter combinations do not pile up
+- Hit/miss/eviction counters for monitoring
+"""
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("INDICATOR_CACHE_MAX_ENTRIES", "4096"))
+
+
+def normalize_params(params: Optional[Dict]) -> Tuple:
+    """
+    Turn a params dict into a hashable, order-independent key.
+    Numbers are compared by value (14 == 14.0) and None values are dropped.
+    """
+    if not params:
+        return ()
+
+    items = []
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            value = normalize_params(value)
+        elif isinstance(value, (list, tuple)):
+            value = tuple(normalize_params(v) if isinstance(v, dict) else v for v in value)
+        elif isinstance(value, bool):
+            pass
+        elif isinstance(value, (int, float)):
+            value = float(value)
+        items.append((str(name), value))
+    return tuple(sorted(items))
+
+
+class IndicatorCache:
+    """Bounded LRU of indicator results, invalidated per series when a new bar arrives"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._series_bar: Dict[Tuple[str, str], Any] = {}  # (symbol, timeframe) -> latest bar time
+        self._series_keys: Dict[Tuple[str, str], set] = {}  # (symbol, timeframe) -> cache keys
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _advance_series(self, series: Tuple[str, str], bar_time: Hashable) -> bool:
+        """Record the bar time for a series; returns False if bar_time is older than the latest seen"""
+        latest = self._series_bar.get(series)
+        if latest is None or bar_time > latest:
+            if latest is not None:
+                # New bar: everything computed for the previous bar is stale
+                for key in self._series_keys.pop(series, ()):
+                    if self._entries.pop(key, None) is not None:
+                        self.invalidations += 1
+            self._series_bar[series] = bar_time
+            return True
+        return bar_time == latest
+
+    def _evict_lru(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            keys = self._series_keys.get((key[0], key[1]))
+            if keys is not None:
+                keys.discard(key)
+            self.evictions += 1
+
+    def get_or_compute(self, symbol: str, timeframe: str, indicator_type: str,
+                       params: Optional[Dict], bar_time: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for this indicator on the given bar, computing it on a miss.
+        Results for bars older than the latest seen bar are computed but never stored.
+        """
+        series = (symbol, timeframe)
+        current = self._advance_series(series, bar_time)
+        key = (symbol, timeframe, indicator_type, normalize_params(params), bar_time)
+
+        if current and key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        value = compute()
+        if current:
+            self._entries[key] = value
+            self._series_keys.setdefault(series, set()).add(key)
+            self._evict_lru()
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._series_bar.clear()
+        self._series_keys.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "series": len(self._series_bar),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+# Global cache instance shared by the API handlers and background loops of this process
+indicator_cache = IndicatorCache()
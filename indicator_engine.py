@@ -0,0 +1,215 @@
+"""
+Vectorized Indicator Engine
+NumPy implementations of the technical indicators used for signal generation.
+
+Every function takes contiguous float64 price arrays and returns the FULL
+indicator series in one pass. Arrays may be 1-D (one symbol) or 2-D
+(one row per symbol); the time axis is always the last axis.
+Positions without enough history are NaN.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Tuple
+
+# Largest exponent used by the blocked EMA recurrence (w ** -k stays below ~1e130)
+_EWM_EXP_LIMIT = 300.0
+_EWM_MAX_BLOCK = 4096
+
+
+def as_prices(values) -> np.ndarray:
+    """Convert a list/array of prices into a contiguous float64 array"""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _empty_series(x: np.ndarray) -> np.ndarray:
+    return np.full(x.shape, np.nan)
+
+
+def _rolling_sum(x: np.ndarray, period: int) -> np.ndarray:
+    """Rolling sum over the last axis, valid from index period-1 (length n-period+1)"""
+    base = x[..., :1]
+    csum = np.cumsum(x - base, axis=-1)
+    sums = csum[..., period - 1:].copy()
+    sums[..., 1:] -= csum[..., :-period]
+    return sums + base * period
+
+
+def _ewm(values: np.ndarray, alpha: float, seed: np.ndarray) -> np.ndarray:
+    """
+    Exponential recurrence y[i] = (1 - alpha) * y[i-1] + alpha * x[i] along the last axis,
+    starting from y[-1] = seed.
+
+    Solved in closed form block by block so there is no per-bar Python loop:
+    y[i] = w^(i+1) * seed + alpha * w^i * cumsum(x[j] * w^-j)
+    """
+    w = 1.0 - alpha
+    if w <= 0.0:
+        return values.copy()
+
+    block = int(_EWM_EXP_LIMIT / -np.log(w))
+    block = max(1, min(_EWM_MAX_BLOCK, block))
+
+    out = np.empty_like(values)
+    prev = np.asarray(seed, dtype=np.float64)
+    length = values.shape[-1]
+
+    # Power tables are shared by every block (the last one just uses a prefix)
+    idx = np.arange(min(block, length), dtype=np.float64)
+    growth = w ** -idx
+    decay = w ** idx
+    scale = decay * alpha
+    carry = decay * w
+
+    for start in range(0, length, block):
+        chunk = values[..., start:start + block]
+        k = chunk.shape[-1]
+        y = np.cumsum(chunk * growth[:k], axis=-1)
+        y *= scale[:k]
+        y += prev[..., None] * carry[:k]
+        out[..., start:start + k] = y
+        prev = y[..., -1]
+
+    return out
+
+
+def sma(prices, period: int) -> np.ndarray:
+    """Simple Moving Average series"""
+    x = as_prices(prices)
+    out = _empty_series(x)
+    if period <= 0 or x.shape[-1] < period:
+        return out
+
+    out[..., period - 1:] = _rolling_sum(x, period) / period
+    return out
+
+
+def ema(prices, period: int) -> np.ndarray:
+    """
+    Exponential Moving Average series.
+    Seeded with the SMA of the first `period` bars, like the list-based implementation.
+    """
+    x = as_prices(prices)
+    out = _empty_series(x)
+    if period <= 0 or x.shape[-1] < period:
+        return out
+
+    seed = x[..., :period].mean(axis=-1)
+    out[..., period - 1] = seed
+    if x.shape[-1] > period:
+        out[..., period:] = _ewm(x[..., period:], 2.0 / (period + 1), seed)
+    return out
+
+
+def rsi(prices, period: int = 14) -> np.ndarray:
+    """
+    Relative Strength Index series.
+    Uses the simple average of the last `period` gains/losses (same as TechnicalIndicators).
+    """
+    x = as_prices(prices)
+    out = _empty_series(x)
+    if period <= 0 or x.shape[-1] < period + 1:
+        return out
+
+    delta = np.diff(x, axis=-1)
+    gains = np.maximum(delta, 0.0)
+    losses = np.maximum(-delta, 0.0)
+
+    # Zero-padded running sums: a window with no losses differences to exactly 0.0
+    pad = np.zeros(delta.shape[:-1] + (1,))
+    gain_sums = np.cumsum(np.concatenate((pad, gains), axis=-1), axis=-1)
+    loss_sums = np.cumsum(np.concatenate((pad, losses), axis=-1), axis=-1)
+    sum_gain = gain_sums[..., period:] - gain_sums[..., :-period]
+    sum_loss = loss_sums[..., period:] - loss_sums[..., :-period]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - 100.0 / (1.0 + sum_gain / sum_loss)
+
+    out[..., period:] = np.where(sum_loss == 0, 100.0, values)
+    return out
+
+
+def macd(prices, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """MACD line, signal line (EMA of MACD) and histogram series"""
+    x = as_prices(prices)
+    macd_line = ema(x, fast) - ema(x, slow)
+    signal_line = _empty_series(x)
+
+    start = slow - 1
+    if signal > 0 and x.shape[-1] - start >= signal:
+        signal_line[..., start:] = ema(macd_line[..., start:], signal)
+
+    return {
+        "macd": macd_line,
+        "signal": signal_line,
+        "histogram": macd_line - signal_line
+    }
+
+
+def bollinger_bands(prices, period: int = 20, std_dev: float = 2.0) -> Dict[str, np.ndarray]:
+    """Bollinger Bands series (population standard deviation over the window)"""
+    x = as_prices(prices)
+    upper, middle, lower = _empty_series(x), _empty_series(x), _empty_series(x)
+    if period <= 0 or x.shape[-1] < period:
+        return {"upper": upper, "middle": middle, "lower": lower}
+
+    windows = sliding_window_view(x, period, axis=-1)
+    mean = windows.mean(axis=-1)
+    std = windows.std(axis=-1)
+
+    middle[..., period - 1:] = mean
+    upper[..., period - 1:] = mean + std_dev * std
+    lower[..., period - 1:] = mean - std_dev * std
+    return {"upper": upper, "middle": middle, "lower": lower}
+
+
+def rolling_max(values, period: int) -> np.ndarray:
+    """Highest value over the trailing window"""
+    x = as_prices(values)
+    out = _empty_series(x)
+    if period <= 0 or x.shape[-1] < period:
+        return out
+    out[..., period - 1:] = sliding_window_view(x, period, axis=-1).max(axis=-1)
+    return out
+
+
+def rolling_min(values, period: int) -> np.ndarray:
+    """Lowest value over the trailing window"""
+    x = as_prices(values)
+    out = _empty_series(x)
+    if period <= 0 or x.shape[-1] < period:
+        return out
+    out[..., period - 1:] = sliding_window_view(x, period, axis=-1).min(axis=-1)
+    return out
+
+
+def stochastic(highs, lows, closes, period: int = 14, k_smooth: int = 3) -> Dict[str, np.ndarray]:
+    """Stochastic Oscillator %K series and %D (SMA of %K) series"""
+    closes = as_prices(closes)
+    highest = rolling_max(highs, period)
+    lowest = rolling_min(lows, period)
+
+    span = highest - lowest
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = 100.0 * (closes - lowest) / span
+    k = np.where(span == 0, 50.0, k)
+
+    d = _empty_series(closes)
+    start = period - 1
+    if k_smooth > 0 and closes.shape[-1] - start >= k_smooth:
+        d[..., start:] = sma(k[..., start:], k_smooth)
+
+    return {"k": k, "d": d}
+
+
+def last_value(series: np.ndarray) -> float:
+    """Most recent value of a 1-D series as a plain float"""
+    return float(series[-1])
+
+
+def price_arrays(candles) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Build (closes, highs, lows) float64 arrays from a list of OHLC candle dicts"""
+    count = len(candles)
+    closes = np.fromiter((c["close"] for c in candles), dtype=np.float64, count=count)
+    highs = np.fromiter((c["high"] for c in candles), dtype=np.float64, count=count)
+    lows = np.fromiter((c["low"] for c in candles), dtype=np.float64, count=count)
+    return closes, highs, lows
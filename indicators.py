@@ -1,58 +1,37 @@
 import numpy as np
 from typing import List, Dict, Tuple
 
+import indicator_engine
+from indicator_engine import last_value
+
 class TechnicalIndicators:
-    """Calculate technical indicators for trading signals"""
+    """
+    Calculate technical indicators for trading signals.
+    History-scanning indicators (EMA, RSI) are thin wrappers over indicator_engine;
+    windowed ones only read the last `period` bars. Use indicator_engine directly for full series.
+    """
     
     @staticmethod
     def calculate_sma(prices: List[float], period: int) -> float:
         """Simple Moving Average"""
         if len(prices) < period:
-            return prices[-1] if prices else 0
-        return sum(prices[-period:]) / period
+            return prices[-1] if len(prices) else 0
+        # Only the trailing window is read, so no history scan to vectorize here
+        return float(sum(prices[-period:]) / period)
     
     @staticmethod
     def calculate_ema(prices: List[float], period: int) -> float:
         """Exponential Moving Average"""
         if len(prices) < period:
-            return prices[-1] if prices else 0
-        
-        multiplier = 2 / (period + 1)
-        ema = sum(prices[:period]) / period
-        
-        for price in prices[period:]:
-            ema = (price * multiplier) + (ema * (1 - multiplier))
-        
-        return ema
+            return prices[-1] if len(prices) else 0
+        return last_value(indicator_engine.ema(prices, period))
     
     @staticmethod
     def calculate_rsi(prices: List[float], period: int = 14) -> float:
         """Relative Strength Index"""
         if len(prices) < period + 1:
             return 50.0
-        
-        gains = []
-        losses = []
-        
-        for i in range(1, len(prices)):
-            change = prices[i] - prices[i-1]
-            if change > 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
-        
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
+        return last_value(indicator_engine.rsi(prices[-(period + 1):], period))
     
     @staticmethod
     def calculate_macd(prices: List[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, float]:
@@ -79,12 +58,12 @@ class TechnicalIndicators:
     def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: float = 2.0) -> Dict[str, float]:
         """Bollinger Bands"""
         if len(prices) < period:
-            price = prices[-1] if prices else 0
+            price = prices[-1] if len(prices) else 0
             return {"upper": price, "middle": price, "lower": price}
         
         sma = TechnicalIndicators.calculate_sma(prices, period)
         recent_prices = prices[-period:]
-        variance = sum((x - sma) ** 2 for x in recent_prices) / period
+        variance = float(sum((x - sma) ** 2 for x in recent_prices) / period)
         std = variance ** 0.5
         
         upper = sma + (std_dev * std)
@@ -103,9 +82,9 @@ class TechnicalIndicators:
         if len(closes) < period:
             return {"k": 50.0, "d": 50.0}
         
-        recent_high = max(highs[-period:])
-        recent_low = min(lows[-period:])
-        current_close = closes[-1]
+        recent_high = float(max(highs[-period:]))
+        recent_low = float(min(lows[-period:]))
+        current_close = float(closes[-1])
         
         if recent_high == recent_low:
             k = 50.0
@@ -71,6 +71,7 @@ async def init_database():
     await db.eas.create_index("user_id")
     await db.user_activity.create_index("user_id")
     await db.user_activity.create_index("timestamp")
+    await db.user_indicator_subscriptions.create_index([("status", 1), ("next_check_at", 1)])
     print("✅ Indexes created")
     
     print("\n✅ Database initialization complete!")
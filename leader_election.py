@@ -0,0 +1,130 @@
+"""
+Leader Election
+Lease-based election in Mongo so each background job runs in exactly one process,
+even with `uvicorn --workers 4` or a separate background_jobs.py process.
+
+- One document per job in leader_leases: {_id: job name, owner, expires_at, heartbeat_at}
+- The leader renews its lease every LEADER_RENEW_SECONDS; a lease not renewed for
+  LEADER_LEASE_SECONDS can be taken over by any other candidate (automatic failover)
+- A leader that cannot renew (lost lease or database errors past its lease) cancels its job
+- A TTL index on expires_at cleans up leases of jobs that are no longer run anywhere
+
+RUN_BACKGROUND_JOBS=false keeps API workers out of the election entirely
+(run `python background_jobs.py` instead).
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", "30"))
+LEADER_RENEW_SECONDS = float(os.getenv("LEADER_RENEW_SECONDS", "10"))
+RUN_BACKGROUND_JOBS = os.getenv("RUN_BACKGROUND_JOBS", "true").lower() == "true"
+
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class LeaderLease:
+    """Lease on one job name, held by this process while renewed"""
+
+    def __init__(self, db, name: str, owner: str = PROCESS_ID, lease_seconds: float = LEADER_LEASE_SECONDS):
+        self.db = db
+        self.name = name
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+
+    async def acquire(self) -> bool:
+        """Take the lease if it is free, expired or already ours (renewal). Returns True if we hold it"""
+        now = datetime.utcnow()
+        try:
+            lease = await self.db.leader_leases.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {
+                    "$set": {
+                        "owner": self.owner,
+                        "expires_at": now + timedelta(seconds=self.lease_seconds),
+                        "heartbeat_at": now
+                    },
+                    "$setOnInsert": {"acquired_at": now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Held by another live owner: the upsert tried to insert a second lease document
+            return False
+        return lease is not None and lease.get("owner") == self.owner
+
+    async def release(self):
+        await self.db.leader_leases.delete_one({"_id": self.name, "owner": self.owner})
+
+
+async def ensure_lease_index(db):
+    await db.leader_leases.create_index("expires_at", expireAfterSeconds=int(LEADER_LEASE_SECONDS * 10))
+
+
+async def run_as_leader(db, name: str, job: Callable[[], Awaitable], renew_seconds: float = LEADER_RENEW_SECONDS):
+    """
+    Campaign for `name` forever; run job() only while holding its lease.
+    The job is cancelled as soon as leadership is lost, and restarted if it exits while we lead.
+    """
+    lease = LeaderLease(db, name)
+    task = None
+    last_renewed = 0.0
+
+    try:
+        while True:
+            try:
+                leading = await lease.acquire()
+                if leading:
+                    last_renewed = time.monotonic()
+            except Exception as e:
+                logger.error(f"Leader election error for {name}: {e}")
+                # Keep running only while our last successful renewal is still within the lease
+                leading = task is not None and time.monotonic() - last_renewed < lease.lease_seconds
+
+            if leading and (task is None or task.done()):
+                if task is None:
+                    logger.info(f"👑 {PROCESS_ID} is now leader for {name}")
+                elif not task.cancelled() and task.exception():
+                    logger.error(f"Leader job {name} crashed: {task.exception()}, restarting")
+                task = asyncio.create_task(job())
+            elif not leading and task is not None:
+                logger.warning(f"⚠️ {PROCESS_ID} lost leadership for {name}, stopping job")
+                task.cancel()
+                task = None
+
+            await asyncio.sleep(renew_seconds)
+    finally:
+        if task is not None:
+            task.cancel()
+            try:
+                await lease.release()
+            except Exception:
+                pass
+
+
+def start_leader_jobs(db, jobs: Dict[str, Callable[[], Awaitable]]) -> List[asyncio.Task]:
+    """Start one election loop per job"""
+    return [asyncio.create_task(run_as_leader(db, name, job)) for name, job in jobs.items()]
+
+
+async def list_leases(db) -> List[Dict]:
+    now = datetime.utcnow()
+    leases = await db.leader_leases.find().to_list(length=100)
+    return [{
+        "job": lease["_id"],
+        "owner": lease.get("owner"),
+        "alive": lease.get("expires_at") is not None and lease["expires_at"] > now,
+        "heartbeat_at": lease.get("heartbeat_at"),
+        "expires_at": lease.get("expires_at")
+    } for lease in leases]
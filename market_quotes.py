@@ -0,0 +1,236 @@
+"""
+Market Quote Snapshot
+Real-time quotes (Finnhub, CoinGecko) are fetched by ONE background job and shared by
+every worker, so /quotes, /signals/{symbol} and /market-status never wait for the network
+and N workers do not keep N independent caches hitting the same upstream APIs.
+
+- The leader of the "quote_snapshot" job (see leader_election) refreshes every symbol
+  every QUOTE_REFRESH_SECONDS and stores the quotes in Mongo (quote_snapshot, _id "current")
+- Every API worker keeps the snapshot in memory and picks up new versions from Mongo
+  every QUOTE_SYNC_SECONDS; requests only ever read memory
+- Refreshes are single-flight: concurrent callers in a process share one fetch, and a
+  refresh lock on the stored document keeps other processes from fetching at the same time
+- A symbol the upstream did not return keeps its previous quote; every quote carries its
+  fetched_at, quotes older than QUOTE_STALE_SECONDS are flagged stale and quotes older
+  than QUOTE_MAX_AGE_SECONDS are dropped (readers fall back to simulated prices)
+- If the stored snapshot goes stale (no leader refreshing), the syncing workers refresh it
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from market_simulator import market_simulator
+from real_market_data import CRYPTO_IDS, real_market_data
+
+logger = logging.getLogger(__name__)
+
+QUOTE_REFRESH_SECONDS = float(os.getenv("QUOTE_REFRESH_SECONDS", "15"))
+QUOTE_SYNC_SECONDS = float(os.getenv("QUOTE_SYNC_SECONDS", "5"))
+QUOTE_STALE_SECONDS = float(os.getenv("QUOTE_STALE_SECONDS", "60"))
+QUOTE_MAX_AGE_SECONDS = float(os.getenv("QUOTE_MAX_AGE_SECONDS", "900"))
+QUOTE_REFRESH_LOCK_SECONDS = 30
+
+SNAPSHOT_ID = "current"
+
+
+def quote_symbols() -> Dict[str, str]:
+    """symbol -> category of every symbol in the snapshot (the simulator's symbols and the mapped coins)"""
+    symbols = {symbol: category for category, names in market_simulator.get_all_symbols().items() for symbol in names}
+    for symbol in CRYPTO_IDS:
+        symbols.setdefault(symbol, "crypto")
+    return symbols
+
+
+class QuoteSnapshot:
+    """In-memory copy of the shared quote snapshot of this process"""
+
+    def __init__(self, stale_seconds: float = QUOTE_STALE_SECONDS, max_age_seconds: float = QUOTE_MAX_AGE_SECONDS):
+        self.stale_seconds = stale_seconds
+        self.max_age_seconds = max_age_seconds
+        self._quotes: Dict[str, Dict] = {}
+        self.version = 0
+        self.refreshed_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self.reads = 0
+        self.loads = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.coalesced = 0
+        self.skipped = 0
+
+    def quote(self, symbol: str) -> Optional[Dict]:
+        """Copy of a symbol's quote with age_seconds and stale, or None (unknown or expired)"""
+        self.reads += 1
+        quote = self._quotes.get(symbol)
+        if quote is None:
+            return None
+        age = (datetime.utcnow() - quote["fetched_at"]).total_seconds()
+        if age > self.max_age_seconds:
+            return None
+        return {**quote, "age_seconds": round(age, 1), "stale": age > self.stale_seconds}
+
+    def age_seconds(self) -> Optional[float]:
+        if self.refreshed_at is None:
+            return None
+        return (datetime.utcnow() - self.refreshed_at).total_seconds()
+
+    @property
+    def stale(self) -> bool:
+        age = self.age_seconds()
+        return age is None or age > self.stale_seconds
+
+    def apply(self, doc: Dict):
+        """Adopt a snapshot document (as stored in Mongo)"""
+        self._quotes = {quote["symbol"]: quote for quote in doc.get("quotes", [])}
+        self.version = doc.get("version", 0)
+        self.refreshed_at = doc.get("refreshed_at")
+        self.last_error = doc.get("last_error")
+        self.loads += 1
+
+    async def sync(self, db) -> bool:
+        """Load the stored snapshot if it is a newer version. Returns True if one was loaded"""
+        doc = await db.quote_snapshot.find_one({"_id": SNAPSHOT_ID, "version": {"$ne": self.version}})
+        if doc is None:
+            return False
+        self.apply(doc)
+        return True
+
+    async def refresh(self, db) -> bool:
+        """
+        Fetch every symbol and store the result as the shared snapshot.
+        Single-flight: callers arriving while this process is refreshing wait for that refresh.
+        Returns True if a new snapshot version was stored (by this call or the one it joined).
+        """
+        if self._inflight is not None and not self._inflight.done():
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight)
+        self._inflight = asyncio.ensure_future(self._refresh(db))
+        return await asyncio.shield(self._inflight)
+
+    async def _claim_refresh(self, db, now: datetime) -> bool:
+        """Take the cross-process refresh lock (expires after QUOTE_REFRESH_LOCK_SECONDS)"""
+        await db.quote_snapshot.update_one(
+            {"_id": SNAPSHOT_ID},
+            {"$setOnInsert": {"quotes": [], "version": 0, "refreshing_until": None}},
+            upsert=True
+        )
+        result = await db.quote_snapshot.update_one(
+            {"_id": SNAPSHOT_ID, "$or": [{"refreshing_until": None}, {"refreshing_until": {"$lt": now}}]},
+            {"$set": {"refreshing_until": now + timedelta(seconds=QUOTE_REFRESH_LOCK_SECONDS)}}
+        )
+        return result.modified_count == 1
+
+    async def _refresh(self, db) -> bool:
+        now = datetime.utcnow()
+        if not await self._claim_refresh(db, now):
+            # Another process is refreshing; its result arrives through sync
+            self.skipped += 1
+            return False
+
+        error = None
+        try:
+            symbols = quote_symbols()
+            prices = await real_market_data.get_prices(symbols.items(), use_cache=False)
+        except Exception as e:
+            prices, error = {}, str(e)
+
+        current = await db.quote_snapshot.find_one({"_id": SNAPSHOT_ID}) or {}
+        if not prices:
+            self.refresh_failures += 1
+            error = error or "upstream returned no quotes"
+            logger.warning(f"⚠️ Quote refresh failed, keeping snapshot from {current.get('refreshed_at')}: {error}")
+            # The lock is held for one more interval: workers do not retry a failing upstream back to back
+            await db.quote_snapshot.update_one(
+                {"_id": SNAPSHOT_ID},
+                {"$set": {"last_error": error, "last_attempt_at": now,
+                          "refreshing_until": now + timedelta(seconds=QUOTE_REFRESH_SECONDS)}}
+            )
+            current.update({"last_error": error, "last_attempt_at": now})
+            self.apply(current)
+            return False
+
+        # Symbols missing from this fetch keep their previous quote (and fetched_at)
+        quotes = {quote["symbol"]: quote for quote in current.get("quotes", [])}
+        for (symbol, category), data in prices.items():
+            quotes[symbol] = {
+                "symbol": symbol,
+                "category": category,
+                "price": data["price"],
+                "bid": data["bid"],
+                "ask": data["ask"],
+                "high": data["high"],
+                "low": data["low"],
+                "change": data["change"],
+                "change_percent": data["change_percent"],
+                "timestamp": data["timestamp"],
+                "fetched_at": now
+            }
+        doc = {
+            "_id": SNAPSHOT_ID,
+            "quotes": list(quotes.values()),
+            "version": current.get("version", 0) + 1,
+            "refreshed_at": now,
+            "last_attempt_at": now,
+            "last_error": None,
+            "refreshing_until": None
+        }
+        await db.quote_snapshot.replace_one({"_id": SNAPSHOT_ID}, doc, upsert=True)
+        self.apply(doc)
+        self.refreshes += 1
+        logger.info(f"💹 Quote snapshot v{doc['version']}: {len(prices)}/{len(symbols)} symbols refreshed")
+        return True
+
+    def stats(self) -> Dict:
+        ages = [(datetime.utcnow() - quote["fetched_at"]).total_seconds() for quote in self._quotes.values()]
+        return {
+            "version": self.version,
+            "quotes": len(self._quotes),
+            "stale_quotes": sum(1 for age in ages if age > self.stale_seconds),
+            "expired_quotes": sum(1 for age in ages if age > self.max_age_seconds),
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            "age_seconds": round(self.age_seconds(), 1) if self.refreshed_at else None,
+            "stale": self.stale,
+            "last_error": self.last_error,
+            "reads": self.reads,
+            "loads": self.loads,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "coalesced_refreshes": self.coalesced,
+            "skipped_refreshes": self.skipped
+        }
+
+
+# Global snapshot of this process
+quote_snapshot = QuoteSnapshot()
+
+
+async def run_refresher(db, interval: float = QUOTE_REFRESH_SECONDS):
+    """Leader job: refresh the shared snapshot whenever it is older than the interval"""
+    while True:
+        try:
+            await quote_snapshot.sync(db)
+            age = quote_snapshot.age_seconds()
+            if age is None or age >= interval:
+                await quote_snapshot.refresh(db)
+                age = 0
+        except Exception as e:
+            logger.error(f"Quote refresher error: {e}")
+            age = 0
+        await asyncio.sleep(max(1.0, interval - age))
+
+
+async def run_sync(db, interval: float = QUOTE_SYNC_SECONDS):
+    """Every worker: pick up snapshots stored by the refresher; refresh when nobody else does"""
+    while True:
+        try:
+            await quote_snapshot.sync(db)
+            if quote_snapshot.stale:
+                # No leader refreshing (or a cold start): the refresh lock lets one worker fetch
+                await quote_snapshot.refresh(db)
+        except Exception as e:
+            logger.error(f"Quote snapshot sync error: {e}")
+        await asyncio.sleep(interval)
+
@@ -3,6 +3,7 @@ import time
 from datetime import datetime, timedelta
 from typing import List, Dict
 import math
+import numpy as np
 
 class MarketDataSimulator:
     """Simulate realistic market data for various asset classes"""
@@ -53,6 +54,7 @@ class MarketDataSimulator:
     def __init__(self):
         self.price_history = {}  # Store price history for indicators
         self.last_update = {}
+        self.price_arrays = {}  # symbol -> cached float64 OHLC arrays, rebuilt once per new candle
         self._initialize_history()
     
     def _initialize_history(self):
@@ -158,6 +160,9 @@ class MarketDataSimulator:
         history.append(new_candle)
         if len(history) > 200:
             history.pop(0)
+        
+        # Cached arrays are stale once a new candle arrives
+        self.price_arrays.pop(symbol, None)
     
     def get_price_history(self, symbol: str, count: int = 100) -> List[Dict]:
         """Get historical price data"""
@@ -166,6 +171,30 @@ class MarketDataSimulator:
         
         return self.price_history[symbol][-count:]
     
+    def get_price_arrays(self, symbol: str, count: int = 200) -> Dict[str, np.ndarray]:
+        """
+        Get historical prices as read-only float64 arrays (open/high/low/close).
+        Arrays are built once per candle and shared by every caller.
+        """
+        if symbol not in self.price_history:
+            return {}
+        
+        arrays = self.price_arrays.get(symbol)
+        if arrays is None:
+            history = self.price_history[symbol]
+            arrays = {}
+            for field in ("open", "high", "low", "close"):
+                values = np.fromiter((candle[field] for candle in history), dtype=np.float64, count=len(history))
+                values.flags.writeable = False
+                arrays[field] = values
+            self.price_arrays[symbol] = arrays
+        
+        return {field: values[-count:] for field, values in arrays.items()}
+    
+    def get_last_bar_time(self, symbol: str) -> float:
+        """Timestamp of the latest candle (changes exactly when a new candle is appended)"""
+        return self.last_update.get(symbol, 0.0)
+    
     def get_all_symbols(self) -> Dict[str, List[str]]:
         """Get all available symbols grouped by category"""
         symbols = {
@@ -0,0 +1,113 @@
+"""
+Migration script to move broadcast signals to the hybrid signal inbox
+- Admin and mentor broadcasts (and mentor indicator signal updates) get an audience descriptor
+- Read states of their user_signals rows are copied to signal_reads
+- The per-user user_signals rows of those signals are then removed
+- The old unread_signal_count counters, which also counted broadcasts, are removed
+  (personal counters are recounted on first read, broadcasts are counted at read time)
+
+Admin signals keep their exact recipients (audience type "users"), since the
+old rows do not tell whether they were sent to everyone or to target_users.
+Per-subscription signals (indicator auto signals, manual overrides) are not touched.
+
+Usage:
+    python migrate_signal_inbox.py [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+import signal_inbox
+from batching import chunked
+from signal_fanout import FANOUT_BATCH_SIZE
+
+load_dotenv()
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "mi_mobile_indicator")
+
+BROADCAST_SENDER_TYPES = ["admin", "mentor", "mentor_indicator"]
+
+
+def audience_for(signal: dict, recipient_ids: list):
+    sender_type = signal.get("sender_type")
+    if sender_type == "mentor" and signal.get("mentor_id"):
+        return signal_inbox.audience_mentor(signal["mentor_id"])
+    if sender_type == "mentor_indicator" and signal.get("sender_id"):
+        return signal_inbox.audience_mentor(signal["sender_id"])
+    return signal_inbox.audience_users(recipient_ids)
+
+
+async def migrate_signal_inbox(dry_run: bool = False):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    print("=" * 60)
+    print(f"Starting signal inbox migration{' (dry run)' if dry_run else ''}")
+    print("=" * 60)
+
+    if not dry_run:
+        await signal_inbox.ensure_inbox_indexes(db)
+
+    migrated = rows_removed = reads_copied = 0
+    cursor = db.signals.find({
+        "sender_type": {"$in": BROADCAST_SENDER_TYPES},
+        "audience": {"$exists": False}
+    })
+
+    async for signal in cursor:
+        signal_id = str(signal["_id"])
+        refs = await db.user_signals.find(
+            {"signal_id": signal_id}, {"user_id": 1, "read": 1, "read_at": 1}
+        ).to_list(length=None)
+        audience = audience_for(signal, [ref["user_id"] for ref in refs])
+        read_refs = [ref for ref in refs if ref.get("read")]
+
+        print(f"📝 {signal.get('sender_type')} signal {signal_id}: {len(refs)} rows -> "
+              f"audience {audience['type']}, {len(read_refs)} read states")
+
+        if not dry_run:
+            for chunk in chunked(read_refs, FANOUT_BATCH_SIZE):
+                await db.signal_reads.bulk_write([
+                    UpdateOne(
+                        {"user_id": ref["user_id"], "signal_id": signal_id},
+                        {"$setOnInsert": {"read_at": ref.get("read_at") or signal.get("created_at")}},
+                        upsert=True
+                    )
+                    for ref in chunk
+                ], ordered=False)
+            await db.signals.update_one({"_id": signal["_id"]}, {"$set": {"audience": audience}})
+            result = await db.user_signals.delete_many({"signal_id": signal_id})
+            rows_removed += result.deleted_count
+
+        migrated += 1
+        reads_copied += len(read_refs)
+
+    # Unread counters that also counted audience signals (now counted at read time)
+    legacy_counter = {signal_inbox.LEGACY_UNREAD_FIELD: {"$exists": True}}
+    if dry_run:
+        counters_removed = await db.users.count_documents(legacy_counter)
+    else:
+        result = await db.users.update_many(legacy_counter, {"$unset": {signal_inbox.LEGACY_UNREAD_FIELD: ""}})
+        counters_removed = result.modified_count
+
+    print("\n" + "=" * 60)
+    print(f"Migration complete!{' (dry run, nothing written)' if dry_run else ''}")
+    print(f"Signals migrated: {migrated}")
+    print(f"Read states copied: {reads_copied}")
+    print(f"user_signals rows removed: {rows_removed}")
+    print(f"Legacy unread counters removed: {counters_removed}")
+    print("=" * 60)
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move broadcast signals to the hybrid signal inbox")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+    asyncio.run(migrate_signal_inbox(dry_run=args.dry_run))
@@ -0,0 +1,139 @@
+"""
+Materialized News Feeds
+/user/news used to merge manual news, the live calendar and the mentor's news_signals
+on every request, although every user of a mentor gets the same result. The merged
+feed is now stored once per mentor (news_feeds, _id = mentor_id) and read with a single
+find_one.
+
+Feeds are kept current by the writers:
+- manual news by a mentor  -> that mentor's feed is rebuilt
+- manual news by an admin  -> every materialized feed is rebuilt
+- a mentor signal change   -> the event's signal is patched in place in that mentor's feed
+- a calendar refresh -> every feed built from another calendar version (calendar_etag) is rebuilt
+A feed that does not exist yet (new mentor, first deploy) is built on first read.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from economic_calendar import calendar_snapshot
+
+logger = logging.getLogger(__name__)
+
+FEED_LIMIT = 50
+MANUAL_NEWS_LIMIT = 20
+NO_MENTOR = "_none"
+
+
+def feed_key(mentor_id: Optional[str]) -> str:
+    return mentor_id or NO_MENTOR
+
+
+def manual_item(item: Dict) -> Dict:
+    """manual_news document -> feed item (optional fields only when set)"""
+    news_item = {
+        "id": str(item["_id"]),
+        "title": item["title"],
+        "created_at": item["created_at"].isoformat(),
+        "source": "manual"
+    }
+    if item.get("event_time"):
+        news_item["event_time"] = item["event_time"]
+        news_item["event_datetime"] = item["event_time"]
+    for field in ("currency", "impact", "signal", "description"):
+        if item.get(field):
+            news_item[field] = item[field]
+    return news_item
+
+
+def merge_feed(manual_news: List[Dict], live_events: List[Dict], mentor_signals: Dict[str, Optional[str]]) -> List[Dict]:
+    """Manual news + calendar events with the mentor's signals, latest event first"""
+    items = [manual_item(item) for item in manual_news]
+    for event in live_events:
+        event = dict(event)
+        if event.get("id") in mentor_signals:
+            event["signal"] = mentor_signals[event["id"]]
+        items.append(event)
+    items.sort(key=lambda x: x.get("event_datetime", x.get("created_at", "")), reverse=True)
+    return items[:FEED_LIMIT]
+
+
+async def admin_manual_news(db) -> List[Dict]:
+    return await db.manual_news.find(
+        {"sender_type": "admin", "status": "active"}
+    ).sort("created_at", -1).limit(MANUAL_NEWS_LIMIT).to_list(length=MANUAL_NEWS_LIMIT)
+
+
+async def build_feed(db, mentor_id: Optional[str], admin_news: Optional[List[Dict]] = None) -> List[Dict]:
+    """Rebuild and store one mentor's feed. admin_news can be shared when rebuilding many feeds"""
+    calendar_etag = calendar_snapshot.etag
+    live_events = calendar_snapshot.events()
+    if admin_news is None:
+        admin_news = await admin_manual_news(db)
+
+    manual_news = list(admin_news)
+    mentor_signals = {}
+    if mentor_id:
+        manual_news += await db.manual_news.find(
+            {"sender_type": "mentor", "mentor_id": mentor_id, "status": "active"}
+        ).sort("created_at", -1).limit(MANUAL_NEWS_LIMIT).to_list(length=MANUAL_NEWS_LIMIT)
+        manual_news = sorted(manual_news, key=lambda item: item["created_at"], reverse=True)[:MANUAL_NEWS_LIMIT]
+        async for sig in db.news_signals.find({"mentor_id": mentor_id}, {"event_id": 1, "signal": 1}):
+            mentor_signals[sig["event_id"]] = sig.get("signal")
+
+    items = merge_feed(manual_news, live_events, mentor_signals)
+    await db.news_feeds.replace_one(
+        {"_id": feed_key(mentor_id)},
+        {"_id": feed_key(mentor_id), "items": items, "calendar_etag": calendar_etag, "built_at": datetime.utcnow()},
+        upsert=True
+    )
+    return items
+
+
+async def rebuild_all(db, query: Optional[Dict] = None) -> int:
+    """Rebuild every materialized feed matching query (admin news loaded once)"""
+    keys = await db.news_feeds.distinct("_id", query or {})
+    if not keys:
+        return 0
+    admin_news = await admin_manual_news(db)
+    for key in keys:
+        await build_feed(db, None if key == NO_MENTOR else key, admin_news)
+    logger.info(f"📰 Rebuilt {len(keys)} news feeds")
+    return len(keys)
+
+
+async def read_feed(db, mentor_id: Optional[str]) -> List[Dict]:
+    """A mentor's feed; built on first read"""
+    feed = await db.news_feeds.find_one({"_id": feed_key(mentor_id)}, {"items": 1})
+    if feed is not None:
+        return feed["items"]
+    return await build_feed(db, mentor_id)
+
+
+async def on_news_created(db, mentor_id: Optional[str]):
+    """Mentor news rebuilds that mentor's feed, admin news every feed"""
+    try:
+        if mentor_id:
+            await build_feed(db, mentor_id)
+        else:
+            await rebuild_all(db)
+    except Exception as e:
+        logger.error(f"Error rebuilding news feeds for {mentor_id or 'all mentors'}: {e}")
+
+
+async def on_calendar_refreshed(db):
+    """Rebuild the feeds built from another calendar version (no-op while all are current)"""
+    if calendar_snapshot.etag:
+        await rebuild_all(db, {"calendar_etag": {"$ne": calendar_snapshot.etag}})
+
+
+async def on_signal_changed(db, mentor_id: str, event_id: str, signal: Optional[str]):
+    """Patch the signal of a calendar event in the mentor's feed (manual items keep their own signal)"""
+    try:
+        await db.news_feeds.update_one(
+            {"_id": feed_key(mentor_id)},
+            {"$set": {"items.$[event].signal": signal}},
+            array_filters=[{"event.id": event_id, "event.source": {"$ne": "manual"}}]
+        )
+    except Exception as e:
+        logger.error(f"Error updating news feed signal for mentor {mentor_id}: {e}")
@@ -0,0 +1,152 @@
+"""
+Principal Cache
+Short-lived in-memory cache of authenticated principals (users, admins, mentors), so the
+auth dependencies resolve a token without a find_one on every request.
+
+- Entries are keyed by (kind, subject) and hold the token version they were loaded for;
+  tokens carry `ver`, the principal's token_version at login, and a token whose version
+  differs from the stored one is rejected (password resets bump token_version)
+- Cached documents omit volatile inbox state (unread counter, audience cursor), which readers load fresh
+- Status, payment and password changes and deletions invalidate entries explicitly:
+  locally, and in the other API workers through the signal stream relay
+- PRINCIPAL_CACHE_TTL_SECONDS bounds how long other profile edits can be served stale
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from bson import ObjectId
+
+import signal_stream
+from signal_inbox import AUDIENCE_READ_FIELD, UNREAD_FIELD
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "20000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+
+EVENT_PRINCIPALS = "principals"
+
+KIND_USER = "user"
+KIND_ADMIN = "admin"
+KIND_MENTOR = "mentor"
+
+COLLECTIONS = {KIND_USER: "users", KIND_ADMIN: "admins", KIND_MENTOR: "mentors"}
+
+# Fields that change too often to be served from the cache
+VOLATILE_FIELDS = (UNREAD_FIELD, AUDIENCE_READ_FIELD)
+
+
+def token_version(doc: Dict) -> int:
+    return doc.get("token_version", 0)
+
+
+class PrincipalCache:
+    """Bounded LRU of (kind, subject) -> (loaded_at, document) with a TTL"""
+
+    def __init__(self, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, kind: str, subject: str) -> Optional[Dict]:
+        key = (kind, subject)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def put(self, kind: str, subject: str, doc: Dict):
+        key = (kind, subject)
+        self._entries[key] = (time.monotonic(), {k: v for k, v in doc.items() if k not in VOLATILE_FIELDS})
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, kind: str, subjects: Iterable[str]):
+        for subject in subjects:
+            if subject and self._entries.pop((kind, str(subject)), None) is not None:
+                self.invalidations += 1
+
+    def clear(self, kind: Optional[str] = None):
+        for key in [key for key in self._entries if kind is None or key[0] == kind]:
+            del self._entries[key]
+        self.invalidations += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+# Global principal cache of this process
+principal_cache = PrincipalCache()
+
+
+async def load_principal(db, kind: str, subject: str) -> Optional[Dict]:
+    """
+    Serialized principal document (string _id) from the cache or the database.
+    Missing principals are not cached.
+    """
+    doc = principal_cache.get(kind, subject)
+    if doc is not None:
+        return doc
+    doc = await db[COLLECTIONS[kind]].find_one({"_id": ObjectId(subject)})
+    if doc is None:
+        return None
+    doc["_id"] = str(doc["_id"])
+    principal_cache.put(kind, subject, doc)
+    return doc
+
+
+def listen_for_invalidations(hub=None):
+    """Drop cached principals when any worker reports a change over the stream relay"""
+    def on_event(data):
+        if data.get("all"):
+            principal_cache.clear(data.get("kind"))
+        else:
+            principal_cache.invalidate(data.get("kind", KIND_USER), data.get("subjects", []))
+
+    (hub or signal_stream.stream_hub).add_listener(EVENT_PRINCIPALS, on_event)
+
+
+async def invalidate_everywhere(db, kind: str, subjects: Iterable):
+    """Invalidate principals by _id (ObjectId or str) in this and every other worker"""
+    subjects = [str(s) for s in dict.fromkeys(subjects) if s]
+    if not subjects:
+        return
+    principal_cache.invalidate(kind, subjects)
+    try:
+        await signal_stream.publish(db, EVENT_PRINCIPALS, {}, {"kind": kind, "subjects": subjects})
+    except Exception as e:
+        logger.error(f"Error publishing principal invalidation: {e}")
+
+
+async def invalidate_matching(db, kind: str, query: Dict):
+    """Invalidate the principals matching a query (e.g. before or after an update by email)"""
+    docs = await db[COLLECTIONS[kind]].find(query, {"_id": 1}).to_list(length=None)
+    await invalidate_everywhere(db, kind, [doc["_id"] for doc in docs])
+
+
+async def clear_everywhere(db, kind: str):
+    """Drop every cached principal of a kind (bulk updates)"""
+    principal_cache.clear(kind)
+    try:
+        await signal_stream.publish(db, EVENT_PRINCIPALS, {}, {"kind": kind, "all": True})
+    except Exception as e:
+        logger.error(f"Error publishing principal invalidation: {e}")
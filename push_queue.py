@@ -0,0 +1,235 @@
+"""
+Durable Push Queue
+Outbound push notifications are persisted in Mongo (push_queue) and drained by
+background consumer tasks, so request handlers return as soon as their data is
+written and pending pushes survive restarts.
+
+- enqueue() stores messages as jobs of at most 100 (one Expo request each)
+- Consumers claim jobs with a lease (find_one_and_update). A consumer that dies
+  mid-send loses its lease after PUSH_QUEUE_LEASE_SECONDS and the job is claimed
+  again: delivery is at-least-once
+- Failed sends are retried with exponential backoff, never before an Expo Retry-After
+  (push_service gives up on long ones instead of sleeping through the lease);
+  after PUSH_QUEUE_MAX_ATTEMPTS the job is moved to push_dead_letters
+- Sent jobs keep their push tickets; receipts are checked once they are due
+  (PUSH_RECEIPT_DELAY_SECONDS) and sent jobs expire after PUSH_QUEUE_RETENTION_SECONDS
+- Throughput and enqueue-to-send latency are tracked per process (queue_metrics)
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+from push_service import EXPO_MAX_MESSAGES, PUSH_RECEIPT_DELAY_SECONDS, push_service
+from batching import chunked
+
+logger = logging.getLogger(__name__)
+
+PUSH_QUEUE_WORKERS = int(os.getenv("PUSH_QUEUE_WORKERS", "4"))
+PUSH_QUEUE_LEASE_SECONDS = float(os.getenv("PUSH_QUEUE_LEASE_SECONDS", "60"))
+PUSH_QUEUE_MAX_ATTEMPTS = int(os.getenv("PUSH_QUEUE_MAX_ATTEMPTS", "5"))
+PUSH_QUEUE_RETRY_SECONDS = float(os.getenv("PUSH_QUEUE_RETRY_SECONDS", "5"))
+PUSH_QUEUE_POLL_SECONDS = float(os.getenv("PUSH_QUEUE_POLL_SECONDS", "1"))
+PUSH_QUEUE_RETENTION_SECONDS = int(os.getenv("PUSH_QUEUE_RETENTION_SECONDS", str(24 * 3600)))
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_SENT = "sent"
+
+CONSUMER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+class QueueMetrics:
+    """Per-process consumer counters with a sliding window for throughput and latency"""
+
+    def __init__(self, window_seconds: float = 60.0, samples: int = 1000):
+        self.window_seconds = window_seconds
+        self.started = time.time()
+        self.jobs_sent = 0
+        self.jobs_retried = 0
+        self.jobs_dead = 0
+        self.messages_sent = 0
+        self.latencies = deque(maxlen=samples)
+        self.recent = deque()
+
+    def record_sent(self, messages: int, latency_seconds: float):
+        now = time.time()
+        self.jobs_sent += 1
+        self.messages_sent += messages
+        self.latencies.append(latency_seconds)
+        self.recent.append((now, messages))
+        while self.recent and self.recent[0][0] < now - self.window_seconds:
+            self.recent.popleft()
+
+    def snapshot(self) -> Dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(fraction):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3) if ordered else None
+
+        recent_messages = sum(count for _, count in self.recent)
+        return {
+            "consumer": CONSUMER_ID,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "jobs_sent": self.jobs_sent,
+            "jobs_retried": self.jobs_retried,
+            "jobs_dead": self.jobs_dead,
+            "messages_sent": self.messages_sent,
+            "messages_per_second": round(recent_messages / self.window_seconds, 2),
+            "latency_p50_seconds": percentile(0.5),
+            "latency_p95_seconds": percentile(0.95),
+            "latency_max_seconds": round(ordered[-1], 3) if ordered else None
+        }
+
+
+queue_metrics = QueueMetrics()
+
+
+async def ensure_queue_indexes(db):
+    await db.push_queue.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+    await db.push_queue.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+    await db.push_queue.create_index([("receipts_due_at", ASCENDING)], sparse=True)
+    await db.push_queue.create_index("sent_at", expireAfterSeconds=PUSH_QUEUE_RETENTION_SECONDS)
+
+
+async def enqueue(db, messages: List[Dict], label: str = "push") -> int:
+    """Persist messages as queue jobs of at most 100 messages. Returns the number of jobs"""
+    if not messages:
+        return 0
+    now = datetime.utcnow()
+    jobs = [{
+        "label": label,
+        "messages": chunk,
+        "status": STATUS_PENDING,
+        "attempts": 0,
+        "created_at": now,
+        "available_at": now
+    } for chunk in chunked(messages, EXPO_MAX_MESSAGES)]
+    await db.push_queue.insert_many(jobs, ordered=False)
+    return len(jobs)
+
+
+async def claim(db, consumer_id: str = CONSUMER_ID) -> Optional[Dict]:
+    """Lease the oldest due job: pending and available, or processing with an expired lease"""
+    now = datetime.utcnow()
+    return await db.push_queue.find_one_and_update(
+        {"$or": [
+            {"status": STATUS_PENDING, "available_at": {"$lte": now}},
+            {"status": STATUS_PROCESSING, "lease_until": {"$lt": now}}
+        ]},
+        {
+            "$set": {
+                "status": STATUS_PROCESSING,
+                "lease_until": now + timedelta(seconds=PUSH_QUEUE_LEASE_SECONDS),
+                "consumer": consumer_id
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("available_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def process_job(db, job: Dict):
+    """Send one job; mark it sent, schedule a retry, or dead-letter it"""
+    try:
+        result = await push_service.send(job["messages"], job.get("label", "push"))
+        error = "Expo request failed" if result["failed_chunks"] else None
+    except Exception as e:
+        result, error = None, str(e)
+
+    now = datetime.utcnow()
+    owned = {"_id": job["_id"], "consumer": job["consumer"], "status": STATUS_PROCESSING}
+
+    if error is None:
+        update = {"status": STATUS_SENT, "sent_at": now, "tickets": result["tickets"], "ok": result["ok"],
+                  "errors": result["errors"]}
+        if result["tickets"]:
+            update["receipts_due_at"] = now + timedelta(seconds=PUSH_RECEIPT_DELAY_SECONDS)
+        await db.push_queue.update_one(owned, {"$set": update, "$unset": {"lease_until": ""}})
+        queue_metrics.record_sent(len(job["messages"]), (now - job["created_at"]).total_seconds())
+        return
+
+    if job["attempts"] >= PUSH_QUEUE_MAX_ATTEMPTS:
+        job.update({"status": "dead", "last_error": error, "dead_at": now})
+        await db.push_dead_letters.replace_one({"_id": job["_id"]}, job, upsert=True)
+        await db.push_queue.delete_one(owned)
+        queue_metrics.jobs_dead += 1
+        logger.error(f"☠️ Push job {job['_id']} dead-lettered after {job['attempts']} attempts: {error}")
+        return
+
+    retry_at = now + timedelta(seconds=PUSH_QUEUE_RETRY_SECONDS * (2 ** (job["attempts"] - 1)))
+    if result and result.get("retry_after"):
+        # Expo asked to back off longer than one send may wait
+        retry_at = max(retry_at, now + timedelta(seconds=result["retry_after"]))
+    await db.push_queue.update_one(owned, {
+        "$set": {"status": STATUS_PENDING, "available_at": retry_at, "last_error": error},
+        "$unset": {"lease_until": ""}
+    })
+    queue_metrics.jobs_retried += 1
+    logger.warning(f"⚠️ Push job {job['_id']} failed (attempt {job['attempts']}), retrying at {retry_at}: {error}")
+
+
+async def check_due_receipts(db) -> bool:
+    """Check the receipts of one sent job whose receipts are due. Returns False if none was due"""
+    job = await db.push_queue.find_one_and_update(
+        {"status": STATUS_SENT, "receipts_due_at": {"$lte": datetime.utcnow()}},
+        {"$unset": {"receipts_due_at": ""}}
+    )
+    if not job:
+        return False
+    receipts = await push_service.check_receipts(job.get("tickets", {}))
+    await db.push_queue.update_one({"_id": job["_id"]}, {"$set": {"receipts": {
+        k: v for k, v in receipts.items() if k != "device_not_registered"
+    }}})
+    return True
+
+
+async def run_consumer(db, index: int = 0):
+    """Drain the queue forever; idle consumers check due receipts, then poll"""
+    consumer_id = f"{CONSUMER_ID}-{index}-{uuid.uuid4().hex[:6]}"
+    while True:
+        try:
+            job = await claim(db, consumer_id)
+            if job:
+                await process_job(db, job)
+                continue
+            if await check_due_receipts(db):
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Push queue consumer error: {e}")
+        await asyncio.sleep(PUSH_QUEUE_POLL_SECONDS)
+
+
+async def start_consumers(db, workers: int = PUSH_QUEUE_WORKERS) -> List[asyncio.Task]:
+    await ensure_queue_indexes(db)
+    tasks = [asyncio.create_task(run_consumer(db, i)) for i in range(workers)]
+    logger.info(f"📬 Push queue started with {workers} consumers ({CONSUMER_ID})")
+    return tasks
+
+
+async def queue_stats(db) -> Dict:
+    """Backlog by status plus this process's consumer metrics"""
+    now = datetime.utcnow()
+    counts = {
+        doc["_id"]: doc["count"]
+        async for doc in db.push_queue.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+    }
+    oldest = await db.push_queue.find_one({"status": STATUS_PENDING}, sort=[("created_at", ASCENDING)])
+    return {
+        "pending": counts.get(STATUS_PENDING, 0),
+        "processing": counts.get(STATUS_PROCESSING, 0),
+        "sent": counts.get(STATUS_SENT, 0),
+        "dead_letters": await db.push_dead_letters.estimated_document_count(),
+        "oldest_pending_seconds": round((now - oldest["created_at"]).total_seconds(), 1) if oldest else 0,
+        "metrics": queue_metrics.snapshot()
+    }
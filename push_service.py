@@ -0,0 +1,243 @@
+"""
+Push Notification Service
+Single dispatch path to the Expo Push API for the API server and the signal worker.
+
+- One long-lived, pooled httpx.AsyncClient per process (HTTP/2 via httpx[http2] from
+  requirements.txt; PUSH_HTTP2=false forces HTTP/1.1, a missing `h2` package is logged)
+- Messages are split into chunks of at most 100 (the Expo per-request limit) and
+  sent with bounded concurrency (PUSH_MAX_CONCURRENCY)
+- 429 / 5xx / network errors are retried with exponential backoff and jitter,
+  honouring Retry-After. One send never waits longer than PUSH_MAX_RETRY_DELAY_SECONDS
+  between attempts: a longer Retry-After fails the chunk and is returned as
+  retry_after, so push_queue reschedules the job instead of outliving its lease
+- Push tickets are returned per token; receipts can be fetched later with
+  check_receipts() (or scheduled with schedule_receipt_check())
+
+EXPO_PUSH_URL / EXPO_RECEIPTS_URL can point at a local fake server (fake_expo_server.py).
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from batching import chunked
+
+logger = logging.getLogger(__name__)
+
+EXPO_PUSH_URL = os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+EXPO_RECEIPTS_URL = os.getenv("EXPO_RECEIPTS_URL", "https://exp.host/--/api/v2/push/getReceipts")
+EXPO_ACCESS_TOKEN = os.getenv("EXPO_ACCESS_TOKEN")
+
+EXPO_MAX_MESSAGES = 100
+EXPO_MAX_RECEIPT_IDS = 1000
+PUSH_CHUNK_SIZE = min(int(os.getenv("PUSH_CHUNK_SIZE", "100")), EXPO_MAX_MESSAGES)
+PUSH_MAX_CONCURRENCY = int(os.getenv("PUSH_MAX_CONCURRENCY", "6"))
+PUSH_MAX_RETRIES = int(os.getenv("PUSH_MAX_RETRIES", "3"))
+PUSH_BACKOFF_SECONDS = float(os.getenv("PUSH_BACKOFF_SECONDS", "0.5"))
+# Keep well under PUSH_QUEUE_LEASE_SECONDS (60): a job must finish before its lease expires
+PUSH_MAX_RETRY_DELAY_SECONDS = float(os.getenv("PUSH_MAX_RETRY_DELAY_SECONDS", "10"))
+PUSH_TIMEOUT_SECONDS = float(os.getenv("PUSH_TIMEOUT_SECONDS", "10"))
+PUSH_RECEIPT_DELAY_SECONDS = float(os.getenv("PUSH_RECEIPT_DELAY_SECONDS", "900"))
+
+# HTTP/2 in httpx needs the optional h2 package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+PUSH_HTTP2_REQUESTED = os.getenv("PUSH_HTTP2", "true").lower() == "true"
+PUSH_HTTP2 = PUSH_HTTP2_REQUESTED and HTTP2_AVAILABLE
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_expo_token(token: Optional[str]) -> bool:
+    return bool(token) and (token.startswith("ExponentPushToken") or token.startswith("ExpoPushToken"))
+
+
+def messages_for_tokens(tokens: Iterable[str], title: str, body: str, data: Dict,
+                        priority: Optional[str] = "high", channel_id: Optional[str] = "default") -> List[Dict]:
+    """Build one Expo message per valid push token"""
+    messages = []
+    for token in dict.fromkeys(tokens):
+        if not is_expo_token(token):
+            continue
+        message = {"to": token, "sound": "default", "title": title, "body": body, "data": data}
+        if priority:
+            message["priority"] = priority
+        if channel_id:
+            message["channelId"] = channel_id
+        messages.append(message)
+    return messages
+
+
+def empty_result() -> Dict:
+    return {"messages": 0, "chunks": 0, "ok": 0, "errors": 0, "failed_chunks": 0, "retries": 0,
+            "retry_after": 0.0, "tickets": {}, "device_not_registered": [], "seconds": 0.0}
+
+
+class PushService:
+    """Pooled Expo push client shared by every caller in the process"""
+
+    def __init__(self, push_url: str = EXPO_PUSH_URL, receipts_url: str = EXPO_RECEIPTS_URL,
+                 max_concurrency: int = PUSH_MAX_CONCURRENCY, max_retries: int = PUSH_MAX_RETRIES):
+        self.push_url = push_url
+        self.receipts_url = receipts_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.on_device_not_registered: Optional[Callable[[List[str]], Awaitable]] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+                "Content-Type": "application/json",
+            }
+            if EXPO_ACCESS_TOKEN:
+                headers["Authorization"] = f"Bearer {EXPO_ACCESS_TOKEN}"
+            if PUSH_HTTP2_REQUESTED and not HTTP2_AVAILABLE:
+                logger.warning("⚠️ h2 is not installed (pip install httpx[http2]): Expo pushes use HTTP/1.1")
+            self._client = httpx.AsyncClient(
+                http2=PUSH_HTTP2,
+                headers=headers,
+                timeout=PUSH_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2,
+                                    max_keepalive_connections=self.max_concurrency)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, url: str, payload, stats: Dict) -> Optional[Dict]:
+        """
+        POST with retries on throttling, server and network errors. Returns the JSON body or None.
+        A Retry-After longer than PUSH_MAX_RETRY_DELAY_SECONDS is not waited for: it is
+        recorded in stats["retry_after"] and the request gives up.
+        """
+        client = self.client
+        for attempt in range(self.max_retries + 1):
+            delay = min(PUSH_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random()), PUSH_MAX_RETRY_DELAY_SECONDS)
+            try:
+                async with self._semaphore:
+                    response = await client.post(url, json=payload)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUS_CODES:
+                    logger.error(f"❌ Expo request failed: {response.status_code} - {response.text[:200]}")
+                    return None
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    if float(retry_after) > PUSH_MAX_RETRY_DELAY_SECONDS:
+                        stats["retry_after"] = max(stats["retry_after"], float(retry_after))
+                        logger.warning(f"⚠️ Expo request HTTP {response.status_code}, retry after {retry_after}s: "
+                                       f"giving up this attempt")
+                        return None
+                    delay = max(delay, float(retry_after))
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if attempt == self.max_retries:
+                logger.error(f"❌ Expo request failed after {attempt + 1} attempts: {error}")
+                return None
+            stats["retries"] += 1
+            logger.warning(f"⚠️ Expo request {error}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        return None
+
+    async def _send_chunk(self, chunk: List[Dict], stats: Dict):
+        result = await self._post(self.push_url, chunk, stats)
+        if result is None:
+            stats["failed_chunks"] += 1
+            stats["errors"] += len(chunk)
+            return
+
+        for message, ticket in zip(chunk, result.get("data", [])):
+            if ticket.get("status") == "ok":
+                stats["ok"] += 1
+                if ticket.get("id"):
+                    stats["tickets"][ticket["id"]] = message["to"]
+            else:
+                stats["errors"] += 1
+                if (ticket.get("details") or {}).get("error") == "DeviceNotRegistered":
+                    stats["device_not_registered"].append(message["to"])
+                else:
+                    logger.error(f"Push ticket error for {message['to']}: {ticket.get('message')}")
+
+    async def send(self, messages: List[Dict], label: str = "push") -> Dict:
+        """
+        Send messages in chunks of PUSH_CHUNK_SIZE with bounded concurrency.
+        Returns counts, the push tickets ({ticket_id: token}) and tokens Expo reported as not registered.
+        """
+        stats = empty_result()
+        if not messages:
+            return stats
+
+        started = time.perf_counter()
+        chunks = list(chunked(messages, PUSH_CHUNK_SIZE))
+        stats["messages"] = len(messages)
+        stats["chunks"] = len(chunks)
+        await asyncio.gather(*(self._send_chunk(chunk, stats) for chunk in chunks))
+        stats["seconds"] = round(time.perf_counter() - started, 4)
+
+        logger.info(f"📱 {label}: {stats['ok']}/{stats['messages']} sent in {stats['chunks']} chunks "
+                    f"({stats['retries']} retries, {stats['seconds']}s)")
+        await self._handle_unregistered(stats["device_not_registered"])
+        return stats
+
+    async def check_receipts(self, tickets: Dict[str, str]) -> Dict:
+        """Fetch receipts for {ticket_id: token}. Returns counts and tokens that are no longer registered"""
+        stats = {"ok": 0, "errors": 0, "pending": 0, "retries": 0, "retry_after": 0.0, "device_not_registered": []}
+        ids = list(tickets)
+        for chunk in chunked(ids, EXPO_MAX_RECEIPT_IDS):
+            result = await self._post(self.receipts_url, {"ids": chunk}, stats)
+            receipts = (result or {}).get("data", {})
+            for ticket_id in chunk:
+                receipt = receipts.get(ticket_id)
+                if receipt is None:
+                    stats["pending"] += 1
+                elif receipt.get("status") == "ok":
+                    stats["ok"] += 1
+                else:
+                    stats["errors"] += 1
+                    if (receipt.get("details") or {}).get("error") == "DeviceNotRegistered":
+                        stats["device_not_registered"].append(tickets[ticket_id])
+                    else:
+                        logger.error(f"Push receipt error for {tickets[ticket_id]}: {receipt.get('message')}")
+
+        await self._handle_unregistered(stats["device_not_registered"])
+        return stats
+
+    def schedule_receipt_check(self, tickets: Dict[str, str], delay: float = PUSH_RECEIPT_DELAY_SECONDS):
+        """Check receipts in the background once Expo has had time to deliver (about 15 minutes)"""
+        if not tickets:
+            return None
+
+        async def check_later():
+            await asyncio.sleep(delay)
+            try:
+                await self.check_receipts(tickets)
+            except Exception as e:
+                logger.error(f"Error checking push receipts: {e}")
+
+        return asyncio.create_task(check_later())
+
+    async def _handle_unregistered(self, tokens: List[str]):
+        if tokens and self.on_device_not_registered is not None:
+            try:
+                await self.on_device_not_registered(tokens)
+            except Exception as e:
+                logger.error(f"Error handling unregistered push tokens: {e}")
+
+
+push_service = PushService()
@@ -0,0 +1,168 @@
+"""
+Push Token Index
+In-memory index of Expo push tokens keyed by user_id, so notification paths
+stop re-querying db.push_tokens for every send.
+
+- Misses for a whole recipient list are resolved with ONE {"user_id": {"$in": ...}} query
+  (users without tokens are cached too)
+- Entries are invalidated on /push-token writes: locally, and in the other API workers
+  through the signal stream relay; PUSH_TOKEN_CACHE_TTL_SECONDS bounds staleness
+  for processes without the relay (signal worker)
+- Tokens Expo reports as DeviceNotRegistered (tickets or receipts) are deleted
+- Mentor audiences resolve their tokens with one indexed aggregation
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING
+
+import signal_stream
+
+logger = logging.getLogger(__name__)
+
+PUSH_TOKEN_CACHE_MAX_USERS = int(os.getenv("PUSH_TOKEN_CACHE_MAX_USERS", "50000"))
+PUSH_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("PUSH_TOKEN_CACHE_TTL_SECONDS", "300"))
+
+EVENT_PUSH_TOKENS = "push_tokens"
+
+
+class PushTokenCache:
+    """Bounded LRU of user_id -> push tokens with a TTL"""
+
+    def __init__(self, max_users: int = PUSH_TOKEN_CACHE_MAX_USERS, ttl_seconds: float = PUSH_TOKEN_CACHE_TTL_SECONDS):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+        self.invalidations = 0
+
+    def _get(self, user_id: str, now: float) -> Optional[List[str]]:
+        entry = self._entries.get(user_id)
+        if entry is None or now - entry[0] > self.ttl_seconds:
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1]
+
+    def _put(self, user_id: str, tokens: List[str], now: float):
+        self._entries[user_id] = (now, tokens)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    async def tokens_for_users(self, db, user_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Tokens per user; all cache misses are loaded with a single $in query"""
+        now = time.monotonic()
+        result: Dict[str, List[str]] = {}
+        missing = []
+        for user_id in dict.fromkeys(str(u) for u in user_ids):
+            tokens = self._get(user_id, now)
+            if tokens is None:
+                missing.append(user_id)
+            else:
+                result[user_id] = tokens
+        self.hits += len(result)
+        self.misses += len(missing)
+
+        if missing:
+            self.queries += 1
+            loaded: Dict[str, List[str]] = {user_id: [] for user_id in missing}
+            async for doc in db.push_tokens.find({"user_id": {"$in": missing}}, {"user_id": 1, "token": 1}):
+                loaded[doc["user_id"]].append(doc["token"])
+            for user_id, tokens in loaded.items():
+                self._put(user_id, tokens, now)
+            result.update(loaded)
+        return result
+
+    async def tokens_for_user(self, db, user_id: str) -> List[str]:
+        return (await self.tokens_for_users(db, [user_id]))[str(user_id)]
+
+    def invalidate(self, user_ids: Iterable[str]):
+        for user_id in user_ids:
+            if user_id and self._entries.pop(str(user_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "max_users": self.max_users,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "queries": self.queries,
+            "invalidations": self.invalidations
+        }
+
+
+# Global token index of this process
+push_token_cache = PushTokenCache()
+
+
+def flatten(tokens_by_user: Dict[str, List[str]]) -> List[str]:
+    return [token for tokens in tokens_by_user.values() for token in tokens]
+
+
+async def ensure_token_indexes(db):
+    await db.push_tokens.create_index([("token", ASCENDING)])
+    await db.push_tokens.create_index([("user_id", ASCENDING)], sparse=True)
+    # Mentor audience lookups (active, paid users of a mentor)
+    await db.users.create_index([("mentor_id", ASCENDING), ("status", ASCENDING), ("payment_status", ASCENDING)])
+
+
+def listen_for_invalidations(hub=None):
+    """Drop cached entries when any worker reports a token change over the stream relay"""
+    (hub or signal_stream.stream_hub).add_listener(
+        EVENT_PUSH_TOKENS, lambda data: push_token_cache.invalidate(data.get("user_ids", []))
+    )
+
+
+async def invalidate_everywhere(db, user_ids: List[str]):
+    user_ids = [u for u in dict.fromkeys(user_ids) if u]
+    if not user_ids:
+        return
+    push_token_cache.invalidate(user_ids)
+    await signal_stream.publish(db, EVENT_PUSH_TOKENS, {}, {"user_ids": user_ids})
+
+
+async def register_token(db, token: str, user_id: Optional[str] = None):
+    """Store a device token (re-assigning it if the device changed hands) and invalidate both owners"""
+    previous = await db.push_tokens.find_one({"token": token}, {"user_id": 1})
+    update = {"token": token, "updated_at": datetime.utcnow()}
+    if user_id:
+        update["user_id"] = str(user_id)
+    await db.push_tokens.update_one({"token": token}, {"$set": update}, upsert=True)
+    await invalidate_everywhere(db, [previous.get("user_id") if previous else None, update.get("user_id")])
+
+
+async def prune_tokens(db, tokens: List[str]) -> int:
+    """Delete tokens Expo reported as DeviceNotRegistered"""
+    tokens = list(dict.fromkeys(tokens))
+    if not tokens:
+        return 0
+    owners = [doc.get("user_id") async for doc in db.push_tokens.find({"token": {"$in": tokens}}, {"user_id": 1})]
+    result = await db.push_tokens.delete_many({"token": {"$in": tokens}})
+    await invalidate_everywhere(db, owners)
+    logger.info(f"🧹 Pruned {result.deleted_count} unregistered push tokens")
+    return result.deleted_count
+
+
+async def mentor_audience_tokens(db, mentor_id: str) -> List[str]:
+    """Tokens of a mentor's active, paid users in one aggregation (users index + push_tokens.user_id index)"""
+    docs = await db.users.aggregate([
+        {"$match": {"mentor_id": mentor_id, "status": "active", "payment_status": "paid"}},
+        {"$project": {"user_id": {"$toString": "$_id"}}},
+        {"$lookup": {"from": "push_tokens", "localField": "user_id", "foreignField": "user_id", "as": "tokens"}},
+        {"$unwind": "$tokens"},
+        {"$project": {"_id": 0, "token": "$tokens.token"}}
+    ]).to_list(length=None)
+    return [doc["token"] for doc in docs]
@@ -2,23 +2,40 @@
 Real-time market data integration using free APIs
 - Finnhub: Forex, Stocks
 - CoinGecko: Cryptocurrency
+
+get_prices() fetches many symbols at once: Finnhub quotes concurrently (at most
+MARKET_DATA_CONCURRENCY requests in flight), all CoinGecko coins in one simple/price call.
 """
 import httpx
 import asyncio
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import os
 
 # Free API Keys (sign up at respective sites)
 FINNHUB_API_KEY = os.getenv('FINNHUB_API_KEY', 'demo')  # Get free key at finnhub.io
 COINGECKO_API_URL = 'https://api.coingecko.com/api/v3'
 FINNHUB_API_URL = 'https://finnhub.io/api/v1'
+MARKET_DATA_CONCURRENCY = int(os.getenv('MARKET_DATA_CONCURRENCY', '8'))
+
+# Map symbols to CoinGecko IDs
+CRYPTO_IDS = {
+    'BTC/USD': 'bitcoin',
+    'ETH/USD': 'ethereum',
+    'XRP/USD': 'ripple',
+    'LTC/USD': 'litecoin',
+    'ADA/USD': 'cardano',
+    'DOT/USD': 'polkadot',
+    'BNB/USD': 'binancecoin',
+    'SOL/USD': 'solana',
+}
 
 class RealMarketData:
     def __init__(self):
         self.client = httpx.AsyncClient(timeout=10.0)
         self.cache = {}  # Simple cache to avoid hitting rate limits
         self.cache_duration = 15  # 15 seconds cache
+        self.semaphore = asyncio.Semaphore(MARKET_DATA_CONCURRENCY)  # bounds concurrent upstream calls
         
     async def get_forex_price(self, symbol: str) -> Optional[Dict]:
         """Get real Forex price from Finnhub"""
@@ -32,7 +49,8 @@ class RealMarketData:
                 'token': FINNHUB_API_KEY
             }
             
-            response = await self.client.get(url, params=params)
+            async with self.semaphore:
+                response = await self.client.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('c'):  # Current price
@@ -53,37 +71,35 @@ class RealMarketData:
     
     async def get_crypto_price(self, symbol: str) -> Optional[Dict]:
         """Get real Crypto price from CoinGecko"""
+        return (await self.get_crypto_prices([symbol])).get(symbol)
+    
+    async def get_crypto_prices(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Get real Crypto prices from CoinGecko, all coins in one simple/price call"""
+        coin_ids = {symbol: CRYPTO_IDS[symbol] for symbol in symbols if symbol in CRYPTO_IDS}
+        if not coin_ids:
+            return {}
+        
+        prices = {}
         try:
-            # Map symbols to CoinGecko IDs
-            crypto_map = {
-                'BTC/USD': 'bitcoin',
-                'ETH/USD': 'ethereum',
-                'XRP/USD': 'ripple',
-                'LTC/USD': 'litecoin',
-                'ADA/USD': 'cardano',
-                'DOT/USD': 'polkadot',
-            }
-            
-            coin_id = crypto_map.get(symbol)
-            if not coin_id:
-                return None
-            
             url = f"{COINGECKO_API_URL}/simple/price"
             params = {
-                'ids': coin_id,
+                'ids': ','.join(sorted(set(coin_ids.values()))),
                 'vs_currencies': 'usd',
                 'include_24hr_change': 'true',
                 'include_24hr_vol': 'true'
             }
             
-            response = await self.client.get(url, params=params)
+            async with self.semaphore:
+                response = await self.client.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
-                if coin_id in data:
+                for symbol, coin_id in coin_ids.items():
+                    if coin_id not in data:
+                        continue
                     price_data = data[coin_id]
                     price = price_data['usd']
                     
-                    return {
+                    prices[symbol] = {
                         'symbol': symbol,
                         'price': float(price),
                         'bid': float(price) * 0.999,  # Approximate spread
@@ -95,8 +111,8 @@ class RealMarketData:
                         'timestamp': datetime.now().isoformat()
                     }
         except Exception as e:
-            print(f"Error fetching Crypto data for {symbol}: {e}")
-            return None
+            print(f"Error fetching Crypto data for {', '.join(coin_ids)}: {e}")
+        return prices
     
     async def get_stock_price(self, symbol: str) -> Optional[Dict]:
         """Get real Stock price from Finnhub"""
@@ -107,7 +123,8 @@ class RealMarketData:
                 'token': FINNHUB_API_KEY
             }
             
-            response = await self.client.get(url, params=params)
+            async with self.semaphore:
+                response = await self.client.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('c'):  # Current price
@@ -146,7 +163,8 @@ class RealMarketData:
                 'token': FINNHUB_API_KEY
             }
             
-            response = await self.client.get(url, params=params)
+            async with self.semaphore:
+                response = await self.client.get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('c'):
@@ -165,31 +183,64 @@ class RealMarketData:
             print(f"Error fetching Commodity data for {symbol}: {e}")
             return None
     
-    async def get_price(self, symbol: str, category: str) -> Optional[Dict]:
-        """Get price for any symbol based on category"""
-        # Check cache first
-        cache_key = f"{symbol}_{category}"
+    def _cached(self, cache_key: str) -> Optional[Dict]:
         if cache_key in self.cache:
             cached_data, cached_time = self.cache[cache_key]
-            if (datetime.now() - cached_time).seconds < self.cache_duration:
+            if (datetime.now() - cached_time).total_seconds() < self.cache_duration:
                 return cached_data
-        
-        # Fetch fresh data
-        data = None
+        return None
+    
+    async def _fetch_price(self, symbol: str, category: str) -> Optional[Dict]:
         if category == 'forex':
-            data = await self.get_forex_price(symbol)
+            return await self.get_forex_price(symbol)
         elif category == 'crypto':
-            data = await self.get_crypto_price(symbol)
+            return await self.get_crypto_price(symbol)
         elif category == 'stock':
-            data = await self.get_stock_price(symbol)
-        elif category == 'metal' or category == 'commodity':
-            data = await self.get_commodity_price(symbol)
+            return await self.get_stock_price(symbol)
+        elif category in ('metal', 'metals', 'commodity'):
+            return await self.get_commodity_price(symbol)
+        return None
+    
+    async def get_price(self, symbol: str, category: str) -> Optional[Dict]:
+        """Get price for any symbol based on category"""
+        return (await self.get_prices([(symbol, category)])).get((symbol, category))
+    
+    async def get_prices(self, symbols: Iterable[Tuple[str, str]], use_cache: bool = True) -> Dict[Tuple[str, str], Dict]:
+        """
+        Get prices for many (symbol, category) pairs at once -> {(symbol, category): data}.
+        Cache misses are fetched concurrently, crypto in one batched call, so this takes
+        about as long as the slowest single upstream call. Symbols without data are omitted.
+        use_cache=False fetches everything (the quote snapshot refresher).
+        """
+        prices = {}
+        missing: List[Tuple[str, str]] = []
+        for symbol, category in dict.fromkeys(symbols):
+            # Check cache first
+            cached_data = self._cached(f"{symbol}_{category}") if use_cache else None
+            if cached_data:
+                prices[(symbol, category)] = cached_data
+            else:
+                missing.append((symbol, category))
+        if not missing:
+            return prices
+        
+        # Fetch fresh data
+        crypto = [(symbol, category) for symbol, category in missing if category == 'crypto']
+        others = [(symbol, category) for symbol, category in missing if category != 'crypto']
+        crypto_prices, *other_prices = await asyncio.gather(
+            self.get_crypto_prices([symbol for symbol, _ in crypto]),
+            *(self._fetch_price(symbol, category) for symbol, category in others)
+        )
+        fetched = [(pair, crypto_prices.get(pair[0])) for pair in crypto] + list(zip(others, other_prices))
         
         # Update cache
-        if data:
-            self.cache[cache_key] = (data, datetime.now())
+        now = datetime.now()
+        for (symbol, category), data in fetched:
+            if data:
+                self.cache[f"{symbol}_{category}"] = (data, now)
+                prices[(symbol, category)] = data
         
-        return data
+        return prices
     
     async def get_historical_data(self, symbol: str, category: str, timeframe: str = '1H') -> list:
         """Get historical candle data for technical indicators"""
@@ -198,10 +249,12 @@ class RealMarketData:
         current_data = await self.get_price(symbol, category)
         if not current_data:
             return []
-        
-        # Generate mock recent history based on current price
+        return self.synthetic_history(current_data['price'])
+    
+    @staticmethod
+    def synthetic_history(base_price: float) -> list:
+        """Mock recent candles around a current price"""
         import random
-        base_price = current_data['price']
         history = []
         
         for i in range(100, 0, -1):
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Body, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -9,16 +10,35 @@ import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import random
 from market_simulator import market_simulator
 from real_market_data import real_market_data
+from market_quotes import quote_snapshot
+import market_quotes
 from indicators import TechnicalIndicators, SignalGenerator
+from indicator_cache import indicator_cache
+from signal_fanout import insert_many_chunked, log_fanout, update_many_chunked
+from subscription_schedule import schedule_fields
+import signal_inbox
+import signal_stream
+from push_service import push_service, messages_for_tokens
+import push_queue
+import push_tokens
+from push_tokens import push_token_cache
+import principal_cache
+from principal_cache import load_principal, KIND_ADMIN, KIND_MENTOR, KIND_USER
+import leader_election
+from economic_calendar import calendar_snapshot
+import economic_calendar
+import news_feed
+import bulk_provisioning
 import httpx
 import asyncio
 from auth import (
     UserRegister, UserLogin, AdminLogin, Token,
-    verify_password, get_password_hash, create_access_token, verify_token
+    create_access_token, verify_token,
+    verify_password_async, verify_and_update_password_async, get_password_hash_async, shutdown_hash_executor
 )
 from license_manager import LicenseManager
 from models import User, Admin, UserActivity
@@ -124,9 +144,9 @@ def generate_random_string(length):
     alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
     return ''.join(secrets.choice(alphabet) for i in range(length))
 
-def hash_password(password):
-    """Hash a password using the auth module"""
-    return get_password_hash(password)
+async def hash_password(password):
+    """Hash a password using the auth module (off the event loop)"""
+    return await get_password_hash_async(password)
 
 ROOT_DIR = Path(__file__).parent
 # Load .env file but don't override environment variables from Kubernetes
@@ -157,6 +177,11 @@ def serialize_doc(doc):
 # Security
 security = HTTPBearer()
 
+def check_token_version(payload: dict, principal: dict):
+    """Reject tokens issued before the principal's last password reset (token_version bump)"""
+    if payload.get("ver", 0) != principal_cache.token_version(principal):
+        raise HTTPException(status_code=401, detail="Token has been revoked. Please log in again.")
+
 # Dependency to get current user from JWT token
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
@@ -178,14 +203,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
-    # Fetch user from database
-    if user_type == "admin":
-        user = await db.admins.find_one({"_id": ObjectId(user_id)})
-    else:
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+    # Resolve the principal (cached for a few seconds, see principal_cache)
+    user = await load_principal(db, KIND_ADMIN if user_type == "admin" else KIND_USER, user_id)
     
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    check_token_version(payload, user)
     
     # For regular users (not admins), enforce payment requirement
     if user_type != "admin":
@@ -209,7 +232,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         # regardless of status field (unless explicitly deactivated above)
         # This allows existing users marked as paid to access the app
     
-    return serialize_doc(user)
+    return user
 
 # Dependency for payment endpoints - allows pending users to pay
 async def get_current_user_for_payment(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -222,26 +245,25 @@ async def get_current_user_for_payment(credentials: HTTPAuthorizationCredentials
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    # Fetch user from database
-    if user_type == "admin":
-        user = await db.admins.find_one({"_id": ObjectId(user_id)})
-    else:
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await load_principal(db, KIND_ADMIN if user_type == "admin" else KIND_USER, user_id)
     
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    check_token_version(payload, user)
     
     # Allow pending users to access payment (they need to pay to proceed)
     # Only block if truly deactivated/inactive
     if user_type != "admin" and user.get("status") == "inactive":
         raise HTTPException(status_code=403, detail="Account is deactivated. Please contact admin.")
     
-    return serialize_doc(user)
+    return user
 
 # Push Notification Helper Function
 async def send_push_notifications_batch(messages: List[dict]):
     """
-    Send push notifications in batch using Expo Push Notification Service
+    Queue push notifications for delivery via Expo Push Notification Service.
+    Messages are persisted in push_queue and sent by background consumers (see push_queue),
+    so callers do not wait on the push provider.
     
     Args:
         messages: List of notification messages in format:
@@ -257,33 +279,9 @@ async def send_push_notifications_batch(messages: List[dict]):
         return
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://exp.host/--/api/v2/push/send',
-                json=messages,
-                headers={
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json',
-                    'Accept-Encoding': 'gzip, deflate',
-                },
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"✅ Push notifications sent successfully: {len(messages)} messages")
-                
-                # Log any errors from Expo
-                if 'data' in result:
-                    for idx, item in enumerate(result['data']):
-                        if item.get('status') == 'error':
-                            logger.error(f"Push notification error for message {idx}: {item.get('message')}")
-            else:
-                logger.error(f"❌ Push notification failed: {response.status_code} - {response.text}")
-                
+        await push_queue.enqueue(db, messages, "Push notifications")
     except Exception as e:
-        logger.error(f"❌ Error sending push notifications: {str(e)}")
-
+        logger.error(f"❌ Error queueing push notifications: {str(e)}")
 
 
 # Dependency to get current admin
@@ -307,16 +305,16 @@ async def get_current_mentor(credentials: HTTPAuthorizationCredentials = Depends
     if user_type != "mentor":
         raise HTTPException(status_code=403, detail="Mentor access required")
     
-    # Fetch mentor from database
-    mentor = await db.mentors.find_one({"_id": ObjectId(user_id)})
+    mentor = await load_principal(db, KIND_MENTOR, user_id)
     
     if not mentor:
         raise HTTPException(status_code=401, detail="Mentor not found")
+    check_token_version(payload, mentor)
     
     if mentor.get("status") != "active":
         raise HTTPException(status_code=403, detail="Mentor account is not active")
     
-    return serialize_doc(mentor)
+    return mentor
 
 # Optional auth - returns None if no token provided
 async def get_current_user_optional(authorization: Optional[str] = Header(None)):
@@ -326,9 +324,9 @@ async def get_current_user_optional(authorization: Optional[str] = Header(None))
         token = authorization.replace("Bearer ", "")
         payload = verify_token(token)
         if payload:
-            user_id = payload.get("sub")
-            user = await db.users.find_one({"_id": ObjectId(user_id)})
-            return serialize_doc(user) if user else None
+            user = await load_principal(db, KIND_USER, payload.get("sub"))
+            if user and payload.get("ver", 0) == principal_cache.token_version(user):
+                return user
     except:
         return None
     return None
@@ -409,9 +407,12 @@ async def get_market_status():
     if twelve_data_key and twelve_data_key != '':
         twelve_data_status = "active"
     
-    # Get a sample quote to show data source
-    sample_quotes = await get_quotes(category="forex")
-    sample_source = sample_quotes[0]["source"] if sample_quotes else "unknown"
+    # Data source of a sample quote, from the shared quote snapshot
+    forex_symbols = market_simulator.get_all_symbols().get("forex", [])
+    sample_source = "unknown"
+    if forex_symbols:
+        sample_source = "real" if quote_snapshot.quote(forex_symbols[0]) else "simulated"
+    snapshot_stats = quote_snapshot.stats()
     
     return {
         "status": "operational",
@@ -421,7 +422,10 @@ async def get_market_status():
             "twelve_data_api": twelve_data_status,
             "coingecko_api": "active (free)",
             "current_source": sample_source,
-            "note": "If 'simulated', add FINNHUB_API_KEY to .env for real forex data"
+            "note": "If 'simulated', add FINNHUB_API_KEY to .env for real forex data",
+            "quotes_refreshed_at": snapshot_stats["refreshed_at"],
+            "quotes_age_seconds": snapshot_stats["age_seconds"],
+            "quotes_stale": snapshot_stats["stale"]
         },
         "timeframe_monitoring": {
             "description": "Each timeframe is monitored at different intervals",
@@ -454,7 +458,7 @@ async def initialize_database():
         if not existing_admin:
             admin_doc = {
                 "email": admin_email,
-                "password_hash": get_password_hash("Admin@123"),
+                "password_hash": await get_password_hash_async("Admin@123"),
                 "name": "System Admin",
                 "role": "super_admin",
                 "permissions": ["view_users", "manage_users", "view_activity", "manage_licenses"],
@@ -511,7 +515,7 @@ async def initialize_database():
             if not existing_mentor:
                 mentor_doc = {
                     "email": mentor_data["email"],
-                    "password_hash": get_password_hash("Mentor@123"),
+                    "password_hash": await get_password_hash_async("Mentor@123"),
                     "name": mentor_data["name"],
                     "mentor_id": mentor_data["mentor_id"],
                     "company_name": mentor_data["company_name"],
@@ -571,7 +575,7 @@ async def initialize_database():
                 if not existing_user:
                     user_doc = {
                         "email": user_data["email"],
-                        "password_hash": get_password_hash("Test@123"),
+                        "password_hash": await get_password_hash_async("Test@123"),
                         "name": user_data["name"],
                         "mentor_id": user_data["mentor_id"],
                         "license_key": available_licenses[idx]["key"],
@@ -657,7 +661,7 @@ async def register_user(user_data: UserRegister):
             await db.mentors.insert_one(mentor_doc)
     
     # Create user with pending status (requires admin approval)
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user_doc = {
         "email": user_data.email,
         "password_hash": hashed_password,
@@ -736,7 +740,7 @@ async def login_user(login_data: UserLogin):
     logger.info(f"✅ User found: {user.get('email')} | Role: {user.get('role')}")
     logger.info(f"   Has password_hash: {bool(user.get('password_hash'))}")
     
-    password_valid = verify_password(login_data.password, user["password_hash"])
+    password_valid, upgraded_hash = await verify_and_update_password_async(login_data.password, user["password_hash"])
     logger.info(f"   Password verification: {password_valid}")
     
     if not password_valid:
@@ -761,10 +765,13 @@ async def login_user(login_data: UserLogin):
     
     user_id = str(user["_id"])
     
-    # Update last login
+    # Update last login (and re-hash passwords stored with another bcrypt cost factor)
+    login_update = {"last_login": datetime.utcnow()}
+    if upgraded_hash:
+        login_update["password_hash"] = upgraded_hash
     await db.users.update_one(
         {"_id": user["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
+        {"$set": login_update}
     )
     
     # Log activity
@@ -776,7 +783,7 @@ async def login_user(login_data: UserLogin):
     })
     
     # Create access token
-    access_token = create_access_token(data={"sub": user_id, "type": "user"})
+    access_token = create_access_token(data={"sub": user_id, "type": "user", "ver": principal_cache.token_version(user)})
     
     return {
         "access_token": access_token,
@@ -817,7 +824,7 @@ async def forgot_password(email: str = Body(..., embed=True)):
         
         # Generate temporary password
         temp_password = generate_random_string(12)
-        password_hash = get_password_hash(temp_password)
+        password_hash = await get_password_hash_async(temp_password)
         
         # Update user with new password and set requires_password_change flag
         await db.users.update_one(
@@ -830,6 +837,7 @@ async def forgot_password(email: str = Body(..., embed=True)):
                 }
             }
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user["_id"]])
         
         logger.info(f"✅ Password reset for user: {email}")
         
@@ -900,7 +908,7 @@ async def reset_password_with_license_key(email: str = Body(...), license_key: s
         
         # Generate temporary password
         temp_password = generate_random_string(12)
-        password_hash = get_password_hash(temp_password)
+        password_hash = await get_password_hash_async(temp_password)
         
         # Update user password
         await db.users.update_one(
@@ -911,9 +919,11 @@ async def reset_password_with_license_key(email: str = Body(...), license_key: s
                     "requires_password_change": True,
                     "password_reset_at": datetime.utcnow(),
                     "password_reset_method": "license_key"
-                }
+                },
+                "$inc": {"token_version": 1}
             }
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user["_id"]])
         
         logger.info(f"✅ Password reset via license key for user: {email}")
         logger.info(f"🔑 TEMPORARY PASSWORD FOR {email}: {temp_password}")
@@ -988,7 +998,7 @@ async def reset_password_with_license_direct(
             }
         
         # Hash the new password
-        password_hash = get_password_hash(new_password)
+        password_hash = await get_password_hash_async(new_password)
         
         # Update user password
         await db.users.update_one(
@@ -999,9 +1009,11 @@ async def reset_password_with_license_direct(
                     "requires_password_change": False,
                     "password_reset_at": datetime.utcnow(),
                     "password_reset_method": "license_key_direct"
-                }
+                },
+                "$inc": {"token_version": 1}
             }
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user["_id"]])
         
         logger.info(f"✅ Password reset directly via license key for user: {email}")
         logger.info(f"🔑 User can now login with their new password: {email}")
@@ -1082,7 +1094,7 @@ async def reset_password_license_only(
             raise HTTPException(status_code=404, detail="Invalid email or license key combination")
         
         # Hash the new password
-        password_hash = get_password_hash(new_password)
+        password_hash = await get_password_hash_async(new_password)
         
         # Update password in the appropriate collection
         collection = db.users if user_type == "user" else db.mentors
@@ -1094,9 +1106,11 @@ async def reset_password_license_only(
                     "requires_password_change": False,
                     "password_reset_at": datetime.utcnow(),
                     "password_reset_method": "email_license_key"
-                }
+                },
+                "$inc": {"token_version": 1}
             }
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER if user_type == "user" else KIND_MENTOR, [user["_id"]])
         
         logger.info(f"✅ Password reset via email+license for {user_type}: {user.get('email', 'N/A')}")
         
@@ -1117,7 +1131,8 @@ async def reset_password_license_only(
         access_token = create_access_token(
             data={
                 "sub": str(user["_id"]),
-                "type": user_type
+                "type": user_type,
+                "ver": principal_cache.token_version(user) + 1
             }
         )
         
@@ -1169,7 +1184,7 @@ async def mentor_forgot_password(email: str = Body(..., embed=True)):
         
         # Generate temporary password
         temp_password = generate_random_string(12)
-        password_hash = get_password_hash(temp_password)
+        password_hash = await get_password_hash_async(temp_password)
         
         # Update mentor with new password
         await db.mentors.update_one(
@@ -1181,6 +1196,7 @@ async def mentor_forgot_password(email: str = Body(..., embed=True)):
                 }
             }
         )
+        await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor["_id"]])
         
         logger.info(f"✅ Password reset for mentor: {email}")
         
@@ -1233,7 +1249,7 @@ async def change_password(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Verify current password
-    if not verify_password(current_password, user["password_hash"]):
+    if not await verify_password_async(current_password, user["password_hash"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Validate new password
@@ -1241,7 +1257,7 @@ async def change_password(
         raise HTTPException(status_code=400, detail="New password must be at least 8 characters")
     
     # Hash new password
-    new_password_hash = get_password_hash(new_password)
+    new_password_hash = await get_password_hash_async(new_password)
     
     # Update password and remove requires_password_change flag
     result = await db.users.update_one(
@@ -1254,6 +1270,7 @@ async def change_password(
             }
         }
     )
+    await principal_cache.invalidate_everywhere(db, KIND_USER, [user["_id"]])
     
     if result.modified_count > 0:
         # Log activity
@@ -1319,19 +1336,25 @@ async def get_user_mentor_info(current_user = Depends(get_current_user)):
 async def login_admin(login_data: AdminLogin):
     """Login admin"""
     admin = await db.admins.find_one({"email": login_data.email})
-    if not admin or not verify_password(login_data.password, admin["password_hash"]):
+    if not admin:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    password_valid, upgraded_hash = await verify_and_update_password_async(login_data.password, admin["password_hash"])
+    if not password_valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     admin_id = str(admin["_id"])
     
     # Update last login
+    login_update = {"last_login": datetime.utcnow()}
+    if upgraded_hash:
+        login_update["password_hash"] = upgraded_hash
     await db.admins.update_one(
         {"_id": admin["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
+        {"$set": login_update}
     )
     
     # Create access token
-    access_token = create_access_token(data={"sub": admin_id, "type": "admin"})
+    access_token = create_access_token(data={"sub": admin_id, "type": "admin", "ver": principal_cache.token_version(admin)})
     
     return {
         "access_token": access_token,
@@ -1379,7 +1402,7 @@ async def register_mentor(
         "email": email,
         "phone": phone,
         "social_media": social_media,
-        "password_hash": get_password_hash(password),
+        "password_hash": await get_password_hash_async(password),
         "password_plain": password,  # Temporary storage for email
         "license_key": license_key,
         "status": "pending",  # Requires admin approval
@@ -1455,7 +1478,8 @@ async def login_mentor(login_data: AdminLogin):
             detail="Account not activated. Please contact admin to set up your password."
         )
     
-    if not verify_password(login_data.password, mentor["password_hash"]):
+    password_valid, upgraded_hash = await verify_and_update_password_async(login_data.password, mentor["password_hash"])
+    if not password_valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Check if mentor is active
@@ -1468,9 +1492,12 @@ async def login_mentor(login_data: AdminLogin):
     mentor_id_str = str(mentor["_id"])
     
     # Update last login
+    login_update = {"last_login": datetime.utcnow()}
+    if upgraded_hash:
+        login_update["password_hash"] = upgraded_hash
     await db.mentors.update_one(
         {"_id": mentor["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
+        {"$set": login_update}
     )
     
     # Create access token with mentor role
@@ -1478,6 +1505,7 @@ async def login_mentor(login_data: AdminLogin):
         data={
             "sub": mentor_id_str, 
             "type": "mentor",
+            "ver": principal_cache.token_version(mentor),
             "mentor_id": mentor.get("mentor_id")
         }
     )
@@ -1566,6 +1594,7 @@ async def mentor_activate_user(user_id: str, current_mentor = Depends(get_curren
             }
         }
     )
+    await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
     
     if result.modified_count > 0:
         logger.info(f"✅ Mentor {current_mentor['email']} activated user {user_id} - Status: active, Payment: paid")
@@ -1587,6 +1616,7 @@ async def mentor_deactivate_user(user_id: str, current_mentor = Depends(get_curr
         {"_id": ObjectId(user_id)},
         {"$set": {"status": "inactive"}}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
     
     if result.modified_count > 0:
         return {"message": "User deactivated successfully"}
@@ -1608,7 +1638,7 @@ async def mentor_reset_user_password(user_id: str, current_mentor = Depends(get_
     
     # Generate temporary password
     temp_password = generate_random_string(12)
-    password_hash = hash_password(temp_password)
+    password_hash = await hash_password(temp_password)
     
     result = await db.users.update_one(
         {"_id": ObjectId(user_id)},
@@ -1616,8 +1646,9 @@ async def mentor_reset_user_password(user_id: str, current_mentor = Depends(get_
             "password_hash": password_hash,
             "requires_password_change": True,
             "password_reset_at": datetime.utcnow()
-        }}
+        }, "$inc": {"token_version": 1}}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
     
     if result.modified_count > 0:
         # Send email notification to user
@@ -1724,6 +1755,7 @@ async def update_mentor_system_name(
         {"_id": ObjectId(mentor_id)},
         {"$set": {"system_name": system_name}}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_id])
     
     if result.modified_count > 0:
         return {"message": "System name updated successfully", "system_name": system_name}
@@ -1756,6 +1788,7 @@ async def update_mentor_background(
         {"_id": ObjectId(mentor_id)},
         {"$set": update_fields}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_id])
     
     if result.matched_count > 0:
         return {
@@ -1812,6 +1845,7 @@ async def update_mentor_branding_all(
         {"_id": ObjectId(mentor_id)},
         {"$set": update_fields}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_id])
     
     if result.matched_count > 0:
         return {
@@ -1852,6 +1886,7 @@ async def update_user_by_admin(
             {"_id": ObjectId(user_id)},
             {"$set": {**update_data, "updated_at": datetime.utcnow()}}
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
         return {"message": "User updated successfully"}
@@ -2003,11 +2038,13 @@ async def reactivate_license(
                 {"_id": old_user_id},
                 {"$set": {"license_key": None, "status": "pending", "payment_status": "unpaid"}}
             )
+            await principal_cache.invalidate_everywhere(db, KIND_USER, [old_user_id])
         elif old_user_email:
             await db.users.update_one(
                 {"email": old_user_email},
                 {"$set": {"license_key": None, "status": "pending", "payment_status": "unpaid"}}
             )
+            await principal_cache.invalidate_matching(db, KIND_USER, {"email": old_user_email})
         
         logger.info(f"License {clean_key} reactivated successfully")
         return {
@@ -2036,6 +2073,7 @@ async def activate_user(user_id: str, current_admin = Depends(get_current_admin)
             {"_id": ObjectId(user_id)},
             {"$set": {"status": "active", "updated_at": datetime.utcnow()}}
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -2055,6 +2093,7 @@ async def deactivate_user(user_id: str, current_admin = Depends(get_current_admi
         {"_id": ObjectId(user_id)},
         {"$set": {"status": "inactive", "updated_at": datetime.utcnow()}}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
     
     if result.modified_count > 0:
         return {"message": "User deactivated successfully"}
@@ -2074,7 +2113,7 @@ async def reset_user_password(user_id: str, current_admin = Depends(get_current_
     temp_password = ''.join(secrets.choice(alphabet) for i in range(12))
     
     # Hash the temporary password
-    hashed_password = get_password_hash(temp_password)
+    hashed_password = await get_password_hash_async(temp_password)
     
     # Update user password and set flag for password change
     result = await db.users.update_one(
@@ -2085,9 +2124,11 @@ async def reset_user_password(user_id: str, current_admin = Depends(get_current_
                 "requires_password_change": True,
                 "password_reset_at": datetime.utcnow(),
                 "password_reset_by": "admin"
-            }
+            },
+            "$inc": {"token_version": 1}
         }
     )
+    await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
     
     if result.modified_count > 0:
         user_email = user.get('email', '')
@@ -2131,7 +2172,7 @@ async def reset_mentor_password(mentor_id: str, current_admin = Depends(get_curr
     temp_password = ''.join(secrets.choice(alphabet) for i in range(12))
     
     # Hash the temporary password
-    hashed_password = get_password_hash(temp_password)
+    hashed_password = await get_password_hash_async(temp_password)
     
     # Update mentor password and set flag for password change
     result = await db.mentors.update_one(
@@ -2142,9 +2183,11 @@ async def reset_mentor_password(mentor_id: str, current_admin = Depends(get_curr
                 "requires_password_change": True,
                 "password_reset_at": datetime.utcnow(),
                 "password_reset_by": "admin"
-            }
+            },
+            "$inc": {"token_version": 1}
         }
     )
+    await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_id])
     
     if result.modified_count > 0:
         mentor_email = mentor.get('email', '')
@@ -2186,6 +2229,7 @@ async def delete_user(user_id: str, current_admin = Depends(get_current_admin)):
         
         # Delete user
         result = await db.users.delete_one({"_id": ObjectId(user_id)})
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
         
         if result.deleted_count > 0:
             # Log the deletion
@@ -2229,7 +2273,7 @@ async def admin_create_user(user_data: AdminCreateUser, current_admin = Depends(
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Hash the password
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         
         # Create user document
         user_doc = {
@@ -2285,6 +2329,86 @@ async def admin_create_user(user_data: AdminCreateUser, current_admin = Depends(
         logger.error(f"Error creating user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create user: {str(e)}")
 
+class BulkUserRow(BaseModel):
+    email: str
+    password: Optional[str] = None  # a temporary password is generated (and returned) when omitted
+    name: str = ""
+    mentor_id: str = ""
+
+class BulkCreateUsers(BaseModel):
+    users: List[BulkUserRow]
+    mentor_id: Optional[str] = None  # default mentor, and the license pool to draw from
+    status: str = "active"
+    payment_status: str = "paid"
+    assign_licenses: bool = False
+
+@api_router.post("/admin/users/bulk-create")
+async def admin_bulk_create_users(request: BulkCreateUsers, current_admin = Depends(get_current_admin)):
+    """
+    Create up to PROVISION_MAX_BATCH users in one call (admin only).
+    Existing emails are skipped; license keys come from the mentor's (or the system) pool
+    and are generated when the pool runs out.
+    """
+    if len(request.users) > bulk_provisioning.PROVISION_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {bulk_provisioning.PROVISION_MAX_BATCH} users per request")
+    try:
+        result = await bulk_provisioning.provision_accounts(
+            db, "user", [row.dict() for row in request.users],
+            assign_licenses=request.assign_licenses,
+            license_mentor_id=request.mentor_id,
+            mentor_id=request.mentor_id,
+            status=request.status,
+            payment_status=request.payment_status,
+            created_by_admin=True,
+            creator_id=str(current_admin["_id"])
+        )
+        logger.info(f"✅ Admin {current_admin['email']} bulk-created {len(result['created'])} users")
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error bulk-creating users: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create users: {str(e)}")
+
+@api_router.post("/mentor/users/bulk-create")
+async def mentor_bulk_create_users(request: BulkCreateUsers, current_mentor = Depends(get_current_mentor)):
+    """
+    Onboard a cohort of users for this mentor, each with one of the mentor's license keys.
+    Enforces the mentor's max_users and max_licenses limits.
+    """
+    mentor_id = current_mentor.get("mentor_id")
+    count = len(request.users)
+    if count > bulk_provisioning.PROVISION_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {bulk_provisioning.PROVISION_MAX_BATCH} users per request")
+    
+    max_users = current_mentor.get("max_users", 50)
+    current_users = await db.users.count_documents({"mentor_id": mentor_id})
+    if current_users + count > max_users:
+        raise HTTPException(status_code=400, detail=f"Cannot add {count} users. Would exceed your limit of {max_users}")
+    
+    unused_licenses = await db.licenses.count_documents({"mentor_id": mentor_id, "used": False, "reserved_by": None})
+    license_capacity = current_mentor.get("max_licenses", 100) - await db.licenses.count_documents({"mentor_id": mentor_id})
+    if unused_licenses + max(license_capacity, 0) < count:
+        raise HTTPException(status_code=400, detail=f"Not enough license keys for {count} users")
+    
+    try:
+        result = await bulk_provisioning.provision_accounts(
+            db, "user", [{**row.dict(), "mentor_id": mentor_id} for row in request.users],
+            assign_licenses=True,
+            license_mentor_id=mentor_id,
+            mentor_id=mentor_id,
+            status=request.status,
+            payment_status=request.payment_status,
+            creator_id=str(current_mentor["_id"])
+        )
+        logger.info(f"✅ Mentor {mentor_id} bulk-created {len(result['created'])} users")
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error bulk-creating users for mentor {mentor_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create users: {str(e)}")
+
 # ============ EMAIL MANAGEMENT ENDPOINTS ============
 
 class EmailSendRequest(BaseModel):
@@ -2533,6 +2657,7 @@ async def approve_mentor(mentor_db_id: str, current_admin = Depends(get_current_
             "approved_at": datetime.now()
         }}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_db_id])
     
     # Send mentor approval email with credentials
     mentor_email = mentor.get("email")
@@ -2583,6 +2708,7 @@ async def decline_mentor(mentor_db_id: str, current_admin = Depends(get_current_
             "declined_at": datetime.now()
         }}
     )
+    await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_db_id])
     
     return {
         "message": "Mentor registration declined",
@@ -2619,6 +2745,7 @@ async def delete_mentor(mentor_db_id: str, current_admin = Depends(get_current_a
         
         # Delete mentor record
         result = await db.mentors.delete_one({"_id": ObjectId(mentor_db_id)})
+        await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_db_id])
         
         if result.deleted_count > 0:
             # Delete all license keys associated with this mentor
@@ -2668,6 +2795,7 @@ async def deactivate_mentor(mentor_db_id: str, current_admin = Depends(get_curre
             {"_id": ObjectId(mentor_db_id)},
             {"$set": {"status": "inactive", "updated_at": datetime.utcnow()}}
         )
+        await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_db_id])
         
         if result.modified_count > 0:
             return {"message": "Mentor deactivated successfully"}
@@ -2687,6 +2815,7 @@ async def activate_mentor(mentor_db_id: str, current_admin = Depends(get_current
             {"_id": ObjectId(mentor_db_id)},
             {"$set": {"status": "active", "updated_at": datetime.utcnow()}}
         )
+        await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_db_id])
         
         if result.modified_count > 0:
             return {"message": "Mentor activated successfully"}
@@ -2717,6 +2846,7 @@ async def update_mentor_max_users(
             {"_id": ObjectId(mentor_db_id)},
             {"$set": {"max_users": max_users, "updated_at": datetime.utcnow()}}
         )
+        await principal_cache.invalidate_everywhere(db, KIND_MENTOR, [mentor_db_id])
         
         if result.modified_count > 0:
             return {"message": f"Max users updated to {max_users}", "max_users": max_users}
@@ -2977,6 +3107,7 @@ async def approve_user(user_id: str, current_admin = Depends(get_current_admin))
                 }
             }
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -3011,6 +3142,7 @@ async def decline_user(user_id: str, current_admin = Depends(get_current_admin))
         
         # Delete user
         await db.users.delete_one({"_id": ObjectId(user_id)})
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
         
         # Log activity
         await db.user_activity.insert_one({
@@ -3300,14 +3432,10 @@ async def calculate_ea_signal(ea_id: str, current_user = Depends(get_current_use
 
 # Push Notification Routes
 @api_router.post("/push-token")
-async def save_push_token(token_data: PushToken):
+async def save_push_token(token_data: PushToken, current_user = Depends(get_current_user_optional)):
     try:
-        # Store or update push token
-        await db.push_tokens.update_one(
-            {"token": token_data.token},
-            {"$set": {"token": token_data.token, "updated_at": datetime.utcnow()}},
-            upsert=True
-        )
+        # Store or update push token, linked to the signed-in user when a bearer token is sent
+        await push_tokens.register_token(db, token_data.token, current_user["_id"] if current_user else None)
         return {"message": "Push token saved successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -3315,8 +3443,10 @@ async def save_push_token(token_data: PushToken):
 async def send_signal_notification(ea: dict, signal: str, price: float):
     """Send push notification when signal changes"""
     try:
-        # Get all push tokens
-        tokens = await db.push_tokens.find().to_list(1000)
+        # Push tokens of the EA owner (not every token in the database)
+        if not ea.get("user_id"):
+            return
+        tokens = await push_token_cache.tokens_for_user(db, ea["user_id"])
         
         if not tokens:
             return
@@ -3329,31 +3459,13 @@ async def send_signal_notification(ea: dict, signal: str, price: float):
         body = f"{indicator} detected {signal} signal at {price:.5f}"
         
         # Send to Expo Push Notification service
-        messages = []
-        for token_doc in tokens:
-            messages.append({
-                "to": token_doc["token"],
-                "sound": "default",
-                "title": title,
-                "body": body,
-                "data": {
-                    "ea_id": str(ea["_id"]),
-                    "symbol": symbol,
-                    "signal": signal,
-                    "price": price
-                },
-                "priority": "high",
-                "channelId": "default"
-            })
-        
-        # Send notifications in batches
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://exp.host/--/api/v2/push/send',
-                json=messages,
-                timeout=10.0
-            )
-            logging.info(f"Notification sent: {response.status_code}")
+        messages = messages_for_tokens(tokens, title, body, {
+            "ea_id": str(ea["_id"]),
+            "symbol": symbol,
+            "signal": signal,
+            "price": price
+        })
+        await send_push_notifications_batch(messages)
     except Exception as e:
         logging.error(f"Error sending notification: {e}")
 
@@ -3365,7 +3477,7 @@ async def get_symbols():
 
 @api_router.get("/quotes")
 async def get_quotes(category: Optional[str] = None):
-    """Get real-time market quotes from Finnhub & CoinGecko"""
+    """Market quotes from the shared Finnhub & CoinGecko snapshot (simulated where no live quote exists)"""
     all_symbols = market_simulator.get_all_symbols()
     
     if category:
@@ -3374,8 +3486,8 @@ async def get_quotes(category: Optional[str] = None):
     quotes = []
     for cat, symbols in all_symbols.items():
         for symbol in symbols:
-            # Try to get real market data first
-            real_data = await real_market_data.get_price(symbol, cat)
+            # Live quote from the snapshot (memory only, refreshed in the background)
+            real_data = quote_snapshot.quote(symbol)
             
             if real_data:
                 # Use real market data
@@ -3388,7 +3500,9 @@ async def get_quotes(category: Optional[str] = None):
                     'change': real_data['change'],
                     'change_percent': real_data['change_percent'],
                     'source': 'real',  # Indicate real data
-                    'timestamp': real_data['timestamp']
+                    'timestamp': real_data['timestamp'],
+                    'age_seconds': real_data['age_seconds'],
+                    'stale': real_data['stale']
                 })
             else:
                 # Fallback to simulated data if real data fails
@@ -3412,6 +3526,22 @@ async def get_quotes(category: Optional[str] = None):
     
     return quotes
 
+@api_router.get("/admin/quote-snapshot")
+async def get_quote_snapshot_stats(current_admin = Depends(get_current_admin)):
+    """Quote snapshot state of this worker (version, age, stale quotes, refresh counters)"""
+    return quote_snapshot.stats()
+
+@api_router.post("/admin/quote-snapshot/refresh")
+async def refresh_quote_snapshot(current_admin = Depends(get_current_admin)):
+    """Refresh the shared quote snapshot now (joins a refresh already in progress)"""
+    try:
+        refreshed = await quote_snapshot.refresh(db)
+        if not refreshed:
+            await quote_snapshot.sync(db)
+        return {"refreshed": refreshed, **quote_snapshot.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/market-data/{symbol}")
 async def get_market_data(symbol: str, period: int = 100):
     """Get historical market data for a symbol"""
@@ -3432,26 +3562,32 @@ async def calculate_signal(ea: dict) -> dict:
     """Calculate trading signal for an EA"""
     config = ea.get("config", {})
     symbol = config.get("symbol")
+    timeframe = config.get("timeframe", "")
     indicator_config = config.get("indicator", {})
     
     if not symbol:
         return {"signal": "NEUTRAL", "price": 0.0}
     
-    # Get market data
-    history = market_simulator.get_price_history(symbol, 200)
+    # Get market data (shared float64 arrays, no per-EA list rebuilding)
     current = market_simulator.get_current_price(symbol)
+    history = market_simulator.get_price_arrays(symbol, 200)
     
     if not history or not current:
         return {"signal": "NEUTRAL", "price": 0.0}
     
-    closes = [candle["close"] for candle in history]
-    highs = [candle["high"] for candle in history]
-    lows = [candle["low"] for candle in history]
+    closes = history["close"]
+    highs = history["high"]
+    lows = history["low"]
     current_price = current["close"]
+    bar_time = market_simulator.get_last_bar_time(symbol)
     
     indicator_type = indicator_config.get("type", "RSI")
     parameters = indicator_config.get("parameters", {})
     
+    # Indicator values are shared across EAs watching the same symbol/params on this bar
+    def cached(name, params, compute):
+        return indicator_cache.get_or_compute(symbol, timeframe, name, params, bar_time, compute)
+    
     # Calculate indicator values
     indicator_values = {}
     
@@ -3459,26 +3595,32 @@ async def calculate_signal(ea: dict) -> dict:
         fast_period = parameters.get("fast_period", 10)
         slow_period = parameters.get("slow_period", 20)
         indicator_values = {
-            "fast_ma": TechnicalIndicators.calculate_sma(closes, fast_period),
-            "slow_ma": TechnicalIndicators.calculate_sma(closes, slow_period)
+            "fast_ma": cached("SMA", {"period": fast_period},
+                              lambda: TechnicalIndicators.calculate_sma(closes, fast_period)),
+            "slow_ma": cached("SMA", {"period": slow_period},
+                              lambda: TechnicalIndicators.calculate_sma(closes, slow_period))
         }
     elif indicator_type == "RSI":
         period = parameters.get("period", 14)
-        rsi_value = TechnicalIndicators.calculate_rsi(closes, period)
+        rsi_value = cached("RSI", {"period": period},
+                           lambda: TechnicalIndicators.calculate_rsi(closes, period))
         indicator_values = {"value": rsi_value}
     elif indicator_type == "MACD":
         fast = parameters.get("fast", 12)
         slow = parameters.get("slow", 26)
         signal = parameters.get("signal", 9)
-        indicator_values = TechnicalIndicators.calculate_macd(closes, fast, slow, signal)
+        indicator_values = cached("MACD", {"fast": fast, "slow": slow, "signal": signal},
+                                  lambda: TechnicalIndicators.calculate_macd(closes, fast, slow, signal))
     elif indicator_type == "BOLLINGER_BANDS":
         period = parameters.get("period", 20)
         std_dev = parameters.get("std_dev", 2.0)
-        indicator_values = TechnicalIndicators.calculate_bollinger_bands(closes, period, std_dev)
+        indicator_values = cached("BOLLINGER_BANDS", {"period": period, "std_dev": std_dev},
+                                  lambda: TechnicalIndicators.calculate_bollinger_bands(closes, period, std_dev))
     elif indicator_type == "STOCHASTIC":
         period = parameters.get("period", 14)
         k_smooth = parameters.get("k_smooth", 3)
-        indicator_values = TechnicalIndicators.calculate_stochastic(highs, lows, closes, period, k_smooth)
+        indicator_values = cached("STOCHASTIC", {"period": period, "k_smooth": k_smooth},
+                                  lambda: TechnicalIndicators.calculate_stochastic(highs, lows, closes, period, k_smooth))
     
     # Generate signal
     signal = SignalGenerator.generate_signal(
@@ -3508,22 +3650,20 @@ async def get_ea_signal(ea_id: str, current_user = Depends(get_current_user)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@api_router.get("/admin/indicator-cache")
+async def get_indicator_cache_stats(current_admin = Depends(get_current_admin)):
+    """Hit/miss counters of the shared indicator cache (this worker process)"""
+    return indicator_cache.stats()
+
 @api_router.get("/signals/{symbol}")
 async def get_signal(symbol: str, timeframe: str = '1H', indicator: str = 'RSI'):
     """Get trading signal for a symbol using real market data"""
-    # Determine category
-    category = 'forex'
-    if 'BTC' in symbol or 'ETH' in symbol or 'XRP' in symbol or 'LTC' in symbol or 'ADA' in symbol or 'DOT' in symbol:
-        category = 'crypto'
-    elif 'XAU' in symbol or 'XAG' in symbol or 'WTI' in symbol:
-        category = 'metal'
-    
-    # Get real market data first
-    real_data = await real_market_data.get_price(symbol, category)
+    # Live quote from the shared snapshot first
+    real_data = quote_snapshot.quote(symbol)
     
     if real_data:
-        # Get historical data for indicator calculation
-        history = await real_market_data.get_historical_data(symbol, category, timeframe)
+        # Recent history around the live price for indicator calculation
+        history = real_market_data.synthetic_history(real_data['price'])
         current_price = real_data['price']
     else:
         # Fallback to simulated data
@@ -3538,25 +3678,20 @@ async def get_signal(symbol: str, timeframe: str = '1H', indicator: str = 'RSI')
     indicator_value = 0
     
     if indicator == 'RSI' and len(closes) >= 14:
-        rsi_values = TechnicalIndicators.calculate_rsi(closes, period=14)
-        if rsi_values:
-            indicator_value = rsi_values[-1]
-            signal = SignalGenerator.rsi_signal(indicator_value)
+        indicator_value = TechnicalIndicators.calculate_rsi(closes, period=14)
+        signal = SignalGenerator.generate_signal("RSI", {"value": indicator_value}, {}, current_price, closes)
     elif indicator == 'MACD' and len(closes) >= 26:
-        macd_line, signal_line, histogram = TechnicalIndicators.calculate_macd(closes)
-        if macd_line and signal_line:
-            indicator_value = histogram[-1] if histogram else 0
-            signal = SignalGenerator.macd_signal(macd_line[-1], signal_line[-1])
+        macd = TechnicalIndicators.calculate_macd(closes)
+        indicator_value = macd["histogram"]
+        signal = SignalGenerator.generate_signal("MACD", macd, {}, current_price, closes)
     elif indicator == 'MA_CROSS' and len(closes) >= 50:
-        fast_ma = TechnicalIndicators.calculate_sma(closes, period=20)
-        slow_ma = TechnicalIndicators.calculate_sma(closes, period=50)
-        if fast_ma and slow_ma:
-            signal = SignalGenerator.ma_crossover_signal(fast_ma[-2:], slow_ma[-2:])
+        signal = SignalGenerator.generate_signal(
+            "MA_CROSSOVER", {}, {"fast_period": 20, "slow_period": 50}, current_price, closes
+        )
     elif indicator == 'BOLLINGER' and len(closes) >= 20:
-        upper, middle, lower = TechnicalIndicators.calculate_bollinger_bands(closes, period=20)
-        if upper and lower:
-            indicator_value = current_price
-            signal = SignalGenerator.bollinger_signal(current_price, upper[-1], middle[-1], lower[-1])
+        bands = TechnicalIndicators.calculate_bollinger_bands(closes, period=20)
+        indicator_value = current_price
+        signal = SignalGenerator.generate_signal("BOLLINGER_BANDS", bands, {}, current_price, closes)
     
     return {
         'symbol': symbol,
@@ -3566,6 +3701,7 @@ async def get_signal(symbol: str, timeframe: str = '1H', indicator: str = 'RSI')
         'current_price': round(current_price, 5),
         'timeframe': timeframe,
         'source': 'real' if real_data else 'simulated',
+        'stale': real_data['stale'] if real_data else None,
         'timestamp': datetime.utcnow().isoformat()
     }
 
@@ -3845,6 +3981,7 @@ async def get_payment_status(
                     }
                 }
             )
+            await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
             logger.info(f"✅ Payment completed for user {user_id} - Automatically approved and activated with full access")
         
         return PaymentStatusResponse(
@@ -3933,6 +4070,7 @@ async def stripe_webhook(request: Request):
                             }
                         }
                     )
+                    await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
                     logger.info(f"✅ Checkout completed - User {user_id} automatically approved and activated with full access")
                     logger.info(f"✅ Payment successful - User {user_id} has been auto-approved and granted immediate access")
         
@@ -3975,6 +4113,7 @@ async def stripe_webhook(request: Request):
                             }
                         }
                     )
+                    await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
                     logger.info(f"✅ Payment successful - User {user_id} automatically approved and activated with full access")
         
         return {"status": "success"}
@@ -4029,35 +4168,17 @@ async def admin_send_signal(signal: ManualSignal, current_admin = Depends(get_cu
             "status": "active"
         }
         
-        # Insert signal
-        result = await db.signals.insert_one(signal_doc)
-        signal_id = str(result.inserted_id)
-        
-        # If target_users specified, send to specific users only
+        # Stored once with its audience: specific users if target_users is set, otherwise all active paid users
         if signal.target_users:
-            for user_id in signal.target_users:
-                await db.user_signals.insert_one({
-                    "signal_id": signal_id,
-                    "user_id": user_id,
-                    "read": False,
-                    "created_at": datetime.utcnow()
-                })
-            recipient_count = len(signal.target_users)
+            audience = signal_inbox.audience_users(signal.target_users)
         else:
-            # Send to all active paid users
-            active_users = await db.users.find({
-                "status": "active",
-                "payment_status": "paid"
-            }).to_list(length=1000)
-            
-            for user in active_users:
-                await db.user_signals.insert_one({
-                    "signal_id": signal_id,
-                    "user_id": str(user["_id"]),
-                    "read": False,
-                    "created_at": datetime.utcnow()
-                })
-            recipient_count = len(active_users)
+            audience = signal_inbox.audience_all()
+        
+        signal_id = await signal_inbox.publish_audience_signal(db, signal_doc, audience)
+        recipient_count = await signal_inbox.count_audience(db, audience)
+        await signal_stream.publish(
+            db, signal_stream.EVENT_SIGNAL, audience, signal_stream.signal_event_data(signal_id, signal_doc)
+        )
         
         logger.info(f"✅ Admin signal sent: {signal.signal_type} {signal.symbol} to {recipient_count} users")
         
@@ -4089,14 +4210,11 @@ async def mentor_send_signal(signal: ManualSignal, current_mentor = Depends(get_
     try:
         mentor_id = current_mentor.get("mentor_id")
         
-        # Get mentor's users
-        mentor_users = await db.users.find({
-            "mentor_id": mentor_id,
-            "status": "active",
-            "payment_status": "paid"
-        }).to_list(length=1000)
+        # Count mentor's users
+        audience = signal_inbox.audience_mentor(mentor_id)
+        recipient_count = await signal_inbox.count_audience(db, audience)
         
-        if not mentor_users:
+        if not recipient_count:
             raise HTTPException(status_code=404, detail="No active users found under your mentor ID")
         
         # Calculate expiry time (in seconds)
@@ -4120,20 +4238,11 @@ async def mentor_send_signal(signal: ManualSignal, current_mentor = Depends(get_
             "status": "active"
         }
         
-        # Insert signal
-        result = await db.signals.insert_one(signal_doc)
-        signal_id = str(result.inserted_id)
-        
-        # Send to mentor's users
-        for user in mentor_users:
-            await db.user_signals.insert_one({
-                "signal_id": signal_id,
-                "user_id": str(user["_id"]),
-                "read": False,
-                "created_at": datetime.utcnow()
-            })
-        
-        recipient_count = len(mentor_users)
+        # Insert signal once for all of the mentor's users
+        signal_id = await signal_inbox.publish_audience_signal(db, signal_doc, audience)
+        await signal_stream.publish(
+            db, signal_stream.EVENT_SIGNAL, audience, signal_stream.signal_event_data(signal_id, signal_doc)
+        )
         
         logger.info(f"✅ Mentor {mentor_id} signal sent: {signal.signal_type} {signal.symbol} to {recipient_count} users")
         
@@ -4167,9 +4276,7 @@ async def send_manual_news_notification(news_doc: dict, user_ids: list):
             return
         
         # Get push tokens for the specified users
-        tokens = await db.push_tokens.find({
-            "user_id": {"$in": user_ids}
-        }).to_list(1000)
+        tokens = push_tokens.flatten(await push_token_cache.tokens_for_users(db, user_ids))
         
         if not tokens:
             logging.info("No push tokens found for the specified users")
@@ -4192,32 +4299,14 @@ async def send_manual_news_notification(news_doc: dict, user_ids: list):
         body = " | ".join(body_parts) if body_parts else "New market news event"
         
         # Send to Expo Push Notification service
-        messages = []
-        for token_doc in tokens:
-            messages.append({
-                "to": token_doc["token"],
-                "sound": "default",
-                "title": title,
-                "body": body,
-                "data": {
-                    "news_id": str(news_doc["_id"]),
-                    "title": news_doc["title"],
-                    "currency": news_doc.get("currency"),
-                    "signal": news_doc.get("signal"),
-                    "type": "manual_news"
-                },
-                "priority": "high",
-                "channelId": "default"
-            })
-        
-        # Send notifications in batches
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://exp.host/--/api/v2/push/send',
-                json=messages,
-                timeout=10.0
-            )
-            logging.info(f"Manual news notification sent to {len(messages)} users: {response.status_code}")
+        messages = messages_for_tokens(tokens, title, body, {
+            "news_id": str(news_doc["_id"]),
+            "title": news_doc["title"],
+            "currency": news_doc.get("currency"),
+            "signal": news_doc.get("signal"),
+            "type": "manual_news"
+        })
+        await send_push_notifications_batch(messages)
     except Exception as e:
         logging.error(f"Error sending manual news notification: {e}")
 
@@ -4270,6 +4359,11 @@ async def admin_send_manual_news(news: ManualNewsEvent, current_admin = Depends(
         result = await db.manual_news.insert_one(news_doc)
         news_id = str(result.inserted_id)
         news_doc["_id"] = result.inserted_id
+        await news_feed.on_news_created(db, None)
+        
+        await signal_stream.publish(
+            db, signal_stream.EVENT_NEWS, signal_inbox.audience_all(), signal_stream.news_event_data(news_id, news_doc)
+        )
         
         # Send push notifications to all users and admins
         recipient_ids = [str(recipient["_id"]) for recipient in all_recipients]
@@ -4348,6 +4442,12 @@ async def mentor_send_manual_news(news: ManualNewsEvent, current_mentor = Depend
         result = await db.manual_news.insert_one(news_doc)
         news_id = str(result.inserted_id)
         news_doc["_id"] = result.inserted_id
+        await news_feed.on_news_created(db, mentor_id)
+        
+        await signal_stream.publish(
+            db, signal_stream.EVENT_NEWS, signal_inbox.audience_mentor(mentor_id),
+            signal_stream.news_event_data(news_id, news_doc)
+        )
         
         # Send push notifications to mentor's users and admins
         recipient_ids = [str(recipient["_id"]) for recipient in all_recipients]
@@ -4505,15 +4605,11 @@ async def update_indicator_signal(signal_update: IndicatorSignalUpdate, current_
             }
         )
         
-        # Get all users under this mentor
-        mentor_users = await db.users.find({
-            "mentor_id": mentor_id,
-            "status": "active",
-            "payment_status": "paid"
-        }).to_list(length=10000)
+        # Number of users under this mentor (tokens are resolved separately, in one query)
+        mentor_user_count = await signal_inbox.count_audience(db, signal_inbox.audience_mentor(mentor_id))
         
         # Create signal records for each user (only for BUY/SELL, not NONE)
-        if mentor_users and new_signal != "NONE":
+        if mentor_user_count and new_signal != "NONE":
             # Create a signal document
             expiry_time = datetime.utcnow() + timedelta(hours=24)  # 24 hour expiry for indicator signals
             
@@ -4533,56 +4629,36 @@ async def update_indicator_signal(signal_update: IndicatorSignalUpdate, current_
                 "status": "active"
             }
             
-            # Insert signal
-            result = await db.signals.insert_one(signal_doc)
-            signal_id = str(result.inserted_id)
-            
-            # Create user_signals reference for each user
-            for user in mentor_users:
-                await db.user_signals.insert_one({
-                    "signal_id": signal_id,
-                    "user_id": str(user["_id"]),
-                    "read": False,
-                    "created_at": datetime.utcnow()
-                })
+            # Insert signal once for all of the mentor's users
+            signal_id = await signal_inbox.publish_audience_signal(
+                db, signal_doc, signal_inbox.audience_mentor(mentor_id)
+            )
             
-            logger.info(f"✅ Created signal {signal_id} for {len(mentor_users)} users from indicator {indicator['name']}")
+            logger.info(f"✅ Created signal {signal_id} for {mentor_user_count} users from indicator {indicator['name']}")
+        
+        # Stream the indicator signal change (including NONE) to the mentor's connected users
+        await signal_stream.publish(db, signal_stream.EVENT_INDICATOR_SIGNAL, signal_inbox.audience_mentor(mentor_id), {
+            "indicator_id": indicator_id,
+            "indicator_name": indicator["name"],
+            "signal": new_signal,
+            "signal_id": signal_id if mentor_user_count and new_signal != "NONE" else None
+        })
         
         # Send push notifications to all mentor's users
-        if mentor_users and new_signal != "NONE":
-            tokens = await db.push_tokens.find({
-                "user_id": {"$in": [str(user["_id"]) for user in mentor_users]}
-            }).to_list(1000)
+        if mentor_user_count and new_signal != "NONE":
+            tokens = await push_tokens.mentor_audience_tokens(db, mentor_id)
             
             if tokens:
                 title = f"📊 {indicator['name']}"
                 body = f"Signal: {new_signal}"
                 
-                messages = []
-                for token_doc in tokens:
-                    messages.append({
-                        "to": token_doc["token"],
-                        "sound": "default",
-                        "title": title,
-                        "body": body,
-                        "data": {
-                            "indicator_id": indicator_id,
-                            "indicator_name": indicator["name"],
-                            "signal": new_signal,
-                            "type": "indicator_signal"
-                        },
-                        "priority": "high",
-                        "channelId": "default"
-                    })
-                
-                # Send notifications
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        'https://exp.host/--/api/v2/push/send',
-                        json=messages,
-                        timeout=10.0
-                    )
-                    logger.info(f"Indicator signal notification sent to {len(messages)} users: {response.status_code}")
+                messages = messages_for_tokens(tokens, title, body, {
+                    "indicator_id": indicator_id,
+                    "indicator_name": indicator["name"],
+                    "signal": new_signal,
+                    "type": "indicator_signal"
+                })
+                await send_push_notifications_batch(messages)
         
         logger.info(f"✅ Mentor {mentor_id} updated indicator '{indicator['name']}' signal to {new_signal}")
         
@@ -4591,7 +4667,7 @@ async def update_indicator_signal(signal_update: IndicatorSignalUpdate, current_
             "indicator_id": indicator_id,
             "indicator_name": indicator["name"],
             "signal": new_signal,
-            "users_notified": len(mentor_users) if new_signal != "NONE" else 0
+            "users_notified": mentor_user_count if new_signal != "NONE" else 0
         }
         
     except HTTPException:
@@ -4630,7 +4706,7 @@ async def manual_override_signal(override: ManualOverrideSignal, current_mentor
         subscriptions = await db.user_indicator_subscriptions.find({
             "indicator_id": indicator_id,
             "status": "active"
-        }).to_list(length=1000)
+        }, {"user_id": 1, "user_selected_symbol": 1, "user_selected_timeframe": 1}).to_list(length=None)
         
         if not subscriptions:
             return {
@@ -4638,86 +4714,76 @@ async def manual_override_signal(override: ManualOverrideSignal, current_mentor
                 "users_notified": 0
             }
         
-        # Create signals for each subscription
-        signals_created = 0
-        user_ids = []
+        # Create one signal per subscription, then the user_signals references, in bulk
+        now = datetime.utcnow()
+        expiry_time = now + timedelta(hours=24)
+        signal_docs = [{
+            "symbol": sub["user_selected_symbol"],
+            "signal_type": signal,
+            "indicator": indicator["name"],
+            "candle_pattern": None,
+            "timeframe": sub["user_selected_timeframe"],
+            "notes": f"Manual override by mentor",
+            "sender_type": "mentor_manual_override",
+            "sender_id": mentor_id,
+            "indicator_id": indicator_id,
+            "subscription_id": str(sub["_id"]),
+            "created_at": now,
+            "expires_at": expiry_time,
+            "duration_seconds": 86400,
+            "status": "active"
+        } for sub in subscriptions]
         
-        for sub in subscriptions:
-            # Create signal document
-            expiry_time = datetime.utcnow() + timedelta(hours=24)
-            
-            signal_doc = {
-                "symbol": sub["user_selected_symbol"],
-                "signal_type": signal,
-                "indicator": indicator["name"],
-                "candle_pattern": None,
-                "timeframe": sub["user_selected_timeframe"],
-                "notes": f"Manual override by mentor",
-                "sender_type": "mentor_manual_override",
-                "sender_id": mentor_id,
-                "indicator_id": indicator_id,
-                "subscription_id": str(sub["_id"]),
-                "created_at": datetime.utcnow(),
-                "expires_at": expiry_time,
-                "duration_seconds": 86400,
-                "status": "active"
-            }
-            
-            result = await db.signals.insert_one(signal_doc)
-            signal_id = str(result.inserted_id)
-            
-            # Create user_signals reference
-            await db.user_signals.insert_one({
-                "signal_id": signal_id,
-                "user_id": sub["user_id"],
-                "read": False,
-                "created_at": datetime.utcnow()
-            })
-            
-            # Update subscription stats
-            await db.user_indicator_subscriptions.update_one(
-                {"_id": sub["_id"]},
-                {
-                    "$set": {
-                        "last_signal_time": datetime.utcnow(),
-                        "last_signal_type": signal
-                    },
-                    "$inc": {"total_signals_received": 1}
-                }
+        signals_result = await insert_many_chunked(db.signals, signal_docs)
+        created = [
+            (sub, signal_oid) for sub, signal_oid in zip(subscriptions, signals_result["inserted_ids"])
+            if signal_oid is not None
+        ]
+        
+        user_signals_result = await insert_many_chunked(db.user_signals, [{
+            "signal_id": str(signal_oid),
+            "user_id": sub["user_id"],
+            "read": False,
+            "created_at": now
+        } for sub, signal_oid in created])
+        user_signals_result.pop("inserted_ids")
+        log_fanout(f"manual override '{indicator['name']}'", user_signals_result)
+        await signal_inbox.increment_unread(db, [sub["user_id"] for sub, _ in created])
+        if created:
+            await signal_stream.publish(
+                db, signal_stream.EVENT_SIGNAL,
+                signal_inbox.audience_users([sub["user_id"] for sub, _ in created]),
+                {"indicator_id": indicator_id, "indicator": indicator["name"], "signal_type": signal,
+                 "sender_type": "mentor_manual_override"}
             )
-            
-            signals_created += 1
-            user_ids.append(sub["user_id"])
+        
+        # Update subscription stats (same update for every subscription)
+        await update_many_chunked(db.user_indicator_subscriptions, [sub["_id"] for sub, _ in created], {
+            "$set": {
+                "last_signal_time": now,
+                "last_signal_type": signal
+            },
+            "$inc": {"total_signals_received": 1}
+        })
+        
+        signals_created = len(created)
+        user_ids = [sub["user_id"] for sub, _ in created]
         
         # Send push notifications
         if user_ids:
-            tokens = await db.push_tokens.find({
-                "user_id": {"$in": user_ids}
-            }).to_list(1000)
+            tokens = push_tokens.flatten(await push_token_cache.tokens_for_users(db, user_ids))
             
             if tokens:
                 title = f"📊 {indicator['name']} - Manual Signal"
                 body = f"Mentor Override: {signal}"
                 
-                messages = []
-                for token_doc in tokens:
-                    messages.append({
-                        "to": token_doc["token"],
-                        "sound": "default",
-                        "title": title,
-                        "body": body,
-                        "data": {
-                            "indicator_id": indicator_id,
-                            "indicator_name": indicator["name"],
-                            "signal": signal,
-                            "type": "manual_override"
-                        }
-                    })
-                
-                # Send notifications in batches
-                for i in range(0, len(messages), 100):
-                    batch = messages[i:i+100]
-                    await send_push_notifications_batch(batch)
+                messages = messages_for_tokens(tokens, title, body, {
+                    "indicator_id": indicator_id,
+                    "indicator_name": indicator["name"],
+                    "signal": signal,
+                    "type": "manual_override"
+                }, priority=None, channel_id=None)
+                await send_push_notifications_batch(messages)
         
         logger.info(f"✅ Mentor {mentor_id} sent manual override {signal} for '{indicator['name']}' to {signals_created} users")
         
@@ -4819,12 +4885,12 @@ async def delete_indicator(indicator_id: str, current_mentor = Depends(get_curre
             {"_id": ObjectId(indicator_id)},
             {"$set": {"status": "deleted", "updated_at": datetime.utcnow()}}
         )
-        
         # Remove this indicator from users who selected it
         await db.users.update_many(
             {"selected_indicator_id": indicator_id},
             {"$unset": {"selected_indicator_id": ""}}
         )
+        await principal_cache.clear_everywhere(db, KIND_USER)
         
         logger.info(f"✅ Mentor {mentor_id} deleted indicator: '{indicator['name']}'")
         
@@ -4948,6 +5014,7 @@ async def user_select_indicator(selection: UserIndicatorSelection, current_user
             {"_id": ObjectId(user_id)},
             {"$set": {"selected_indicator_id": indicator_id}}
         )
+        await principal_cache.invalidate_everywhere(db, KIND_USER, [user_id])
         
         logger.info(f"✅ User {user_id} selected indicator: '{indicator['name']}' (ID: {indicator_id})")
         
@@ -5016,6 +5083,8 @@ async def subscribe_to_indicator(subscription: IndicatorSubscriptionCreate, curr
             "last_signal_type": "NONE",
             "total_signals_received": 0
         }
+        # Sharded and due for its first check right away, so the worker never has to backfill it
+        subscription_doc.update(schedule_fields(subscription_doc))
         
         result = await db.user_indicator_subscriptions.insert_one(subscription_doc)
         subscription_id = str(result.inserted_id)
@@ -5120,33 +5189,60 @@ async def unsubscribe_from_indicator(subscription_id: str, current_user = Depend
 
 
 @api_router.get("/user/signals")
-async def get_user_signals(current_user = Depends(get_current_user)):
+async def get_user_signals(limit: int = 50, before: Optional[str] = None, after: Optional[str] = None,
+                           since: Optional[datetime] = None, current_user = Depends(get_current_user)):
     """
-    Get all signals for the current user (unread and recent)
+    Get the signals of the current user, newest first, with keyset pagination
+    - before: cursor (next_cursor of a previous page) to page back to older signals
+    - after: cursor (latest_cursor of a previous response) to fetch only newer signals
+    - since: datetime, fetch only signals received after it (polling deltas)
+    unread_count covers the whole inbox, not just the returned page.
     """
     try:
-        user_id = str(current_user["_id"])
+        if sum(param is not None for param in (before, after, since)) > 1:
+            raise HTTPException(status_code=400, detail="Use only one of before, after and since")
+        limit = max(1, min(limit, 100))
         
-        # Get user's signal references
-        user_signal_refs = await db.user_signals.find({
-            "user_id": user_id
-        }).sort("created_at", -1).limit(50).to_list(length=50)
+        try:
+            before_cursor = signal_inbox.decode_cursor(before) if before else None
+            after_cursor = signal_inbox.decode_cursor(after) if after else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if since is not None:
+            # Stored times are naive UTC: convert offset-aware values before dropping the tzinfo
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            after_cursor = (since, None)
+        
+        # Personal signal refs merged with audience (broadcast) signals, one extra entry to detect more pages
+        entries = await signal_inbox.fetch_inbox(
+            db, current_user, limit=limit + 1, before=before_cursor, after=after_cursor
+        )
+        has_more = len(entries) > limit
+        if has_more:
+            # Keep the entries closest to the cursor
+            entries = entries[1:] if after_cursor else entries[:limit]
         
         signals = []
-        for ref in user_signal_refs:
-            signal = await db.signals.find_one({"_id": ObjectId(ref["signal_id"])})
-            if signal:
-                signals.append({
-                    **serialize_doc(signal),
-                    "read": ref.get("read", False),
-                    "received_at": ref.get("created_at")
-                })
+        for entry in entries:
+            signal = serialize_doc(entry["signal"])
+            signal.pop("audience", None)
+            signals.append({
+                **signal,
+                "read": entry["read"],
+                "received_at": entry["received_at"]
+            })
         
         return {
             "signals": signals,
-            "unread_count": sum(1 for s in signals if not s.get("read"))
+            "unread_count": await signal_inbox.unread_count(db, current_user),
+            "has_more": has_more,
+            "next_cursor": signal_inbox.encode_cursor(entries[-1]) if entries and not after_cursor else None,
+            "latest_cursor": signal_inbox.encode_cursor(entries[0]) if entries else after
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user signals: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch signals: {str(e)}")
@@ -5158,23 +5254,13 @@ async def get_latest_signal(current_user = Depends(get_current_user)):
     Get the most recent ACTIVE (non-expired) signal for floating button display
     """
     try:
-        user_id = str(current_user["_id"])
-        
-        # Get latest signal reference
-        latest_ref = await db.user_signals.find_one(
-            {"user_id": user_id},
-            sort=[("created_at", -1)]
-        )
-        
-        if not latest_ref:
-            return {"signal": None}
-        
-        signal = await db.signals.find_one({"_id": ObjectId(latest_ref["signal_id"])})
+        # Latest personal or audience signal
+        signal = await signal_inbox.latest_inbox_signal(db, current_user)
         if signal:
             # Check if signal has expired
             if signal.get("expires_at"):
                 if signal["expires_at"] < datetime.utcnow():
-                    logger.info(f"Signal {latest_ref['signal_id']} expired, not displaying")
+                    logger.info(f"Signal {signal['_id']} expired, not displaying")
                     return {"signal": None}
             
             return {
@@ -5451,6 +5537,10 @@ async def create_news(news: MarketNews, current_admin = Depends(get_current_admi
         }
         
         result = await db.market_news.insert_one(news_doc)
+        await signal_stream.publish(
+            db, signal_stream.EVENT_NEWS, signal_inbox.audience_all(),
+            signal_stream.news_event_data(str(result.inserted_id), news_doc)
+        )
         
         return {
             "message": "News created successfully",
@@ -5482,6 +5572,10 @@ async def create_mentor_news(news: MarketNews, current_mentor = Depends(get_curr
         }
         
         result = await db.market_news.insert_one(news_doc)
+        await signal_stream.publish(
+            db, signal_stream.EVENT_NEWS, signal_inbox.audience_mentor(mentor_id),
+            signal_stream.news_event_data(str(result.inserted_id), news_doc)
+        )
         
         return {
             "message": "News created successfully",
@@ -5531,14 +5625,8 @@ async def get_admin_news(current_admin = Depends(get_current_admin)):
             
             formatted_news.append(news_item)
         
-        # Get live economic calendar (ForexFactory + FMP API fallback)
-        try:
-            live_events = await fetch_live_economic_calendar()
-            if live_events:
-                logger.info(f"✅ Adding {len(live_events)} live events to admin news")
-                formatted_news.extend(live_events)
-        except Exception as e:
-            logger.warning(f"Failed to fetch live calendar for admin: {str(e)}")
+        # Live economic calendar from the shared snapshot (refreshed in the background)
+        formatted_news.extend(calendar_snapshot.events())
         
         # Sort by created_at/event_time (most recent first)
         formatted_news.sort(key=lambda x: x.get("created_at", x.get("event_datetime", "")), reverse=True)
@@ -5561,8 +5649,8 @@ async def get_mentor_upcoming_news(current_mentor = Depends(get_current_mentor))
     try:
         from datetime import datetime, timedelta
         
-        # Fetch live economic calendar (already filtered for next 7 days, future only)
-        live_events = await fetch_live_economic_calendar()
+        # Live economic calendar from the shared snapshot
+        live_events = calendar_snapshot.events()
         
         # Get all news (admin + mentor's own news)
         mentor_id = current_mentor.get("mentor_id")
@@ -5712,6 +5800,12 @@ async def update_news_signal(
                 upsert=True
             )
         
+        await news_feed.on_signal_changed(db, mentor_id, news_id, signal)
+        await signal_stream.publish(db, signal_stream.EVENT_NEWS, signal_inbox.audience_mentor(mentor_id), {
+            "id": news_id,
+            "signal": signal
+        })
+        
         return {"message": "Signal updated successfully", "signal": signal}
         
     except HTTPException:
@@ -5728,75 +5822,9 @@ async def get_user_news(current_user = Depends(get_current_user)):
     ONLY SHOWS UPCOMING NEWS (not past events)
     """
     try:
-        from datetime import datetime
-        user_mentor_id = current_user.get("mentor_id")
-        now = datetime.utcnow()
-        
-        # Get manual news from admin and mentor
-        query = {
-            "$or": [
-                {"sender_type": "admin"},
-                {"sender_type": "mentor", "mentor_id": user_mentor_id}
-            ],
-            "status": "active"
-        }
-        
-        news_cursor = db.manual_news.find(query).sort("created_at", -1).limit(20)
-        manual_news_list = await news_cursor.to_list(length=20)
-        
-        # Fetch live economic calendar
-        live_news = await fetch_live_economic_calendar()
-        
-        # Get mentor's signals on live events
-        mentor_signals = {}
-        if user_mentor_id:
-            signals_cursor = db.news_signals.find({"mentor_id": user_mentor_id})
-            signals_list = await signals_cursor.to_list(length=100)
-            for sig in signals_list:
-                mentor_signals[sig["event_id"]] = sig.get("signal")
-        
-        # Combine manual news with live calendar
-        formatted_news = []
-        
-        # Add ALL manual news (from mentor/admin) - no date filtering
-        for item in manual_news_list:
-            # Check if event has a datetime - include all events now (no filtering)
-            event_datetime_str = item.get("event_time")
-            
-            news_item = {
-                "id": str(item["_id"]),
-                "title": item["title"],
-                "created_at": item["created_at"].isoformat(),
-                "source": "manual"
-            }
-            
-            # Only add optional fields if they exist
-            if item.get("event_time"):
-                news_item["event_time"] = item["event_time"]
-                news_item["event_datetime"] = item["event_time"]
-            if item.get("currency"):
-                news_item["currency"] = item["currency"]
-            if item.get("impact"):
-                news_item["impact"] = item["impact"]
-            if item.get("signal"):
-                news_item["signal"] = item["signal"]
-            if item.get("description"):
-                news_item["description"] = item["description"]
-            
-            formatted_news.append(news_item)
-        
-        # Add live economic calendar events with mentor signals - show ALL (past and upcoming)
-        for event in live_news:
-            event_id = event.get("id")
-            if event_id in mentor_signals:
-                event["signal"] = mentor_signals[event_id]
-            formatted_news.append(event)
-        
-        # Sort by event datetime (most recent first)
-        formatted_news.sort(key=lambda x: x.get('event_datetime', x.get('created_at', '')), reverse=True)
-        
-        logger.info(f"Returning {len(formatted_news[:50])} news items (manual + live API)")
-        return {"news": formatted_news[:50]}
+        # Materialized feed of the user's mentor (manual news + live calendar + mentor signals)
+        formatted_news = await news_feed.read_feed(db, current_user.get("mentor_id"))
+        return {"news": formatted_news}
         
     except Exception as e:
         logger.error(f"Error fetching news: {str(e)}")
@@ -5815,8 +5843,8 @@ async def get_upcoming_news_alerts(current_user = Depends(get_current_user)):
         now = datetime.utcnow()
         alert_window = now + timedelta(minutes=10)
         
-        # Get live economic calendar
-        live_news = await fetch_live_economic_calendar()
+        # Live economic calendar from the shared snapshot
+        live_news = calendar_snapshot.events()
         
         # Get mentor's signals on live events
         mentor_signals = {}
@@ -5850,169 +5878,35 @@ async def get_upcoming_news_alerts(current_user = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Failed to fetch news: {str(e)}")
 
 
-async def fetch_live_economic_calendar():
+@api_router.get("/news/calendar")
+async def get_economic_calendar(
+    if_none_match: Optional[str] = Header(None),
+    current_user = Depends(get_current_user)
+):
     """
-    Fetch live financial/market news using multiple free APIs with fallback
-    Priority: ForexFactory JSON -> FMP API -> Mock Data
-    Returns relevant trading news and market events for the next 7 days
+    Live economic calendar snapshot, served from memory.
+    Supports conditional requests: send the last ETag as If-None-Match to get 304 while unchanged.
     """
-    try:
-        import httpx
-        from datetime import datetime, timedelta
-        
-        now = datetime.utcnow()
-        max_future_date = now + timedelta(days=7)  # Maximum 1 week forecast
-        
-        # Try Source 1: Forex Factory Economic Calendar (Free, No Auth Required)
-        try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.get(
-                    "https://nfs.faireconomy.media/ff_calendar_thisweek.json",
-                    headers={"User-Agent": "Mozilla/5.0"}
-                )
-                
-                if response.status_code == 200:
-                    ff_data = response.json()
-                    formatted_events = []
-                    
-                    for item in ff_data[:30]:  # Limit to 30 items
-                        try:
-                            # ForexFactory specific parsing
-                            event_date = item.get("date", "")
-                            impact = item.get("impact", "Medium")
-                            
-                            # Skip low impact events
-                            if impact == "Low":
-                                continue
-                            
-                            formatted_events.append({
-                                "id": f"ff_{item.get('title', '').replace(' ', '_')}_{event_date}",
-                                "title": item.get("title", "Economic Event")[:100],
-                                "event_time": event_date,
-                                "event_datetime": event_date,
-                                "currency": item.get("country", "USD")[:10],
-                                "impact": impact,
-                                "signal": None,
-                                "created_at": datetime.utcnow().isoformat(),
-                                "source": "forex_factory",
-                                "description": f"Forecast: {item.get('forecast', 'N/A')}, Previous: {item.get('previous', 'N/A')}"
-                            })
-                        except Exception as e:
-                            logger.error(f"Error parsing ForexFactory item: {str(e)}")
-                            continue
-                    
-                    if formatted_events:
-                        logger.info(f"✅ Fetched {len(formatted_events)} events from ForexFactory")
-                        return formatted_events
-        except Exception as ff_error:
-            logger.warning(f"ForexFactory API failed: {str(ff_error)}")
-        
-        # Try Source 2: FMP API (fallback)
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    "https://financialmodelingprep.com/api/v3/stock_news",
-                    params={"limit": 50, "apikey": "demo"}
-                )
-                
-                if response.status_code == 200:
-                    news_items = response.json()
-                    formatted_events = []
-                    
-                    for item in news_items[:30]:  # Limit to 30 items
-                        try:
-                            # Parse published date
-                            published_at = datetime.strptime(item.get("publishedDate", ""), "%Y-%m-%d %H:%M:%S")
-                            
-                            # Only include recent news (last 24 hours to next 7 days)
-                            time_diff = (published_at - now).total_seconds() / 3600  # hours
-                            if time_diff < -24 or time_diff > 168:  # -24h to +7 days
-                                continue
-                            
-                            # Determine impact based on presence in title/description
-                            title = item.get("title", "").lower()
-                            impact = "Medium"
-                            if any(word in title for word in ["breaking", "fed", "inflation", "gdp", "rate", "employment", "earnings", "crash", "surge"]):
-                                impact = "High"
-                            elif any(word in title for word in ["update", "comment", "opinion", "analysis"]):
-                                impact = "Low"
-                            
-                            # Extract symbol if available
-                            currency = item.get("symbol", "MARKET")
-                            if not currency or len(currency) > 10:
-                                currency = "GENERAL"
-                            
-                            formatted_events.append({
-                                "id": f"fmp_{item.get('url', '').split('/')[-1]}",
-                                "title": item.get("title", "Market News")[:100],
-                                "event_time": published_at.strftime("%H:%M UTC"),
-                                "event_datetime": published_at.isoformat(),
-                                "currency": currency[:10],
-                                "impact": impact,
-                                "signal": None,
-                                "created_at": datetime.utcnow().isoformat(),
-                                "source": "fmp_news",
-                                "description": item.get("text", "")[:200],
-                                "url": item.get("url", ""),
-                                "site": item.get("site", "")
-                            })
-                                
-                        except Exception as e:
-                            logger.error(f"Error parsing FMP news item: {str(e)}")
-                            continue
-                    
-                    if formatted_events:
-                        logger.info(f"✅ Fetched {len(formatted_events)} market news events from FMP")
-                        return formatted_events
-                else:
-                    logger.warning(f"FMP API returned {response.status_code}")
-        except Exception as api_error:
-            logger.warning(f"FMP API failed: {str(api_error)}")
-        
-        # Fallback: Generate mock news events if API fails
-        logger.info("Using mock news data as FMP API is unavailable")
-        mock_events = []
-        
-        # Generate 10 mock news events for the next 7 days
-        for i in range(10):
-            event_time = now + timedelta(hours=i*6 + 2)  # Events every 6 hours
-            
-            mock_titles = [
-                "Fed Interest Rate Decision Expected Today",
-                "US Dollar Strengthens Against Major Currencies",
-                "European Central Bank Policy Meeting",
-                "Oil Prices Surge on Supply Concerns",
-                "Tech Stocks Rally on Strong Earnings",
-                "Gold Reaches New High Amid Market Uncertainty",
-                "US Employment Report Shows Job Growth",
-                "Bitcoin Trading Volume Increases Significantly",
-                "EUR/USD Hits Key Support Level",
-                "Asian Markets Open Higher on Economic Data"
-            ]
-            
-            currencies = ["USD", "EUR", "GBP", "JPY", "AUD", "NZD", "CAD", "CHF", "GOLD", "OIL"]
-            impacts = ["High", "High", "Medium", "High", "Medium", "High", "High", "Medium", "Medium", "Medium"]
-            
-            mock_events.append({
-                "id": f"mock_news_{i}_{int(event_time.timestamp())}",
-                "title": mock_titles[i],
-                "event_time": event_time.strftime("%H:%M UTC"),
-                "event_datetime": event_time.isoformat(),
-                "currency": currencies[i],
-                "impact": impacts[i],
-                "signal": None,
-                "created_at": datetime.utcnow().isoformat(),
-                "source": "mock_calendar",
-                "description": f"Mock trading event for {currencies[i]} - {mock_titles[i]}",
-                "url": ""
-            })
-        
-        logger.info(f"Generated {len(mock_events)} mock news events")
-        return mock_events
-        
-    except Exception as e:
-        logger.error(f"Error in fetch_live_economic_calendar: {str(e)}")
-        return []
+    headers = {"Cache-Control": "private, max-age=60"}
+    if calendar_snapshot.etag:
+        headers["ETag"] = calendar_snapshot.etag
+        if if_none_match and calendar_snapshot.etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+    stats = calendar_snapshot.stats()
+    return JSONResponse({
+        "events": calendar_snapshot.events(),
+        "source": stats["source"],
+        "fetched_at": stats["fetched_at"],
+        "refreshed_at": stats["refreshed_at"],
+        "stale": stats["stale"]
+    }, headers=headers)
+
+
+@api_router.get("/admin/economic-calendar")
+async def get_economic_calendar_stats(current_admin = Depends(get_current_admin)):
+    """Economic calendar snapshot state of this worker (age, source, last refresh error)"""
+    return calendar_snapshot.stats()
 
 
 @api_router.get("/user/brokers")
@@ -6081,14 +5975,7 @@ async def mark_signal_read(signal_id: str, current_user = Depends(get_current_us
     Mark a signal as read
     """
     try:
-        user_id = str(current_user["_id"])
-        
-        result = await db.user_signals.update_one(
-            {"signal_id": signal_id, "user_id": user_id},
-            {"$set": {"read": True, "read_at": datetime.utcnow()}}
-        )
-        
-        if result.modified_count > 0:
+        if await signal_inbox.mark_read(db, current_user, signal_id):
             return {"message": "Signal marked as read"}
         else:
             raise HTTPException(status_code=404, detail="Signal not found")
@@ -6100,6 +5987,61 @@ async def mark_signal_read(signal_id: str, current_user = Depends(get_current_us
         raise HTTPException(status_code=500, detail=f"Failed to mark signal as read: {str(e)}")
 
 
+@api_router.get("/user/stream")
+async def stream_user_events(request: Request, token: Optional[str] = None,
+                             authorization: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of new signals, indicator signal changes and news alerts for the current user.
+    Browsers' EventSource cannot set headers, so the JWT may also be passed as ?token=.
+    On a "resync" event the client should refetch /user/signals?after=<latest_cursor>.
+    """
+    raw_token = token or (authorization or "").replace("Bearer ", "")
+    if not raw_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    current_user = await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=raw_token))
+    
+    subscriber = signal_stream.stream_hub.connect(current_user)
+    return StreamingResponse(
+        signal_stream.sse_events(request, signal_stream.stream_hub, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api_router.get("/admin/push-queue")
+async def get_push_queue_stats(current_admin = Depends(get_current_admin)):
+    """Push queue backlog, dead letters, this worker's throughput/latency metrics and token cache stats"""
+    try:
+        stats = await push_queue.queue_stats(db)
+        stats["token_cache"] = push_token_cache.stats()
+        return stats
+    except Exception as e:
+        logger.error(f"Error fetching push queue stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch push queue stats: {str(e)}")
+
+
+@api_router.get("/admin/background-jobs")
+async def get_background_jobs(current_admin = Depends(get_current_admin)):
+    """Which process currently leads each background job"""
+    try:
+        return {"process": leader_election.PROCESS_ID, "leases": await leader_election.list_leases(db)}
+    except Exception as e:
+        logger.error(f"Error fetching background job leases: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch background jobs: {str(e)}")
+
+
+@api_router.get("/admin/auth-cache")
+async def get_auth_cache_stats(current_admin = Depends(get_current_admin)):
+    """Principal cache of this worker (hit rate, invalidations)"""
+    return principal_cache.principal_cache.stats()
+
+
+@api_router.get("/admin/stream-stats")
+async def get_stream_stats(current_admin = Depends(get_current_admin)):
+    """Connections and delivery counters of this worker's signal stream hub"""
+    return signal_stream.stream_hub.stats()
+
+
 async def root():
     return {"message": "EA Trading API is running"}
 
@@ -6123,6 +6065,8 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await push_service.close()
+    shutdown_hash_executor()
     client.close()
 
 # ============================================================================
@@ -6691,18 +6635,77 @@ async def trigger_forex_scrape(current_admin = Depends(get_current_admin)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Start the scheduler on app startup
 @app.on_event("startup")
-async def start_forex_scheduler():
-    """Start the forex news scheduler on app startup"""
-    asyncio.create_task(forex_news_scheduler())
-    logger.info("Forex Factory news scheduler started - will run every hour")
+async def create_inbox_indexes():
+    """Indexes for the hybrid signal inbox (personal refs, audience signals, read deltas)"""
+    try:
+        await signal_inbox.ensure_inbox_indexes(db)
+    except Exception as e:
+        logger.error(f"Error creating signal inbox indexes: {e}")
 
 @app.on_event("startup")
-async def start_signal_monitor():
-    """Start the background signal monitor for push notifications"""
-    asyncio.create_task(signal_monitor_loop())
-    logger.info("🔄 Signal monitor started - checking for signal changes")
+async def start_stream_relay():
+    """Relay stream events published by any worker (or the signal worker) to this worker's SSE clients"""
+    if signal_stream.SIGNAL_STREAM_RELAY == "local":
+        return
+    try:
+        await signal_stream.ensure_stream_collection(db)
+        asyncio.create_task(signal_stream.run_relay(db))
+        logger.info("📡 Signal stream relay started")
+    except Exception as e:
+        logger.error(f"Error starting signal stream relay: {e}")
+
+@app.on_event("startup")
+async def listen_for_principal_changes():
+    """Drop cached principals when another worker changes a user's, admin's or mentor's access"""
+    principal_cache.listen_for_invalidations()
+
+@app.on_event("startup")
+async def start_push_queue():
+    """Background consumers draining the durable push queue"""
+    try:
+        await push_tokens.ensure_token_indexes(db)
+        push_tokens.listen_for_invalidations()
+        push_service.on_device_not_registered = lambda tokens: push_tokens.prune_tokens(db, tokens)
+        await push_queue.start_consumers(db)
+    except Exception as e:
+        logger.error(f"Error starting push queue: {e}")
+
+# Whichever process refreshes the calendar rebuilds the news feeds built from an older version
+calendar_snapshot.on_refresh = lambda: news_feed.on_calendar_refreshed(db)
+
+@app.on_event("startup")
+async def start_calendar_sync():
+    """Serve the economic calendar from memory; follow the snapshot stored by the refresher job"""
+    asyncio.create_task(economic_calendar.run_sync(db))
+
+@app.on_event("startup")
+async def start_quote_sync():
+    """Serve market quotes from memory; follow the snapshot stored by the quote refresher job"""
+    asyncio.create_task(market_quotes.run_sync(db))
+
+def background_jobs():
+    """Background loops that must run in exactly one process (see leader_election)"""
+    return {
+        "forex_news_scheduler": forex_news_scheduler,
+        "signal_monitor": signal_monitor_loop,
+        "economic_calendar": lambda: economic_calendar.run_refresher(db),
+        "quote_snapshot": lambda: market_quotes.run_refresher(db)
+    }
+
+# Start the background jobs on app startup (each runs only in the worker holding its lease)
+@app.on_event("startup")
+async def start_background_jobs():
+    """Campaign for the forex news scheduler, EA signal monitor, calendar and quote refreshers; one leader runs each"""
+    if not leader_election.RUN_BACKGROUND_JOBS:
+        logger.info("Background jobs disabled in this process (RUN_BACKGROUND_JOBS=false)")
+        return
+    try:
+        await leader_election.ensure_lease_index(db)
+    except Exception as e:
+        logger.error(f"Error creating leader lease index: {e}")
+    leader_election.start_leader_jobs(db, background_jobs())
+    logger.info(f"🗳️ Leader election started for {', '.join(background_jobs())}")
 
 async def signal_monitor_loop():
     """
@@ -6726,18 +6729,23 @@ async def signal_monitor_loop():
                     
                     # Calculate current signal
                     try:
-                        history = market_simulator.get_price_history(symbol, 200)
+                        history = market_simulator.get_price_arrays(symbol, 200)
                         if not history:
                             continue
                         
-                        prices = [h["close"] for h in history]
+                        prices = history["close"]
                         indicator_config = ea.get("config", {}).get("indicator", {})
+                        timeframe = ea.get("config", {}).get("timeframe", "")
+                        bar_time = market_simulator.get_last_bar_time(symbol)
                         
                         # Calculate signal based on indicator
                         current_signal = "NEUTRAL"
                         if indicator_type == "RSI":
                             period = indicator_config.get("period", 14)
-                            rsi = indicators.calculate_rsi(prices, period)
+                            rsi = indicator_cache.get_or_compute(
+                                symbol, timeframe, "RSI", {"period": period}, bar_time,
+                                lambda: TechnicalIndicators.calculate_rsi(prices, period)
+                            )
                             overbought = indicator_config.get("overbought", 70)
                             oversold = indicator_config.get("oversold", 30)
                             if rsi <= oversold:
@@ -6748,10 +6756,13 @@ async def signal_monitor_loop():
                             fast = indicator_config.get("fast_period", 12)
                             slow = indicator_config.get("slow_period", 26)
                             signal_period = indicator_config.get("signal_period", 9)
-                            macd = indicators.calculate_macd(prices, fast, slow, signal_period)
-                            if macd and macd.get("macd_line", 0) > macd.get("signal_line", 0):
+                            macd = indicator_cache.get_or_compute(
+                                symbol, timeframe, "MACD", {"fast": fast, "slow": slow, "signal": signal_period}, bar_time,
+                                lambda: TechnicalIndicators.calculate_macd(prices, fast, slow, signal_period)
+                            )
+                            if macd and macd.get("macd", 0) > macd.get("signal", 0):
                                 current_signal = "BUY"
-                            elif macd and macd.get("macd_line", 0) < macd.get("signal_line", 0):
+                            elif macd and macd.get("macd", 0) < macd.get("signal", 0):
                                 current_signal = "SELL"
                         
                         # Check if signal changed
@@ -6759,7 +6770,7 @@ async def signal_monitor_loop():
                         
                         if current_signal != previous_signal and current_signal != "NEUTRAL":
                             # Signal changed! Update EA and send notification
-                            current_price = prices[-1] if prices else 0
+                            current_price = float(prices[-1]) if len(prices) else 0
                             
                             await db.eas.update_one(
                                 {"_id": ea["_id"]},
@@ -6794,7 +6805,7 @@ async def send_signal_notification_to_user(user_id: str, ea: dict, signal: str,
     """Send push notification to specific user when their EA signal changes"""
     try:
         # Get user's push tokens
-        tokens = await db.push_tokens.find({"user_id": user_id}).to_list(10)
+        tokens = await push_token_cache.tokens_for_user(db, user_id)
         
         if not tokens:
             logger.info(f"No push tokens for user {user_id}")
@@ -6807,41 +6818,17 @@ async def send_signal_notification_to_user(user_id: str, ea: dict, signal: str,
         title = f"{emoji} {signal} Signal - {symbol}"
         body = f"{indicator} detected a {signal} opportunity at {price:.5f}"
         
-        messages = []
-        for token_doc in tokens:
-            push_token = token_doc.get("token", "")
-            if push_token and push_token.startswith("ExponentPushToken"):
-                messages.append({
-                    "to": push_token,
-                    "sound": "default",
-                    "title": title,
-                    "body": body,
-                    "data": {
-                        "ea_id": str(ea["_id"]),
-                        "signal": signal,
-                        "symbol": symbol,
-                        "price": price,
-                        "type": "signal_change"
-                    },
-                    "priority": "high",
-                    "channelId": "signals"
-                })
+        messages = messages_for_tokens(tokens, title, body, {
+            "ea_id": str(ea["_id"]),
+            "signal": signal,
+            "symbol": symbol,
+            "price": price,
+            "type": "signal_change"
+        }, channel_id="signals")
         
         if messages:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    'https://exp.host/--/api/v2/push/send',
-                    json=messages,
-                    headers={
-                        'Accept': 'application/json',
-                        'Content-Type': 'application/json',
-                    },
-                    timeout=10.0
-                )
-                if response.status_code == 200:
-                    logger.info(f"✅ Push sent to user {user_id}: {signal} on {symbol}")
-                else:
-                    logger.error(f"Push failed: {response.status_code}")
+            await send_push_notifications_batch(messages)
+            logger.info(f"✅ Push sent to user {user_id}: {signal} on {symbol}")
                     
     except Exception as e:
         logger.error(f"Error sending notification to user: {e}")
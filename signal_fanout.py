@@ -0,0 +1,95 @@
+"""
+Bulk Signal Fan-out
+Writes per-user signal references (user_signals) and related per-recipient
+documents in chunked, unordered bulk operations instead of one round trip per user.
+
+- SIGNAL_FANOUT_BATCH_SIZE controls the chunk size (default 1000 documents)
+- Every call returns (and logs) how many documents were written and the insert throughput
+"""
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+import signal_inbox
+from batching import chunked
+
+logger = logging.getLogger(__name__)
+
+FANOUT_BATCH_SIZE = int(os.getenv("SIGNAL_FANOUT_BATCH_SIZE", "1000"))
+
+
+def fanout_stats(written: int, batches: int, started: float) -> Dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "written": written,
+        "batches": batches,
+        "seconds": round(elapsed, 4),
+        "docs_per_second": round(written / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+async def insert_many_chunked(collection, documents: List[Dict], batch_size: Optional[int] = None) -> Dict:
+    """
+    Insert documents with unordered insert_many calls of at most batch_size documents.
+    Returns stats plus the inserted ids in input order (None for documents that failed).
+    """
+    batch_size = batch_size or FANOUT_BATCH_SIZE
+    started = time.perf_counter()
+    inserted_ids: List = []
+    written = batches = 0
+
+    for chunk in chunked(documents, batch_size):
+        batches += 1
+        try:
+            result = await collection.insert_many(chunk, ordered=False)
+            inserted_ids.extend(result.inserted_ids)
+            written += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Unordered: the rest of the chunk is still written
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted_ids.extend(None if i in failed else doc.get("_id") for i, doc in enumerate(chunk))
+            written += e.details.get("nInserted", len(chunk) - len(failed))
+            logger.error(f"Bulk insert into {collection.name}: {len(failed)} of {len(chunk)} documents failed")
+
+    stats = fanout_stats(written, batches, started)
+    stats["inserted_ids"] = inserted_ids
+    return stats
+
+
+async def update_many_chunked(collection, ids: List, update: Dict, batch_size: Optional[int] = None) -> Dict:
+    """Apply the same update to many documents with one update_many per chunk of _ids"""
+    batch_size = batch_size or FANOUT_BATCH_SIZE
+    started = time.perf_counter()
+    written = batches = 0
+
+    for chunk in chunked(ids, batch_size):
+        batches += 1
+        result = await collection.update_many({"_id": {"$in": chunk}}, update)
+        written += result.modified_count
+
+    return fanout_stats(written, batches, started)
+
+
+async def insert_user_signals(db, signal_id: str, user_ids: Iterable[str],
+                              batch_size: Optional[int] = None) -> Dict:
+    """Create one unread user_signals reference per user for a signal"""
+    created_at = datetime.utcnow()
+    user_ids = list(user_ids)
+    documents = [
+        {"signal_id": signal_id, "user_id": user_id, "read": False, "created_at": created_at}
+        for user_id in user_ids
+    ]
+    stats = await insert_many_chunked(db.user_signals, documents, batch_size)
+    stats.pop("inserted_ids")
+    log_fanout(f"signal {signal_id}", stats)
+    await signal_inbox.increment_unread(db, user_ids)
+    return stats
+
+
+def log_fanout(label: str, stats: Dict):
+    logger.info(f"📨 Fan-out {label}: {stats['written']} docs in {stats['batches']} batches, "
+                f"{stats['seconds']}s ({stats['docs_per_second']} docs/s)")
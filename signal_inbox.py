@@ -0,0 +1,348 @@
+"""
+Hybrid Signal Inbox
+Broadcast signals are stored ONCE with an audience descriptor instead of one
+user_signals row per recipient, and merged into each user's inbox at read time.
+
+Audience descriptors (stored on the signal as "audience"):
+- {"type": "all"}                          -> every active, paid user
+- {"type": "mentor", "mentor_id": "M001"}  -> every active, paid user of a mentor
+- {"type": "users", "user_ids": [...]}     -> an explicit list of users
+
+Read state for audience signals is stored as per-user deltas in signal_reads
+(only for signals a user actually opened). Per-subscription signals (indicator
+auto signals, manual overrides) keep their personal user_signals rows.
+
+Inbox reads are a single aggregation ($lookup + $unionWith, MongoDB 4.4+),
+paginated by keyset on (received_at, signal_id).
+
+Unread counts: publishing an audience signal never writes user documents.
+- Personal refs: each user document carries a counter (unread_personal_signal_count),
+  incremented on fan-out and decremented on mark-read; recounted when missing
+- Audience signals: counted at read time from the audience signals newer than the
+  user's last-read cursor (audience_read_at). Mark-read moves the cursor past every
+  audience signal the user has read, so a count costs O(signals since the cursor)
+  however large the audience is
+"""
+import logging
+from datetime import datetime, timedelta
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+AUDIENCE_ALL = "all"
+AUDIENCE_MENTOR = "mentor"
+AUDIENCE_USERS = "users"
+
+UNREAD_FIELD = "unread_personal_signal_count"
+AUDIENCE_READ_FIELD = "audience_read_at"
+# Counter that also included audience signals; removed by migrate_signal_inbox.py
+LEGACY_UNREAD_FIELD = "unread_signal_count"
+
+# The audience cursor never passes signals younger than this, so a broadcast that is
+# inserted slightly out of created_at order is not skipped
+AUDIENCE_CURSOR_SETTLE_SECONDS = 60
+
+
+def audience_all() -> Dict:
+    return {"type": AUDIENCE_ALL}
+
+
+def audience_mentor(mentor_id: str) -> Dict:
+    return {"type": AUDIENCE_MENTOR, "mentor_id": mentor_id}
+
+
+def audience_users(user_ids: List[str]) -> Dict:
+    return {"type": AUDIENCE_USERS, "user_ids": list(dict.fromkeys(user_ids))}
+
+
+def audience_query(user: Dict) -> Dict:
+    """
+    Mongo filter for the audience signals visible to a user.
+    Broadcasts only reach users that are active and paid, and only those sent after the user joined.
+    """
+    user_id = str(user["_id"])
+    clauses = [{"audience.type": AUDIENCE_USERS, "audience.user_ids": user_id}]
+
+    if user.get("status") == "active" and user.get("payment_status") == "paid":
+        since = {"created_at": {"$gte": user["created_at"]}} if user.get("created_at") else {}
+        clauses.append({"audience.type": AUDIENCE_ALL, **since})
+        if user.get("mentor_id"):
+            clauses.append({"audience.type": AUDIENCE_MENTOR, "audience.mentor_id": user["mentor_id"], **since})
+
+    return {"$or": clauses}
+
+
+def audience_user_filter(audience: Dict) -> Dict:
+    """Mongo filter on users for the users an audience currently reaches"""
+    if audience["type"] == AUDIENCE_USERS:
+        return {"_id": {"$in": [ObjectId(u) for u in audience["user_ids"] if ObjectId.is_valid(u)]}}
+    query = {"status": "active", "payment_status": "paid"}
+    if audience["type"] == AUDIENCE_MENTOR:
+        query["mentor_id"] = audience["mentor_id"]
+    return query
+
+
+async def count_audience(db, audience: Dict) -> int:
+    """Number of users an audience currently reaches"""
+    if audience["type"] == AUDIENCE_USERS:
+        return len(audience["user_ids"])
+    return await db.users.count_documents(audience_user_filter(audience))
+
+
+async def publish_audience_signal(db, signal_doc: Dict, audience: Dict) -> str:
+    """
+    Store a broadcast signal once, tagged with its audience. Returns the signal id.
+    Recipients' unread counts pick it up at read time (count_unread_audience).
+    """
+    signal_doc["audience"] = audience
+    result = await db.signals.insert_one(signal_doc)
+    return str(result.inserted_id)
+
+
+async def increment_unread(db, user_ids: Iterable[str]):
+    """Bump the personal unread counters after user_signals refs were written (one update per distinct count)"""
+    by_count: Dict[int, List[ObjectId]] = {}
+    for user_id, count in Counter(user_ids).items():
+        if ObjectId.is_valid(user_id):
+            by_count.setdefault(count, []).append(ObjectId(user_id))
+    for count, ids in by_count.items():
+        await db.users.update_many(
+            {"_id": {"$in": ids}, UNREAD_FIELD: {"$exists": True}},
+            {"$inc": {UNREAD_FIELD: count}}
+        )
+
+
+async def ensure_inbox_indexes(db):
+    """Indexes behind the personal refs, audience lookups and read-state deltas"""
+    await db.user_signals.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.signals.create_index([("audience.type", ASCENDING), ("created_at", DESCENDING)])
+    await db.signals.create_index([("audience.mentor_id", ASCENDING), ("created_at", DESCENDING)], sparse=True)
+    await db.signals.create_index([("audience.user_ids", ASCENDING), ("created_at", DESCENDING)], sparse=True)
+    await db.signal_reads.create_index([("user_id", ASCENDING), ("signal_id", ASCENDING)], unique=True)
+
+
+def encode_cursor(entry: Dict) -> str:
+    """Opaque keyset cursor of an inbox entry"""
+    return f"{entry['received_at'].isoformat()}_{entry['signal_id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors"""
+    received_at, _, signal_id = cursor.rpartition("_")
+    if not ObjectId.is_valid(signal_id):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return datetime.fromisoformat(received_at), signal_id
+
+
+def keyset_match(time_field: str, id_field: str, op: str, cursor: Tuple[datetime, Optional[str]], cast=str) -> Dict:
+    """Entries strictly before ($lt) or after ($gt) a (time, id) cursor; a cursor without id compares on time only"""
+    received_at, signal_id = cursor
+    if signal_id is None:
+        return {time_field: {op: received_at}}
+    return {"$or": [
+        {time_field: {op: received_at}},
+        {time_field: received_at, id_field: {op: cast(signal_id)}}
+    ]}
+
+
+def reads_lookup(user_id: str) -> Dict:
+    """$lookup stage attaching the user's signal_reads delta (if any) to audience signals as `reads`"""
+    return {"$lookup": {
+        "from": "signal_reads",
+        "let": {"signal_id": {"$toString": "$_id"}},
+        "pipeline": [
+            {"$match": {"$expr": {"$and": [
+                {"$eq": ["$user_id", user_id]},
+                {"$eq": ["$signal_id", "$$signal_id"]}
+            ]}}},
+            {"$limit": 1}
+        ],
+        "as": "reads"
+    }}
+
+
+def inbox_pipeline(user: Dict, limit: int, before: Optional[Tuple] = None, after: Optional[Tuple] = None) -> List[Dict]:
+    """
+    Aggregation (run on user_signals) returning a user's inbox entries in one round trip:
+    personal refs joined to their signal with $lookup, unioned with the audience signals
+    joined to the user's read-state delta, then merged on (received_at, signal_id).
+
+    Newest first, or oldest first when paging forward with `after`.
+    """
+    user_id = str(user["_id"])
+    direction = 1 if after else -1
+    op = "$gt" if after else "$lt"
+    cursor = after or before
+
+    personal_match = {"user_id": user_id}
+    audience_match = audience_query(user)
+    if cursor:
+        personal_match = {"$and": [personal_match, keyset_match("created_at", "signal_id", op, cursor)]}
+        audience_match = {"$and": [audience_match, keyset_match("created_at", "_id", op, cursor, ObjectId)]}
+
+    return [
+        {"$match": personal_match},
+        {"$sort": {"created_at": direction, "signal_id": direction}},
+        {"$limit": limit},
+        {"$lookup": {
+            "from": "signals",
+            "let": {"signal_oid": {"$convert": {"input": "$signal_id", "to": "objectId", "onError": None, "onNull": None}}},
+            "pipeline": [{"$match": {"$expr": {"$eq": ["$_id", "$$signal_oid"]}}}],
+            "as": "signal"
+        }},
+        {"$unwind": "$signal"},
+        {"$project": {"_id": 0, "signal": 1, "signal_id": 1, "read": {"$ifNull": ["$read", False]},
+                      "received_at": "$created_at"}},
+        {"$unionWith": {"coll": "signals", "pipeline": [
+            {"$match": audience_match},
+            {"$sort": {"created_at": direction, "_id": direction}},
+            {"$limit": limit},
+            reads_lookup(user_id),
+            {"$project": {"_id": 0, "signal_id": {"$toString": "$_id"}, "read": {"$gt": [{"$size": "$reads"}, 0]},
+                          "received_at": "$created_at", "signal": "$$ROOT"}},
+            {"$unset": "signal.reads"}
+        ]}},
+        {"$sort": {"received_at": direction, "signal_id": direction}},
+        {"$limit": limit}
+    ]
+
+
+async def fetch_inbox(db, user: Dict, limit: int = 50, before: Optional[Tuple] = None,
+                      after: Optional[Tuple] = None) -> List[Dict]:
+    """
+    Up to `limit` inbox entries of a user, newest first, in a single aggregation.
+    `before` / `after` are (received_at, signal_id) keyset cursors (signal_id may be None
+    to compare on time only, e.g. for a `since` poll). With `after`, the entries closest
+    to the cursor are returned.
+    Each entry is {"signal": signal doc, "signal_id": str, "read": bool, "received_at": datetime}.
+    """
+    entries = await db.user_signals.aggregate(inbox_pipeline(user, limit, before, after)).to_list(length=limit)
+    if after:
+        entries.reverse()
+    return entries
+
+
+async def latest_inbox_signal(db, user: Dict) -> Optional[Dict]:
+    """Most recent signal in a user's inbox (personal or audience), or None"""
+    entries = await fetch_inbox(db, user, limit=1)
+    return entries[0]["signal"] if entries else None
+
+
+async def mark_read(db, user: Dict, signal_id: str) -> bool:
+    """Mark a signal read for a user. Returns False if the signal is not in the user's inbox"""
+    user_id = str(user["_id"])
+    now = datetime.utcnow()
+
+    result = await db.user_signals.update_one(
+        {"signal_id": signal_id, "user_id": user_id, "read": {"$ne": True}},
+        {"$set": {"read": True, "read_at": now}}
+    )
+    if result.modified_count > 0:
+        await decrement_unread(db, user)
+        return True
+    if await db.user_signals.find_one({"signal_id": signal_id, "user_id": user_id}, {"_id": 1}):
+        return True
+
+    if not ObjectId.is_valid(signal_id):
+        return False
+    visible = await db.signals.find_one({"_id": ObjectId(signal_id), **audience_query(user)}, {"_id": 1})
+    if not visible:
+        return False
+
+    result = await db.signal_reads.update_one(
+        {"user_id": user_id, "signal_id": signal_id},
+        {"$setOnInsert": {"read_at": now}},
+        upsert=True
+    )
+    if result.upserted_id is not None:
+        await advance_audience_cursor(db, user)
+    return True
+
+
+def user_oid(user: Dict) -> ObjectId:
+    """Users' _id as stored (auth dependencies hand out serialized documents with a string _id)"""
+    return ObjectId(str(user["_id"]))
+
+
+async def decrement_unread(db, user: Dict):
+    await db.users.update_one(
+        {"_id": user_oid(user), UNREAD_FIELD: {"$gt": 0}},
+        {"$inc": {UNREAD_FIELD: -1}}
+    )
+
+
+async def recount_unread(db, user: Dict) -> int:
+    """Recompute a user's personal unread counter from user_signals and store it"""
+    unread = await db.user_signals.count_documents({"user_id": str(user["_id"]), "read": {"$ne": True}})
+    await db.users.update_one({"_id": user_oid(user)}, {"$set": {UNREAD_FIELD: unread}})
+    return unread
+
+
+def audience_after(user: Dict, read_at: Optional[datetime]) -> Dict:
+    """Audience signals visible to a user and newer than the user's audience cursor"""
+    query = audience_query(user)
+    if read_at is None:
+        return query
+    return {"$and": [query, {"created_at": {"$gt": read_at}}]}
+
+
+async def count_unread_audience(db, user: Dict, read_at: Optional[datetime]) -> int:
+    """Audience signals newer than the cursor without a read-state delta"""
+    result = await db.signals.aggregate([
+        {"$match": audience_after(user, read_at)},
+        reads_lookup(str(user["_id"])),
+        {"$match": {"reads": {"$size": 0}}},
+        {"$count": "unread"}
+    ]).to_list(length=1)
+    return result[0]["unread"] if result else 0
+
+
+async def advance_audience_cursor(db, user: Dict) -> Optional[datetime]:
+    """
+    Move the user's audience cursor up to the newest created_at before the oldest unread
+    audience signal, skipping signals younger than AUDIENCE_CURSOR_SETTLE_SECONDS.
+    Returns the new cursor, or None if it did not move.
+    """
+    stored = await db.users.find_one({"_id": user_oid(user)}, {AUDIENCE_READ_FIELD: 1})
+    settled = {"created_at": {"$lte": datetime.utcnow() - timedelta(seconds=AUDIENCE_CURSOR_SETTLE_SECONDS)}}
+    cursor = db.signals.aggregate([
+        {"$match": {"$and": [audience_after(user, (stored or {}).get(AUDIENCE_READ_FIELD)), settled]}},
+        {"$sort": {"created_at": ASCENDING}},
+        reads_lookup(str(user["_id"])),
+        {"$project": {"created_at": 1, "read": {"$gt": [{"$size": "$reads"}, 0]}}}
+    ])
+
+    advanced_to = None  # Every audience signal created up to this time is read
+    run = None          # created_at of the signals being scanned
+    async for signal in cursor:
+        if signal["created_at"] != run:
+            if run is not None:
+                advanced_to = run
+            run = signal["created_at"]
+        if not signal["read"]:
+            run = None
+            break
+    if run is not None:
+        advanced_to = run
+
+    if advanced_to is not None:
+        await db.users.update_one({"_id": user_oid(user)}, {"$max": {AUDIENCE_READ_FIELD: advanced_to}})
+    return advanced_to
+
+
+async def unread_count(db, user: Dict) -> int:
+    """
+    Unread inbox entries of a user: the stored personal counter plus the unread audience
+    signals after the user's cursor. Both are read fresh: cached principals (principal_cache)
+    do not carry them.
+    """
+    stored = await db.users.find_one({"_id": user_oid(user)}, {UNREAD_FIELD: 1, AUDIENCE_READ_FIELD: 1}) or {}
+    if UNREAD_FIELD in stored:
+        personal = max(stored[UNREAD_FIELD], 0)
+    else:
+        personal = await recount_unread(db, user)
+    return personal + await count_unread_audience(db, user, stored.get(AUDIENCE_READ_FIELD))
@@ -0,0 +1,236 @@
+"""
+Signal Stream
+Server-push delivery of new signals, indicator signal changes and news alerts,
+replacing client polling of /user/signals/latest, /user/upcoming-news-alerts
+and /user/mentor-indicators.
+
+- StreamHub: in-process pub/sub. Each connected client gets a bounded queue;
+  events are routed by the same audience descriptors as the signal inbox
+  (all / mentor / users).
+- Backpressure: when a client's queue is full its pending events are dropped
+  and replaced by a single "resync" event, telling the client to refetch
+  /user/signals?after=<latest_cursor>. Memory per client stays bounded.
+- Cross-process relay: publish() writes to a capped Mongo collection
+  (stream_events) that every uvicorn worker (and the signal worker process)
+  tails, so an event published anywhere reaches clients connected to any worker.
+  SIGNAL_STREAM_RELAY=local dispatches in-process only (single worker / local runs).
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from signal_inbox import AUDIENCE_ALL, AUDIENCE_MENTOR, AUDIENCE_USERS
+
+logger = logging.getLogger(__name__)
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_EVENTS_CAP_BYTES = int(os.getenv("STREAM_EVENTS_CAP_BYTES", str(16 * 1024 * 1024)))
+SIGNAL_STREAM_RELAY = os.getenv("SIGNAL_STREAM_RELAY", "mongo")
+
+EVENT_SIGNAL = "signal"
+EVENT_INDICATOR_SIGNAL = "indicator_signal"
+EVENT_NEWS = "news"
+EVENT_RESYNC = "resync"
+
+
+class StreamSubscriber:
+    """One connected client: a bounded event queue plus the fields used for audience routing"""
+    __slots__ = ("user_id", "mentor_id", "broadcasts", "queue", "dropped")
+
+    def __init__(self, user: Dict, queue_size: int):
+        self.user_id = str(user["_id"])
+        self.mentor_id = user.get("mentor_id")
+        # Same rule as the inbox: broadcasts only reach active, paid users (admins see them too)
+        self.broadcasts = "role" in user or (
+            user.get("status") == "active" and user.get("payment_status") == "paid"
+        )
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, event: Dict):
+        """Enqueue without blocking the publisher; on overflow collapse the backlog into one resync event"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": EVENT_RESYNC, "data": {"reason": "slow consumer"}})
+
+
+class StreamHub:
+    """In-process fan-out of stream events to the clients connected to this worker"""
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.by_user: Dict[str, Set[StreamSubscriber]] = {}
+        self.by_mentor: Dict[str, Set[StreamSubscriber]] = {}
+        self.delivered = 0
+        self.published = 0
+        self.listeners: Dict[str, List[Callable[[Dict], None]]] = {}
+
+    def connect(self, user: Dict) -> StreamSubscriber:
+        subscriber = StreamSubscriber(user, self.queue_size)
+        self.by_user.setdefault(subscriber.user_id, set()).add(subscriber)
+        if subscriber.mentor_id:
+            self.by_mentor.setdefault(subscriber.mentor_id, set()).add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: StreamSubscriber):
+        for index, key in ((self.by_user, subscriber.user_id), (self.by_mentor, subscriber.mentor_id)):
+            group = index.get(key)
+            if group is not None:
+                group.discard(subscriber)
+                if not group:
+                    del index[key]
+
+    def recipients(self, audience: Dict):
+        audience_type = audience.get("type")
+        if audience_type == AUDIENCE_USERS:
+            for user_id in audience.get("user_ids", []):
+                yield from self.by_user.get(user_id, ())
+        elif audience_type == AUDIENCE_MENTOR:
+            yield from (s for s in self.by_mentor.get(audience.get("mentor_id"), ()) if s.broadcasts)
+        elif audience_type == AUDIENCE_ALL:
+            for group in self.by_user.values():
+                yield from (s for s in group if s.broadcasts)
+
+    def add_listener(self, event_type: str, callback: Callable[[Dict], None]):
+        """Run callback(data) in this process for every event of a type (e.g. cache invalidations)"""
+        self.listeners.setdefault(event_type, []).append(callback)
+
+    def dispatch(self, event: Dict) -> int:
+        """Deliver an event to the matching local subscribers. Returns the number of queues it reached"""
+        for callback in self.listeners.get(event["type"], ()):
+            try:
+                callback(event.get("data", {}))
+            except Exception as e:
+                logger.error(f"Stream listener for {event['type']} failed: {e}")
+        message = {"id": event.get("id"), "type": event["type"], "data": event.get("data", {})}
+        count = 0
+        for subscriber in self.recipients(event.get("audience", {})):
+            subscriber.offer(message)
+            count += 1
+        self.published += 1
+        self.delivered += count
+        return count
+
+    def stats(self) -> Dict:
+        subscribers = [s for group in self.by_user.values() for s in group]
+        return {
+            "connections": len(subscribers),
+            "users": len(self.by_user),
+            "events_dispatched": self.published,
+            "deliveries": self.delivered,
+            "queued": sum(s.queue.qsize() for s in subscribers),
+            "dropped": sum(s.dropped for s in subscribers),
+            "relay": SIGNAL_STREAM_RELAY
+        }
+
+
+stream_hub = StreamHub()
+
+
+async def ensure_stream_collection(db):
+    """Create the capped relay collection; a tailable cursor needs at least one document to stay open"""
+    try:
+        await db.create_collection("stream_events", capped=True, size=STREAM_EVENTS_CAP_BYTES)
+    except CollectionInvalid:
+        pass
+    if await db.stream_events.estimated_document_count() == 0:
+        await db.stream_events.insert_one({"type": "init", "created_at": datetime.utcnow()})
+
+
+async def publish(db, event_type: str, audience: Dict, data: Dict):
+    """Publish an event to every worker (relay) or to this process only (SIGNAL_STREAM_RELAY=local)"""
+    event = {"type": event_type, "audience": audience, "data": data, "created_at": datetime.utcnow()}
+    try:
+        if SIGNAL_STREAM_RELAY == "local":
+            stream_hub.dispatch(event)
+        else:
+            await db.stream_events.insert_one(event)
+    except Exception as e:
+        # Streaming is best effort: clients resync from the inbox on reconnect
+        logger.error(f"Error publishing {event_type} stream event: {e}")
+
+
+async def run_relay(db, hub: StreamHub = stream_hub):
+    """Tail stream_events and dispatch new events into the local hub, resuming after errors"""
+    last = await db.stream_events.find_one({}, sort=[("$natural", -1)])
+    last_id = last["_id"] if last else None
+
+    while True:
+        try:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = db.stream_events.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for event in cursor:
+                    last_id = event["_id"]
+                    if event.get("type") != "init":
+                        hub.dispatch({**event, "id": str(event["_id"])})
+                await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Stream relay error: {e}")
+        await asyncio.sleep(1)
+
+
+def format_sse(message: Dict) -> str:
+    lines = []
+    if message.get("id"):
+        lines.append(f"id: {message['id']}")
+    lines.append(f"event: {message['type']}")
+    lines.append(f"data: {json.dumps(message.get('data', {}), default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_events(request, hub: StreamHub, subscriber: StreamSubscriber,
+                     heartbeat: Optional[float] = None):
+    """Server-Sent Events body for one client; comment heartbeats keep proxies from closing idle streams"""
+    heartbeat = heartbeat or STREAM_HEARTBEAT_SECONDS
+    try:
+        yield format_sse({"type": "ready", "data": {"user_id": subscriber.user_id}})
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_sse(message)
+    finally:
+        hub.disconnect(subscriber)
+
+
+SIGNAL_EVENT_FIELDS = (
+    "signal_type", "symbol", "indicator", "timeframe", "notes", "entry_price", "stop_loss",
+    "take_profit", "message", "sender_type", "status", "created_at", "expires_at"
+)
+
+
+def signal_event_data(signal_id: Optional[str], signal_doc: Dict) -> Dict:
+    """
+    Compact signal payload (the fields shown by the floating signal button).
+    Without signal_id (one event for a bulk fan-out) clients fetch their own copy from the inbox.
+    """
+    data = {field: signal_doc.get(field) for field in SIGNAL_EVENT_FIELDS if signal_doc.get(field) is not None}
+    if signal_id:
+        data["id"] = signal_id
+    return data
+
+
+NEWS_EVENT_FIELDS = ("title", "event_time", "currency", "impact", "signal", "description", "sender_type", "created_at")
+
+
+def news_event_data(news_id: str, news_doc: Dict) -> Dict:
+    """Compact news alert payload"""
+    data = {field: news_doc.get(field) for field in NEWS_EVENT_FIELDS if news_doc.get(field) is not None}
+    data["id"] = news_id
+    return data
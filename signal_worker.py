@@ -8,16 +8,34 @@ Each timeframe has its own monitoring interval:
 - 30min -> check every 20 minutes
 - 1h    -> check every 45 minutes
 - 4h    -> check every 60 minutes
+
+Scheduling: every subscription stores its next due time in `next_check_at`
+(indexed with status). Each cycle fetches only the subscriptions that are due,
+and the worker sleeps until the earliest next_check_at instead of polling.
+Subscriptions get next_check_at and shard_hash when created (subscription_schedule);
+older ones are backfilled once at startup.
 """
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, UpdateOne
 from bson import ObjectId
 import os
 from dotenv import load_dotenv
 
 from condition_evaluator import ConditionEvaluator
+from condition_compiler import cross_state, plan_cache
+from indicator_cache import indicator_cache
+import signal_inbox
+import signal_stream
+from push_service import push_service, messages_for_tokens
+import push_queue
+import push_tokens
+from push_tokens import push_token_cache
+from signal_fanout import insert_many_chunked, log_fanout, update_many_chunked
+from subscription_schedule import subscription_shard_hash
 from market_data import get_mock_market_data
 
 load_dotenv()
@@ -46,6 +64,25 @@ TIMEFRAME_INTERVALS = {
     "D1": 240,
 }
 
+# Candle length (in minutes) for each timeframe, used to key the indicator cache by bar
+TIMEFRAME_BAR_MINUTES = {
+    "1min": 1, "1m": 1,
+    "5min": 5, "5m": 5,
+    "15min": 15, "15m": 15,
+    "30min": 30, "30m": 30,
+    "1h": 60, "1H": 60, "H1": 60,
+    "4h": 240, "4H": 240, "H4": 240,
+    "1d": 1440, "1D": 1440, "D1": 1440,
+}
+
+# Concurrency and sharding (run several worker processes with distinct WORKER_SHARD_INDEX values)
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "50"))  # Concurrent market data fetches / signal writes
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "500"))  # Subscriptions evaluated per batch
+WORKER_MAX_INFLIGHT_BATCHES = int(os.getenv("WORKER_MAX_INFLIGHT_BATCHES", "4"))
+WORKER_SHARD_COUNT = max(1, int(os.getenv("WORKER_SHARD_COUNT", "1")))
+WORKER_SHARD_INDEX = int(os.getenv("WORKER_SHARD_INDEX", "0"))
+WORKER_MAX_SLEEP_SECONDS = int(os.getenv("WORKER_MAX_SLEEP_SECONDS", "60"))  # Upper bound, so new subscriptions are picked up
+
 # Database connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 client = AsyncIOMotorClient(MONGO_URL)
@@ -79,6 +116,8 @@ async def fetch_market_data(symbol: str, timeframe: str, bars: int = 100) -> dic
         
         return {
             "symbol": symbol,
+            "timeframe": timeframe,
+            "bar_time": get_bar_time(timeframe),
             "close_prices": close_prices,
             "high_prices": high_prices,
             "low_prices": low_prices,
@@ -90,27 +129,21 @@ async def fetch_market_data(symbol: str, timeframe: str, bars: int = 100) -> dic
         return None
 
 
-def get_check_interval(timeframe: str) -> int:
+def get_bar_time(timeframe: str, now: float = None) -> float:
     """
-    Get the monitoring interval in minutes for a given timeframe
+    Open time (epoch seconds) of the current candle for a timeframe.
+    All subscriptions on the same symbol/timeframe share indicator results until it changes.
     """
-    return TIMEFRAME_INTERVALS.get(timeframe, 5)  # Default to 5 minutes
+    now = time.time() if now is None else now
+    bar_seconds = TIMEFRAME_BAR_MINUTES.get(timeframe, 15) * 60
+    return float(int(now // bar_seconds) * bar_seconds)
 
 
-async def should_check_timeframe(subscription: dict) -> bool:
+def get_check_interval(timeframe: str) -> int:
     """
-    Check if it's time to monitor this subscription based on its timeframe
+    Get the monitoring interval in minutes for a given timeframe
     """
-    timeframe = subscription.get("user_selected_timeframe", "15min")
-    last_check_time = subscription.get("last_check_time")
-    
-    if not last_check_time:
-        return True
-    
-    interval_minutes = get_check_interval(timeframe)
-    time_since_last = datetime.utcnow() - last_check_time
-    
-    return time_since_last >= timedelta(minutes=interval_minutes)
+    return TIMEFRAME_INTERVALS.get(timeframe, 5)  # Default to 5 minutes
 
 
 async def should_generate_signal(subscription: dict) -> bool:
@@ -131,229 +164,417 @@ async def should_generate_signal(subscription: dict) -> bool:
     return time_since_last > timedelta(minutes=cooldown_minutes)
 
 
-async def create_signal_for_subscription(subscription: dict, signal_type: str, indicator: dict):
+async def create_signals_for_members(members: list, signal_type: str, indicator: dict) -> int:
     """
-    Create a signal document and user_signals reference
+    Create signals for the members of an evaluation group that passed the cooldown:
+    signals and user_signals are written with chunked insert_many, subscription stats with update_many
     """
-    try:
-        expiry_time = datetime.utcnow() + timedelta(hours=24)
-        
-        signal_doc = {
-            "symbol": subscription["user_selected_symbol"],
-            "signal_type": signal_type,
-            "indicator": indicator["name"],
-            "candle_pattern": None,
-            "timeframe": subscription["user_selected_timeframe"],
-            "notes": f"Auto-generated from {indicator['name']} conditions",
-            "sender_type": "indicator_auto",
-            "sender_id": subscription["mentor_id"],
-            "indicator_id": subscription["indicator_id"],
-            "subscription_id": str(subscription["_id"]),
-            "created_at": datetime.utcnow(),
-            "expires_at": expiry_time,
-            "duration_seconds": 86400,
-            "status": "active"
-        }
-        
-        result = await db.signals.insert_one(signal_doc)
-        signal_id = str(result.inserted_id)
-        
-        # Create user_signals reference
-        await db.user_signals.insert_one({
-            "signal_id": signal_id,
-            "user_id": subscription["user_id"],
-            "read": False,
-            "created_at": datetime.utcnow()
-        })
-        
-        # Update subscription stats
-        await db.user_indicator_subscriptions.update_one(
-            {"_id": subscription["_id"]},
-            {
-                "$set": {
-                    "last_signal_time": datetime.utcnow(),
-                    "last_signal_type": signal_type
-                },
-                "$inc": {"total_signals_received": 1}
-            }
+    if not members:
+        return 0
+    
+    now = datetime.utcnow()
+    expiry_time = now + timedelta(hours=24)
+    signal_docs = [{
+        "symbol": member["user_selected_symbol"],
+        "signal_type": signal_type,
+        "indicator": indicator["name"],
+        "candle_pattern": None,
+        "timeframe": member["user_selected_timeframe"],
+        "notes": f"Auto-generated from {indicator['name']} conditions",
+        "sender_type": "indicator_auto",
+        "sender_id": member["mentor_id"],
+        "indicator_id": member["indicator_id"],
+        "subscription_id": str(member["_id"]),
+        "created_at": now,
+        "expires_at": expiry_time,
+        "duration_seconds": 86400,
+        "status": "active"
+    } for member in members]
+    
+    signals_result = await insert_many_chunked(db.signals, signal_docs)
+    created = [
+        (member, signal_oid) for member, signal_oid in zip(members, signals_result["inserted_ids"])
+        if signal_oid is not None
+    ]
+    
+    user_signals_result = await insert_many_chunked(db.user_signals, [{
+        "signal_id": str(signal_oid),
+        "user_id": member["user_id"],
+        "read": False,
+        "created_at": now
+    } for member, signal_oid in created])
+    user_signals_result.pop("inserted_ids")
+    log_fanout(f"{signal_type} {indicator['name']}", user_signals_result)
+    await signal_inbox.increment_unread(db, [member["user_id"] for member, _ in created])
+    if created:
+        await signal_stream.publish(
+            db, signal_stream.EVENT_SIGNAL,
+            signal_inbox.audience_users([member["user_id"] for member, _ in created]),
+            signal_stream.signal_event_data(None, signal_docs[0])
         )
-        
-        logger.info(f"✅ Created {signal_type} signal for user {subscription['user_id']} on {subscription['user_selected_symbol']}")
-        
-        # Send push notification
-        await send_push_notification(subscription["user_id"], indicator["name"], signal_type, subscription["user_selected_symbol"])
-        
-        return signal_id
-        
-    except Exception as e:
-        logger.error(f"Error creating signal: {e}")
-        return None
+    
+    await update_many_chunked(db.user_indicator_subscriptions, [member["_id"] for member, _ in created], {
+        "$set": {"last_signal_time": now, "last_signal_type": signal_type},
+        "$inc": {"total_signals_received": 1}
+    })
+    
+    await send_group_push_notifications(created, indicator["name"], signal_type)
+    
+    return len(created)
 
 
-async def send_push_notification(user_id: str, indicator_name: str, signal_type: str, symbol: str):
-    """
-    Send push notification to user via Expo Push Notification Service
-    """
+def signal_push_messages(tokens: list, indicator_name: str, signal_type: str, symbol: str) -> list:
+    emoji = "📈" if signal_type == "BUY" else "📉"
+    return messages_for_tokens(
+        tokens,
+        f"{emoji} {signal_type} Signal - {symbol}",
+        f"{indicator_name} detected a {signal_type} opportunity on {symbol}",
+        {"signal": signal_type, "symbol": symbol, "indicator": indicator_name, "type": "signal"},
+        channel_id="signals"
+    )
+
+
+async def send_group_push_notifications(created: list, indicator_name: str, signal_type: str):
+    """One token lookup and one queued push batch for all members that received a signal"""
     try:
-        import httpx
-        
-        # Get user's push tokens
-        tokens = await db.push_tokens.find({"user_id": user_id}).to_list(100)
-        
-        if not tokens:
-            logger.info(f"No push tokens found for user {user_id}")
-            return
-        
-        # Prepare notification messages
-        emoji = "📈" if signal_type == "BUY" else "📉"
-        messages = []
-        
-        for token_doc in tokens:
-            push_token = token_doc.get("token")
-            if push_token and push_token.startswith("ExponentPushToken"):
-                messages.append({
-                    "to": push_token,
-                    "sound": "default",
-                    "title": f"{emoji} {signal_type} Signal - {symbol}",
-                    "body": f"{indicator_name} detected a {signal_type} opportunity on {symbol}",
-                    "data": {
-                        "signal": signal_type,
-                        "symbol": symbol,
-                        "indicator": indicator_name,
-                        "type": "signal"
-                    },
-                    "priority": "high",
-                    "channelId": "signals"
-                })
+        tokens_by_user = await push_token_cache.tokens_for_users(db, [member["user_id"] for member, _ in created])
         
-        if not messages:
-            logger.info(f"No valid push tokens for user {user_id}")
-            return
-        
-        # Send via Expo Push API
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://exp.host/--/api/v2/push/send',
-                json=messages,
-                headers={
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json',
-                },
-                timeout=10.0
+        messages = [
+            message
+            for member, _ in created
+            for message in signal_push_messages(
+                tokens_by_user.get(member["user_id"], []), indicator_name, signal_type, member["user_selected_symbol"]
             )
-            
-            if response.status_code == 200:
-                logger.info(f"📱 Push notification sent: {signal_type} on {symbol} to user {user_id}")
-            else:
-                logger.error(f"Push notification failed: {response.status_code}")
-        
+        ]
+        await push_queue.enqueue(db, messages, f"{signal_type} {indicator_name}")
     except Exception as e:
-        logger.error(f"Error sending push notification: {e}")
+        logger.error(f"Error queueing push notifications: {e}")
+
+
+def shard_query() -> dict:
+    """Mongo filter selecting this worker's shard"""
+    if WORKER_SHARD_COUNT <= 1:
+        return {}
+    return {"shard_hash": {"$mod": [WORKER_SHARD_COUNT, WORKER_SHARD_INDEX]}}
+
 
+async def ensure_schedule_index():
+    """Index backing the due-time queue: active subscriptions ordered by next_check_at"""
+    await db.user_indicator_subscriptions.create_index(
+        [("status", ASCENDING), ("next_check_at", ASCENDING)],
+        name="status_next_check_at"
+    )
 
-async def process_subscription(subscription: dict):
+
+async def assign_schedule_fields() -> int:
     """
-    Process a single subscription:
-    1. Check if it's time to monitor based on timeframe interval
-    2. Fetch market data for user's selected symbol
-    3. Get indicator configuration
-    4. Evaluate conditions
-    5. Generate signal if conditions met
+    Give active subscriptions created without scheduling fields a shard_hash and a next_check_at.
+    Existing subscriptions become due one interval after their last check (or immediately).
+    Runs once at worker startup: new subscriptions get both fields when they are created.
     """
-    try:
-        subscription_id = str(subscription["_id"])
-        indicator_id = subscription["indicator_id"]
-        symbol = subscription["user_selected_symbol"]
-        timeframe = subscription["user_selected_timeframe"]
-        interval = get_check_interval(timeframe)
-        
-        # Check if it's time to monitor this timeframe
-        if not await should_check_timeframe(subscription):
-            logger.debug(f"⏰ Not yet time to check {timeframe} for {symbol} (interval: {interval}min)")
-            return
-        
-        logger.info(f"🔍 Processing {timeframe} subscription {subscription_id} for {symbol} (interval: {interval}min)")
-        
-        # Update last check time
-        await db.user_indicator_subscriptions.update_one(
-            {"_id": subscription["_id"]},
-            {"$set": {"last_check_time": datetime.utcnow()}}
+    operations = []
+    cursor = db.user_indicator_subscriptions.find(
+        {"status": "active", "$or": [{"shard_hash": {"$exists": False}}, {"next_check_at": {"$exists": False}}]},
+        {"indicator_id": 1, "user_selected_symbol": 1, "user_selected_timeframe": 1,
+         "last_check_time": 1, "next_check_at": 1}
+    )
+    async for subscription in cursor:
+        fields = {"shard_hash": subscription_shard_hash(subscription)}
+        if not subscription.get("next_check_at"):
+            last_check_time = subscription.get("last_check_time")
+            interval = get_check_interval(subscription.get("user_selected_timeframe", "15min"))
+            fields["next_check_at"] = last_check_time + timedelta(minutes=interval) if last_check_time else datetime.utcnow()
+        operations.append(UpdateOne({"_id": subscription["_id"]}, {"$set": fields}))
+    
+    if operations:
+        await db.user_indicator_subscriptions.bulk_write(operations, ordered=False)
+        logger.info(f"🗓️ Scheduled {len(operations)} subscriptions created without scheduling fields")
+    return len(operations)
+
+
+async def seconds_until_next_check(max_wait: float) -> float:
+    """Time until the earliest due subscription of this shard (capped at max_wait)"""
+    upcoming = await db.user_indicator_subscriptions.find_one(
+        {"status": "active", **shard_query()},
+        {"next_check_at": 1},
+        sort=[("next_check_at", ASCENDING)]
+    )
+    if not upcoming or not upcoming.get("next_check_at"):
+        return max_wait
+    wait = (upcoming["next_check_at"] - datetime.utcnow()).total_seconds()
+    # Short floor so a subscription that keeps failing cannot turn this into a busy loop
+    return min(max(wait, 1.0), max_wait)
+
+
+async def run_bounded(semaphore: asyncio.Semaphore, coro):
+    """Await a coroutine while holding a slot of the semaphore"""
+    async with semaphore:
+        return await coro
+
+
+def summarize_lag(lags: list) -> dict:
+    """Average / p95 / max lag in seconds"""
+    if not lags:
+        return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(lags)
+    return {
+        "avg": round(sum(ordered) / len(ordered), 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "max": round(ordered[-1], 3)
+    }
+
+
+async def get_market_data(symbol: str, timeframe: str, market_cache: dict, semaphore: asyncio.Semaphore):
+    """
+    Market data for (symbol, timeframe), fetched once per cycle.
+    Concurrent batches asking for the same series share one in-flight request.
+    """
+    key = (symbol, timeframe)
+    if key not in market_cache:
+        market_cache[key] = asyncio.ensure_future(run_bounded(semaphore, fetch_market_data(symbol, timeframe)))
+    return await market_cache[key]
+
+
+# Fields of a subscription needed to evaluate it and fan its signal out
+GROUP_MEMBER_FIELDS = (
+    "_id", "user_id", "mentor_id", "indicator_id", "user_selected_symbol",
+    "user_selected_timeframe", "last_signal_time", "next_check_at"
+)
+
+
+def evaluation_groups_pipeline(now: datetime) -> list:
+    """
+    Aggregation collapsing this shard's due subscriptions into evaluation groups:
+    one document per (indicator, symbol, timeframe) with all subscribers as members
+    """
+    return [
+        {"$match": {"status": "active", "next_check_at": {"$lte": now}, **shard_query()}},
+        {"$group": {
+            "_id": {
+                "indicator_id": "$indicator_id",
+                "symbol": "$user_selected_symbol",
+                "timeframe": "$user_selected_timeframe"
+            },
+            "members": {"$push": {field: f"${field}" for field in GROUP_MEMBER_FIELDS}}
+        }}
+    ]
+
+
+async def process_evaluation_groups(groups: list, semaphore: asyncio.Semaphore = None,
+                                    market_cache: dict = None) -> dict:
+    """
+    Evaluate each (indicator, symbol, timeframe) group once and fan the result out:
+    1. Mark every member checked and schedule its next check (one update per timeframe)
+    2. Load the groups' indicators in one query
+    3. Per timeframe, stack market data into a (symbols x bars) matrix and
+       evaluate every indicator against every symbol with ConditionEvaluator.evaluate_batch
+       (indicator values are shared per symbol and bar through the indicator cache)
+    4. For groups with a BUY/SELL result, drop crosses the group already signalled on this bar,
+       apply each member's cooldown and create its signal
+    
+    Market data fetches and signal writes run concurrently, bounded by `semaphore`.
+    Returns counters and the check lag (seconds past next_check_at) of every member.
+    """
+    semaphore = semaphore or asyncio.Semaphore(WORKER_CONCURRENCY)
+    market_cache = {} if market_cache is None else market_cache
+    stats = {"due": 0, "groups": len(groups), "evaluated": 0, "repeated_crosses": 0, "cooldown": 0,
+             "signals": 0, "lags": []}
+    now = datetime.utcnow()
+    
+    members = [member for group in groups for member in group["members"]]
+    stats["due"] = len(members)
+    if not members:
+        return stats
+    
+    by_interval = {}
+    for member in members:
+        if member.get("next_check_at"):
+            stats["lags"].append(max(0.0, (now - member["next_check_at"]).total_seconds()))
+        interval = get_check_interval(member.get("user_selected_timeframe", "15min"))
+        by_interval.setdefault(interval, []).append(member["_id"])
+    
+    for interval, subscription_ids in by_interval.items():
+        await db.user_indicator_subscriptions.update_many(
+            {"_id": {"$in": subscription_ids}},
+            {"$set": {"last_check_time": now, "next_check_at": now + timedelta(minutes=interval)}}
         )
+    
+    indicator_ids = {group["_id"]["indicator_id"] for group in groups}
+    indicators = await db.custom_indicators.find({
+        "_id": {"$in": [ObjectId(i) for i in indicator_ids]},
+        "status": "active",
+        "is_running": True
+    }).to_list(length=len(indicator_ids))
+    indicators_by_id = {str(ind["_id"]): ind for ind in indicators}
+    
+    # Group by timeframe: every symbol in a matrix shares the same bar count
+    by_timeframe = {}
+    for group in groups:
+        if group["_id"]["indicator_id"] not in indicators_by_id:
+            logger.warning(f"Indicator {group['_id']['indicator_id']} not found or not running")
+            # Deleted or stopped: its compiled plan is recompiled if it runs again
+            plan_cache.invalidate(group["_id"]["indicator_id"])
+            continue
+        by_timeframe.setdefault(group["_id"]["timeframe"], []).append(group)
+    
+    for timeframe, timeframe_groups in by_timeframe.items():
+        symbols = list(dict.fromkeys(group["_id"]["symbol"] for group in timeframe_groups))
+        fetched = await asyncio.gather(*(
+            get_market_data(symbol, timeframe, market_cache, semaphore) for symbol in symbols
+        ))
+        market = {}
+        for symbol, market_data in zip(symbols, fetched):
+            if market_data:
+                market[symbol] = market_data
+            else:
+                logger.warning(f"Could not fetch market data for {symbol}")
+        if not market:
+            continue
+        
+        symbols = list(market)
+        bars = min(len(market[s]["close_prices"]) for s in symbols)
+        closes = [market[s]["close_prices"][-bars:] for s in symbols]
+        highs = [market[s]["high_prices"][-bars:] for s in symbols]
+        lows = [market[s]["low_prices"][-bars:] for s in symbols]
+        
+        group_indicator_ids = list(dict.fromkeys(group["_id"]["indicator_id"] for group in timeframe_groups))
+        signals = ConditionEvaluator.evaluate_batch(
+            [indicators_by_id[i] for i in group_indicator_ids], closes, highs, lows,
+            series=(symbols, timeframe, [market[s]["bar_time"] for s in symbols])
+        )
+        row_of = {indicator_id: row for row, indicator_id in enumerate(group_indicator_ids)}
+        column_of = {symbol: column for column, symbol in enumerate(symbols)}
+        
+        pending = []
+        for group in timeframe_groups:
+            indicator_id, symbol = group["_id"]["indicator_id"], group["_id"]["symbol"]
+            if symbol not in column_of:
+                continue
+            stats["evaluated"] += 1
+            signal = signals[row_of[indicator_id], column_of[symbol]]
+            if not signal:
+                continue
+            
+            indicator = indicators_by_id[indicator_id]
+            if (plan_cache.get(indicator).needs_previous
+                    and not cross_state.claim((indicator_id, symbol, timeframe), market[symbol]["bar_time"])):
+                # Checks run more often than bars close: one cross fires once per bar
+                stats["repeated_crosses"] += 1
+                continue
+            eligible = [member for member in group["members"] if await should_generate_signal(member)]
+            stats["cooldown"] += len(group["members"]) - len(eligible)
+            logger.info(f"✅ {signal} signal detected for {symbol} using {indicator['name']}: "
+                        f"{len(eligible)}/{len(group['members'])} subscribers outside cooldown")
+            
+            pending.append(create_signals_for_members(eligible, signal, indicator))
         
-        # Check cooldown for signal generation
-        if not await should_generate_signal(subscription):
-            logger.info(f"⏳ Signal cooldown active for subscription {subscription_id}, skipping signal generation")
-            return
-        
-        # Get indicator configuration
-        indicator = await db.custom_indicators.find_one({
-            "_id": ObjectId(indicator_id),
-            "status": "active",
-            "is_running": True
-        })
-        
-        if not indicator:
-            logger.warning(f"Indicator {indicator_id} not found or not running")
-            return
-        
-        # Fetch market data
-        market_data = await fetch_market_data(symbol, timeframe)
-        
-        if not market_data:
-            logger.warning(f"Could not fetch market data for {symbol}")
-            return
-        
-        # Evaluate indicator conditions
-        signal = ConditionEvaluator.evaluate_indicator(indicator, market_data)
+        created = await asyncio.gather(*pending)
+        stats["signals"] += sum(created)
         
-        if signal:
-            logger.info(f"✅ {signal} signal detected for {symbol} using {indicator['name']}")
-            await create_signal_for_subscription(subscription, signal, indicator)
-        else:
-            logger.info(f"ℹ️ No signal generated for {symbol} using {indicator['name']}")
-            
-    except Exception as e:
-        logger.error(f"Error processing subscription: {e}")
+        logger.info(f"📊 {timeframe}: {len(timeframe_groups)} groups ({len(group_indicator_ids)} indicators x "
+                    f"{len(symbols)} symbols) for {sum(len(g['members']) for g in timeframe_groups)} subscriptions")
+    
+    return stats
 
 
-async def run_worker_cycle():
+async def run_worker_cycle() -> dict:
     """
     Run one complete cycle of the worker:
-    1. Get all active subscriptions
-    2. Process each subscription
-    3. Generate signals as needed
+    1. Stream this shard's due subscriptions (next_check_at <= now), collapsed into
+       (indicator, symbol, timeframe) evaluation groups by the database
+    2. Evaluate the groups in batches of about WORKER_BATCH_SIZE subscriptions, several batches in flight
+    3. Fan each group's signal out to its members (market data / writes bounded by WORKER_CONCURRENCY)
+    4. Report cycle latency, check lag and throughput
     """
+    cycle_start = time.monotonic()
+    metrics = {
+        "shard": f"{WORKER_SHARD_INDEX}/{WORKER_SHARD_COUNT}",
+        "subscriptions": 0, "groups": 0, "due": 0, "evaluated": 0,
+        "repeated_crosses": 0, "cooldown": 0, "signals": 0, "batches": 0, "errors": 0
+    }
+    lags = []
+    
     try:
         logger.info("=" * 60)
-        logger.info("🚀 Starting signal worker cycle")
+        logger.info(f"🚀 Starting signal worker cycle (shard {metrics['shard']})")
         logger.info("=" * 60)
         
-        # Get all active subscriptions
-        subscriptions = await db.user_indicator_subscriptions.find({
-            "status": "active"
-        }).to_list(length=1000)
-        
-        logger.info(f"Found {len(subscriptions)} active subscriptions to process")
-        
-        if not subscriptions:
-            logger.info("No active subscriptions, skipping cycle")
-            return
-        
-        # Process each subscription
-        for subscription in subscriptions:
-            await process_subscription(subscription)
-            # Small delay between subscriptions
-            await asyncio.sleep(0.5)
-        
-        logger.info(f"✅ Worker cycle complete, processed {len(subscriptions)} subscriptions")
+        semaphore = asyncio.Semaphore(WORKER_CONCURRENCY)
+        inflight = asyncio.Semaphore(WORKER_MAX_INFLIGHT_BATCHES)
+        market_cache = {}
+        tasks = []
+        
+        async def run_batch(batch: list):
+            try:
+                stats = await process_evaluation_groups(batch, semaphore, market_cache)
+                for key in ("due", "evaluated", "repeated_crosses", "cooldown", "signals"):
+                    metrics[key] += stats[key]
+                lags.extend(stats["lags"])
+            except Exception as e:
+                metrics["errors"] += 1
+                logger.error(f"Error processing subscription batch: {e}")
+            finally:
+                inflight.release()
+        
+        async def submit(batch: list):
+            # Backpressure: the cursor waits while WORKER_MAX_INFLIGHT_BATCHES batches are running
+            await inflight.acquire()
+            metrics["batches"] += 1
+            tasks.append(asyncio.create_task(run_batch(batch)))
+        
+        batch, batch_members = [], 0
+        cursor = db.user_indicator_subscriptions.aggregate(
+            evaluation_groups_pipeline(datetime.utcnow()), allowDiskUse=True
+        )
+        async for group in cursor:
+            metrics["groups"] += 1
+            metrics["subscriptions"] += len(group["members"])
+            batch.append(group)
+            batch_members += len(group["members"])
+            if batch_members >= WORKER_BATCH_SIZE:
+                await submit(batch)
+                batch, batch_members = [], 0
+        if batch:
+            await submit(batch)
+        
+        await asyncio.gather(*tasks)
+        
+        if not metrics["subscriptions"]:
+            logger.info("No subscriptions due this cycle")
         
     except Exception as e:
+        metrics["errors"] += 1
         logger.error(f"Error in worker cycle: {e}")
+    
+    elapsed = time.monotonic() - cycle_start
+    metrics["cycle_seconds"] = round(elapsed, 3)
+    metrics["throughput_per_second"] = round(metrics["subscriptions"] / elapsed, 1) if elapsed > 0 else 0.0
+    metrics["lag_seconds"] = summarize_lag(lags)
+    
+    logger.info(f"✅ Worker cycle complete in {metrics['cycle_seconds']}s: {metrics['subscriptions']} subscriptions "
+                f"in {metrics['groups']} groups, {metrics['signals']} signals "
+                f"({metrics['cooldown']} in cooldown, {metrics['repeated_crosses']} repeated crosses), "
+                f"lag {metrics['lag_seconds']}")
+    logger.info(f"📦 Indicator cache: {indicator_cache.stats()}, condition plans: {plan_cache.stats()}, "
+                f"cross state: {cross_state.stats()}")
+    
+    try:
+        await db.worker_metrics.update_one(
+            {"_id": f"signal_worker:{metrics['shard']}"},
+            {"$set": {**metrics, "condition_plans": plan_cache.stats(), "cross_state": cross_state.stats(),
+                      "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Error saving worker metrics: {e}")
+    
+    return metrics
 
 
-async def run_worker(base_interval_seconds: int = 60):
+async def run_worker(base_interval_seconds: int = WORKER_MAX_SLEEP_SECONDS):
     """
-    Run the worker continuously with 1-minute base interval.
+    Run the worker continuously, waking when the next subscription is due
+    (at most base_interval_seconds apart, so new subscriptions are picked up).
     Each subscription is checked based on its timeframe's interval.
     
     Timeframe intervals:
@@ -364,18 +585,29 @@ async def run_worker(base_interval_seconds: int = 60):
     - 1h    -> every 45 minutes
     - 4h    -> every 60 minutes
     """
-    logger.info("🚀 Signal Worker started with timeframe-based intervals")
+    logger.info(f"🚀 Signal Worker started with timeframe-based intervals "
+                f"(shard {WORKER_SHARD_INDEX}/{WORKER_SHARD_COUNT}, concurrency {WORKER_CONCURRENCY})")
     logger.info("📊 Monitoring intervals:")
     for tf, interval in sorted(TIMEFRAME_INTERVALS.items(), key=lambda x: x[1]):
         logger.info(f"   {tf}: every {interval} minutes")
     
+    await ensure_schedule_index()
+    await assign_schedule_fields()
+    # Drain queued pushes here too, so worker signals are delivered even without the API server
+    push_service.on_device_not_registered = lambda tokens: push_tokens.prune_tokens(db, tokens)
+    await push_queue.start_consumers(db)
+    
     while True:
         try:
-            await run_worker_cycle()
+            metrics = await run_worker_cycle()
+            
+            if metrics["cycle_seconds"] > base_interval_seconds:
+                logger.warning(f"⚠️ Worker cycle took {metrics['cycle_seconds']}s, longer than the {base_interval_seconds}s base interval")
             
-            # Base interval of 1 minute - individual timeframes checked based on their intervals
-            logger.info(f"💤 Base cycle sleeping for {base_interval_seconds} seconds...")
-            await asyncio.sleep(base_interval_seconds)
+            # Sleep until the next subscription is due
+            sleep_seconds = await seconds_until_next_check(base_interval_seconds)
+            logger.info(f"💤 Next check due in {sleep_seconds:.1f} seconds")
+            await asyncio.sleep(sleep_seconds)
             
         except Exception as e:
             logger.error(f"Worker error: {e}")
@@ -383,5 +615,5 @@ async def run_worker(base_interval_seconds: int = 60):
 
 
 if __name__ == "__main__":
-    # Run the worker with 1 minute base interval
-    asyncio.run(run_worker(base_interval_seconds=60))
+    # Run the worker (wakes when the next subscription is due, at least once a minute)
+    asyncio.run(run_worker())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Stand-in client for the signal stream (/api/user/stream)
+Logs in (or uses a token), opens one or more Server-Sent Events connections and
+prints every event with its delivery latency.
+
+Usage:
+    python stream_client.py --email user@example.com --password secret
+    python stream_client.py --token <jwt> --connections 50
+"""
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import httpx
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8001")
+
+
+async def login(base_url: str, email: str, password: str) -> str:
+    async with httpx.AsyncClient(base_url=base_url, timeout=10) as http:
+        response = await http.post("/api/auth/login", json={"email": email, "password": password})
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+
+def parse_sse(lines):
+    """Group SSE lines into (event, id, data) messages; comment lines (heartbeats) are skipped"""
+    event = {"event": "message", "id": None, "data": ""}
+    for line in lines:
+        if not line:
+            if event["data"]:
+                yield event
+            event = {"event": "message", "id": None, "data": ""}
+        elif line.startswith(":"):
+            continue
+        else:
+            field, _, value = line.partition(": ")
+            if field == "data":
+                event["data"] += value
+            elif field in ("event", "id"):
+                event[field] = value
+
+
+async def listen(base_url: str, token: str, connection: int, counts: dict):
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as http:
+        async with http.stream("GET", "/api/user/stream", params={"token": token}) as response:
+            response.raise_for_status()
+            lines = []
+            async for line in response.aiter_lines():
+                lines.append(line)
+                if line:
+                    continue
+                for message in parse_sse(lines):
+                    counts[message["event"]] = counts.get(message["event"], 0) + 1
+                    data = json.loads(message["data"])
+                    latency = ""
+                    if data.get("created_at"):
+                        sent = datetime.fromisoformat(str(data["created_at"]))
+                        latency = f" ({(datetime.utcnow() - sent).total_seconds() * 1000:.0f} ms)"
+                    print(f"[{connection}] {message['event']}{latency}: {data}")
+                lines = []
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Stand-in client for the signal stream")
+    parser.add_argument("--url", default=BACKEND_URL)
+    parser.add_argument("--token")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--connections", type=int, default=1)
+    args = parser.parse_args()
+
+    token = args.token or await login(args.url, args.email, args.password)
+    counts: dict = {}
+    print(f"📡 Opening {args.connections} stream connection(s) to {args.url}")
+    try:
+        await asyncio.gather(*(listen(args.url, token, i, counts) for i in range(args.connections)))
+    finally:
+        print(f"Events received: {counts}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
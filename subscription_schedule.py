@@ -0,0 +1,31 @@
+"""
+Subscription Scheduling Fields
+Fields the signal worker's due-time queue reads from user_indicator_subscriptions:
+
+- next_check_at: when the subscription is due (indexed with status)
+- shard_hash: stable hash of (indicator, symbol, timeframe); worker shards select
+  their subscriptions with {"shard_hash": {"$mod": [WORKER_SHARD_COUNT, WORKER_SHARD_INDEX]}}
+
+Both are set when a subscription is created. Subscriptions created before these fields
+existed are backfilled once when the signal worker starts (signal_worker.assign_schedule_fields).
+"""
+import zlib
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def subscription_shard_hash(subscription: Dict) -> int:
+    """
+    Stable hash used for sharding, stored on the subscription as `shard_hash`.
+    Hashes (indicator, symbol, timeframe) so subscriptions that share an evaluation stay on one worker.
+    """
+    key = f"{subscription.get('indicator_id')}:{subscription.get('user_selected_symbol')}:{subscription.get('user_selected_timeframe')}"
+    return zlib.crc32(key.encode())
+
+
+def schedule_fields(subscription: Dict, now: Optional[datetime] = None) -> Dict:
+    """Scheduling fields for a new subscription: sharded, and due for its first check right away"""
+    return {
+        "shard_hash": subscription_shard_hash(subscription),
+        "next_check_at": now or datetime.utcnow()
+    }
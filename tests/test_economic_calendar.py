@@ -0,0 +1,52 @@
+"""Serving the economic calendar from a fixture: one fetch, reads from memory, stable ETags"""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+import economic_calendar
+from economic_calendar import CalendarSnapshot, compute_etag
+
+
+@pytest.fixture
+def fixture_file(tmp_path, monkeypatch):
+    path = tmp_path / "calendar.json"
+    path.write_text(json.dumps(economic_calendar.sample_fixture()))
+    monkeypatch.setattr(economic_calendar, "CALENDAR_FIXTURE_FILE", str(path))
+    return path
+
+
+def snapshot_doc(events, source):
+    return {"_id": economic_calendar.SNAPSHOT_ID, "events": events, "etag": compute_etag(events),
+            "source": source, "fetched_at": datetime.utcnow(), "refreshed_at": datetime.utcnow()}
+
+
+def test_fetch_reads_the_fixture(fixture_file):
+    events, source = asyncio.run(economic_calendar.fetch_calendar())
+
+    # The Low impact row of the sample fixture is skipped
+    assert source == "fixture"
+    assert len(events) == 5
+
+
+def test_snapshot_serves_copies(fixture_file):
+    events, source = asyncio.run(economic_calendar.fetch_calendar())
+    snapshot = CalendarSnapshot()
+    assert snapshot.stale and snapshot.events() == []
+
+    snapshot.apply(snapshot_doc(events, source))
+    served = snapshot.events()
+    served[0]["signal"] = "buy"
+
+    assert not snapshot.stale
+    assert snapshot.events()[0]["signal"] is None
+
+
+def test_unchanged_calendar_keeps_its_etag(fixture_file):
+    events, source = asyncio.run(economic_calendar.fetch_calendar())
+    snapshot = CalendarSnapshot()
+    snapshot.apply(snapshot_doc(events, source))
+
+    again, _ = asyncio.run(economic_calendar.fetch_calendar())
+    assert compute_etag(again) == snapshot.etag
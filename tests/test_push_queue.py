@@ -0,0 +1,58 @@
+"""Scheduling of failed push jobs"""
+import asyncio
+from datetime import datetime, timedelta
+
+import push_queue
+from push_service import empty_result
+
+
+class FakePushQueue:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+
+
+class FakeDB:
+    def __init__(self):
+        self.push_queue = FakePushQueue()
+
+
+class FailingService:
+    def __init__(self, retry_after: float = 0.0):
+        self.retry_after = retry_after
+
+    async def send(self, messages, label="push"):
+        result = empty_result()
+        result.update(messages=len(messages), chunks=1, failed_chunks=1, errors=len(messages),
+                      retry_after=self.retry_after)
+        return result
+
+
+def failed_job_available_at(monkeypatch, retry_after: float) -> datetime:
+    monkeypatch.setattr(push_queue, "push_service", FailingService(retry_after))
+    db = FakeDB()
+    job = {"_id": 1, "consumer": "c", "attempts": 1, "created_at": datetime.utcnow(),
+           "messages": [{"to": "ExponentPushToken[device-1]"}]}
+
+    asyncio.run(push_queue.process_job(db, job))
+
+    (update,) = db.push_queue.updates
+    assert update["$set"]["status"] == push_queue.STATUS_PENDING
+    return update["$set"]["available_at"]
+
+
+def test_failed_job_retries_with_backoff(monkeypatch):
+    before = datetime.utcnow()
+    available_at = failed_job_available_at(monkeypatch, retry_after=0.0)
+
+    assert available_at <= datetime.utcnow() + timedelta(seconds=push_queue.PUSH_QUEUE_RETRY_SECONDS)
+    assert available_at >= before + timedelta(seconds=push_queue.PUSH_QUEUE_RETRY_SECONDS)
+
+
+def test_failed_job_waits_for_retry_after(monkeypatch):
+    before = datetime.utcnow()
+    available_at = failed_job_available_at(monkeypatch, retry_after=600)
+
+    assert available_at >= before + timedelta(seconds=600)
@@ -0,0 +1,107 @@
+"""push_service against the fake Expo server (fake_expo_server.py) on a local port"""
+import asyncio
+import contextlib
+import random
+import time
+
+import uvicorn
+
+import fake_expo_server
+import push_service
+from push_service import PushService
+
+
+@contextlib.asynccontextmanager
+async def fake_expo(fail_rate: float = 0.0, retry_after: int = None):
+    """Run the fake Expo API in-process and yield a PushService pointed at it"""
+    fake_expo_server.state.update(fail_rate=fail_rate, retry_after=retry_after, requests=0, messages=0, throttled=0, max_batch=0, tickets={})
+    server = uvicorn.Server(uvicorn.Config(fake_expo_server.app, host="127.0.0.1", port=0, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    port = server.servers[0].sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}/--/api/v2/push"
+    service = PushService(push_url=f"{base}/send", receipts_url=f"{base}/getReceipts", max_retries=6)
+    try:
+        yield service
+    finally:
+        await service.close()
+        server.should_exit = True
+        await server_task
+
+
+def test_send_chunks_retries_and_prunes_unregistered(monkeypatch):
+    monkeypatch.setattr(push_service, "PUSH_BACKOFF_SECONDS", 0.01)
+    random.seed(7)
+    count = 1050
+    tokens = [f"ExponentPushToken[{'unregistered' if i % 50 == 0 else 'device'}-{i}]" for i in range(count)]
+    messages = [{"to": token, "title": "Test", "body": "Test", "data": {}} for token in tokens]
+    unregistered = [token for token in tokens if "unregistered" in token]
+    pruned = []
+
+    async def prune(tokens):
+        pruned.extend(tokens)
+
+    async def run():
+        async with fake_expo(fail_rate=0.2) as service:
+            service.on_device_not_registered = prune
+            result = await service.send(messages, "Test")
+            receipts = await service.check_receipts(result["tickets"])
+        return result, receipts
+
+    result, receipts = asyncio.run(run())
+
+    assert fake_expo_server.state["max_batch"] <= push_service.EXPO_MAX_MESSAGES
+    assert result["chunks"] == 11 and result["failed_chunks"] == 0
+    assert result["ok"] == count - len(unregistered)
+    # Every throttled response was retried (the fake only throttles /send)
+    assert fake_expo_server.state["throttled"] > 0
+    assert result["retries"] == fake_expo_server.state["throttled"]
+    assert sorted(pruned) == sorted(unregistered)
+    assert receipts["ok"] == result["ok"]
+
+
+def test_long_retry_after_is_reported_instead_of_slept():
+    messages = [{"to": "ExponentPushToken[device-1]", "title": "Test", "body": "Test", "data": {}}]
+
+    async def run():
+        async with fake_expo(fail_rate=1.0, retry_after=120) as service:
+            started = time.monotonic()
+            result = await service.send(messages, "Test")
+            return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(run())
+
+    assert elapsed < push_service.PUSH_MAX_RETRY_DELAY_SECONDS
+    assert result["failed_chunks"] == 1 and result["retries"] == 0
+    assert result["retry_after"] == 120
+
+
+def test_signal_notification_call_site(monkeypatch):
+    """
+    Drive a real notification path of the API: server.send_signal_notification_to_user
+    (push token cache -> messages_for_tokens -> send_push_notifications_batch), with the
+    batch delivered straight to the fake server instead of the Mongo push queue.
+    """
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:1")
+    import server
+    from push_tokens import push_token_cache
+
+    user_id = "0" * 24
+    push_token_cache._put(user_id, ["ExponentPushToken[call-site-1]", "ExponentPushToken[call-site-2]"], time.monotonic())
+    ea = {"_id": "1" * 24, "config": {"symbol": "EUR/USD", "indicator": {"type": "RSI"}}}
+    results = []
+
+    async def run():
+        async with fake_expo() as service:
+            async def send_now(messages):
+                results.append(await service.send(messages, "Call site"))
+
+            monkeypatch.setattr(server, "send_push_notifications_batch", send_now)
+            await server.send_signal_notification_to_user(user_id, ea, "BUY", 1.085)
+
+    asyncio.run(run())
+
+    assert results, "send_signal_notification_to_user sent nothing (see the logged error)"
+    assert results[0]["messages"] == 2 and results[0]["ok"] == 2
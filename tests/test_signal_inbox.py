@@ -0,0 +1,164 @@
+"""
+Unread counts of the hybrid inbox: the personal counter is stored on users (by ObjectId,
+while the auth dependencies hand out serialized documents with a string _id), audience
+signals are counted at read time after the user's audience cursor.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import signal_inbox
+
+
+class FakeUsers:
+    """Minimal users collection: exact _id match, $gt, $set/$inc/$max"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def _match(self, doc, query):
+        for key, value in query.items():
+            if isinstance(value, dict):
+                if "$gt" in value and not doc.get(key, 0) > value["$gt"]:
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if self._match(doc, query)), None)
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if self._match(doc, query):
+                doc.update(update.get("$set", {}))
+                for key, value in update.get("$inc", {}).items():
+                    doc[key] = doc.get(key, 0) + value
+                for key, value in update.get("$max", {}).items():
+                    if doc.get(key) is None or value > doc[key]:
+                        doc[key] = value
+                return
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        async def iterate():
+            for doc in self.docs:
+                yield doc
+        return iterate()
+
+
+class EmptyCollection:
+    async def count_documents(self, query):
+        return 0
+
+    def aggregate(self, pipeline):
+        return FakeCursor([])
+
+
+class FakeSignals:
+    """Records inserts and aggregation pipelines, answers aggregations with canned results"""
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.inserted = []
+        self.pipelines = []
+
+    async def insert_one(self, doc):
+        self.inserted.append(doc)
+
+        class Result:
+            inserted_id = ObjectId()
+        return Result()
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return FakeCursor(self.results)
+
+
+class FakeDB:
+    pass
+
+
+def make_db(oid):
+    db = FakeDB()
+    db.users = FakeUsers([{"_id": oid, "status": "active"}])
+    db.user_signals = db.signals = EmptyCollection()
+    return db
+
+
+def test_unread_counter_for_serialized_user():
+    oid = ObjectId()
+    db = make_db(oid)
+    user = {"_id": str(oid), "status": "active"}  # as returned by the auth dependencies
+
+    async def run():
+        assert await signal_inbox.unread_count(db, user) == 0
+        # The recount is stored on the ObjectId document
+        assert db.users.docs[0].get(signal_inbox.UNREAD_FIELD) == 0
+
+        db.users.docs[0][signal_inbox.UNREAD_FIELD] = 3
+        assert await signal_inbox.unread_count(db, user) == 3
+
+        await signal_inbox.decrement_unread(db, user)
+        assert db.users.docs[0][signal_inbox.UNREAD_FIELD] == 2
+
+    asyncio.run(run())
+
+
+def test_publish_audience_signal_does_not_write_users():
+    db = make_db(ObjectId())
+    db.signals = FakeSignals()
+    db.users.update_many = None  # Any per-user write would fail
+
+    signal_id = asyncio.run(signal_inbox.publish_audience_signal(
+        db, {"signal_type": "BUY", "created_at": datetime.utcnow()}, signal_inbox.audience_all()
+    ))
+
+    assert ObjectId.is_valid(signal_id)
+    assert db.signals.inserted[0]["audience"] == signal_inbox.audience_all()
+
+
+def test_unread_count_adds_audience_signals_after_the_cursor():
+    oid = ObjectId()
+    read_at = datetime(2026, 1, 1)
+    db = make_db(oid)
+    db.users.docs[0].update({signal_inbox.UNREAD_FIELD: 2, signal_inbox.AUDIENCE_READ_FIELD: read_at})
+    db.signals = FakeSignals([{"unread": 4}])
+
+    assert asyncio.run(signal_inbox.unread_count(db, {"_id": str(oid), "status": "active"})) == 6
+
+    first_match = db.signals.pipelines[0][0]["$match"]
+    assert {"created_at": {"$gt": read_at}} in first_match["$and"]
+
+
+def test_audience_cursor_stops_before_the_oldest_unread_signal():
+    oid = ObjectId()
+    t1, t2, t3 = (datetime(2026, 1, 1) + timedelta(minutes=i) for i in range(3))
+    db = make_db(oid)
+    user = {"_id": str(oid), "status": "active"}
+
+    # t2 has a read and an unread signal: the cursor may not reach it
+    db.signals = FakeSignals([
+        {"created_at": t1, "read": True}, {"created_at": t1, "read": True},
+        {"created_at": t2, "read": True}, {"created_at": t2, "read": False},
+        {"created_at": t3, "read": True},
+    ])
+    assert asyncio.run(signal_inbox.advance_audience_cursor(db, user)) == t1
+    assert db.users.docs[0][signal_inbox.AUDIENCE_READ_FIELD] == t1
+
+    db.signals.results = [{"created_at": t2, "read": True}, {"created_at": t3, "read": True}]
+    assert asyncio.run(signal_inbox.advance_audience_cursor(db, user)) == t3
+    assert db.users.docs[0][signal_inbox.AUDIENCE_READ_FIELD] == t3
+
+    # Nothing read after the cursor: it does not move
+    db.signals.results = [{"created_at": t3 + timedelta(minutes=1), "read": False}]
+    assert asyncio.run(signal_inbox.advance_audience_cursor(db, user)) is None
+    assert db.users.docs[0][signal_inbox.AUDIENCE_READ_FIELD] == t3
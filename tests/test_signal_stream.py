@@ -0,0 +1,41 @@
+"""Routing and backpressure of the in-process stream hub, without a server or database"""
+import signal_stream
+from signal_inbox import audience_all, audience_mentor, audience_users
+
+PAID = {"status": "active", "payment_status": "paid"}
+
+
+def make_hub(queue_size=5):
+    hub = signal_stream.StreamHub(queue_size=queue_size)
+    alice = hub.connect({"_id": "u1", "mentor_id": "M1", **PAID})
+    bob = hub.connect({"_id": "u2", "mentor_id": "M2", **PAID})
+    carol = hub.connect({"_id": "u3", "mentor_id": "M1", "status": "active", "payment_status": "unpaid"})
+    return hub, alice, bob, carol
+
+
+def test_dispatch_routes_by_audience():
+    hub, alice, bob, carol = make_hub()
+
+    # Broadcasts reach paid users only; mentor and explicit audiences reach their members
+    assert hub.dispatch({"type": "signal", "audience": audience_all(), "data": {}}) == 2
+    assert hub.dispatch({"type": "news", "audience": audience_mentor("M1"), "data": {}}) == 1
+    assert hub.dispatch({"type": "signal", "audience": audience_users(["u3", "u9"]), "data": {}}) == 1
+    assert (alice.queue.qsize(), bob.queue.qsize(), carol.queue.qsize()) == (2, 1, 1)
+
+
+def test_slow_consumer_queue_stays_bounded_and_resyncs():
+    hub, alice, bob, carol = make_hub(queue_size=5)
+
+    for i in range(10_000):
+        hub.dispatch({"type": "signal", "audience": audience_users(["u2"]), "data": {"n": i}})
+
+    assert bob.queue.qsize() <= 5
+    backlog = [bob.queue.get_nowait() for _ in range(bob.queue.qsize())]
+    assert any(message["type"] == signal_stream.EVENT_RESYNC for message in backlog)
+
+
+def test_disconnect_removes_connection():
+    hub, alice, bob, carol = make_hub()
+
+    hub.disconnect(carol)
+    assert hub.stats()["connections"] == 2